@@ -3,11 +3,15 @@
 
 from selenium.webdriver.common.keys import Keys
 from utils.scraper_utils.scraper import WebScraper
+from utils.scraper_utils.driver_pool import DriverPool
 from utils.scraper_utils.cleaning_utils import csrhub_clean_company_name
+from utils.scraper_utils.scrape_journal import (DONE, FAILED, RUNNING, ScrapeJournal,
+                                                default_journal_path)
+from utils.scraper_utils.threader import ResultWriter, env_int
+from utils.scraper_utils.retry import RetryQueue, classify_failure, clear_failure, note_failure, take_failure
 import logging
 import pandas as pd
 from tqdm import tqdm
-from time import sleep
 import os
 
 # Configure logging 
@@ -21,10 +25,15 @@ URL = "https://www.csrhub.com/search/name/"
 headername = 'Longname'
 export_path = 'api/data/csrhub.csv'
 
+# Resource types CSRHub's pages need; the score and source count are plain text, so every type is blocked
+ALLOWED_RESOURCES = set()
+
 def csrhub_scraper(df, export_path):
 
     '''
-    This function scrapes csrhub. 
+    This function scrapes csrhub. Progress is journaled, so an interrupted run is
+    resumed without scraping its finished companies again. Companies that time out or
+    are blocked are retried after the others, and the rest are written to a failure report.
 
     Args:
         df: [dataframe] Dataframe containing list of companies thread will scrape.
@@ -33,22 +42,31 @@ def csrhub_scraper(df, export_path):
     Returns:
         list[dict] : List of dictionaries where each dictionary contains the scraping results for 1 company.
     '''
+    # Skip the companies already scraped by the run being resumed, and rewrite their results
+    journal = ScrapeJournal(default_journal_path(export_path), 'csrhub')
+    completed = journal.begin()
+    df = df[~df[headername].astype(str).isin(completed)]
+    writer = ResultWriter(export_path)
+    scraped = list(completed.values())
+    for result in scraped:
+        writer.write(result)
     logging.info(f"Starting scraping process for {len(df)} companies")
 
-    # Initialize progress bar and empty dictionary
-    csrhub = {
-        'Company': [],
-        'ESG_Score': [],
-        'Num_Sources': []
-    }
+    # Initialize progress bar, and a warm browser that is recycled between companies
     pbar = tqdm(total=len(df), desc="Scraping Progress", position=0)
-
-    # Iterate through companies
-    for index, row in df.iterrows():
-        bot = WebScraper(URL, threaded=False)
+    pool = DriverPool(size=1)
+    pool.prelaunch()
+    retries = RetryQueue()
+
+    # Iterate through companies, followed by the companies being retried
+    for index, row in retries.iterate(df.iterrows()):
+        clear_failure()
+        company_scraped = False
+        retrying = False
+        bot = WebScraper(URL, threaded=False, pool=pool, allowed_resources=ALLOWED_RESOURCES)
         company_name = row[headername]
         logging.info(f"\nProcessing company {index + 1}: {company_name}")
-        sleep(3)
+        journal.record(company_name, RUNNING)
 
         try:
             # Accept cookies
@@ -57,7 +75,7 @@ def csrhub_scraper(df, export_path):
 
             try:
                 # Close any popups 
-                popup_close = bot.wait_element_to_load(xpath="//*[@id='wrapper']/div[5]/div[1]/div")
+                popup_close = bot.wait_clickable(xpath="//*[@id='wrapper']/div[5]/div[1]/div", timeout=2)
                 popup_close.click()
                 logging.info("Popup closed")
             except:
@@ -83,7 +101,6 @@ def csrhub_scraper(df, export_path):
                 logging.info("Single result found, clicking directly")
                 link.click()
                 found_match = True
-                sleep(3)
 
             # Iterate through results from dropdown menu 
             else:
@@ -116,56 +133,56 @@ def csrhub_scraper(df, export_path):
                     logging.warning("No sources found")
                     continue
 
-                # Append results to dictionary
-                csrhub['Company'].append(company_name)
-                csrhub['ESG_Score'].append(esg_score)
-                csrhub['Num_Sources'].append(num_sources.strip())
+                # Append results to the csv and the journal
+                result = {
+                    'Company': company_name,
+                    'ESG_Score': esg_score,
+                    'Num_Sources': num_sources.strip()
+                }
+                scraped.append(result)
+                writer.write(result)
+                journal.record(company_name, DONE, result)
+                company_scraped = True
 
                 logging.info(f"Extracted Data for {company_name}:")
                 logging.info(f"ESG Score: {esg_score}")
                 logging.info(f"Number of Sources: {num_sources}")
-                pd.DataFrame(csrhub).to_csv(export_path, index=False)
 
         except Exception as e:
             logging.error(f"Error processing company: {e}")
+            note_failure(classify_failure(e), str(e))
             continue
 
         finally:
-            logging.info(f"Closing browser for {company_name}")
-            bot.driver.quit()
-            sleep(1)
-            pbar.update(1)
-            pbar.set_description(f"Processed: {len(csrhub['Company'])}/{index + 1}")
-
-    # Close progress bar
+            # Record the company as failed unless it was scraped, and retry it later if the failure was transient
+            if not company_scraped:
+                failure = take_failure()
+                journal.record(company_name, FAILED, failure)
+                retrying = retries.schedule(company_name, (index, row), failure)
+            logging.info(f"Recycling browser for {company_name}")
+            bot.log_step_times()
+            bot.quit()
+            if not retrying:
+                pbar.update(1)
+            pbar.set_description(f"Processed: {len(scraped)}/{pbar.n}")
+
+    # Close progress bar, browser, csv and journal
     pbar.close()
+    pool.close_all()
+    retries.report(export_path)
+    writer.close()
+    journal.finish()
+    journal.close()
     logging.info("Scraping completed")
-    return pd.DataFrame(csrhub)
+    return pd.DataFrame(scraped, columns=['Company', 'ESG_Score', 'Num_Sources'])
 
 # If file is run, runs csrhub_scraper function 
 # and outputs results to export_path
 if __name__ == "__main__":
     df = pd.read_csv('api/data/SP500.csv')
-    df = df.head(4)
-    results_df = csrhub_scraper(df, export_path)
-
-    # Search for missing companies 
-    try: 
-        logging.info("Checking for missing companies")
-        csrhub_df = pd.read_csv(export_path)
-        sp500_df = pd.read_csv('api/data/SP500.csv')
-        sp500_df = sp500_df.head(4)
-
-        csrhub_companies = set(csrhub_df['Company']) 
-        sp500_companies = set(sp500_df['Longname'])
-
-        missing_companies = list(sp500_companies - csrhub_companies)
-        logging.info(f"Found {len(missing_companies)} missing companies")
-        
-        # If there are missing companies, then run csrhub for the missing companies 
-        if missing_companies is not None: 
-            csrhub_scraper(missing_companies, export_path)
-    except: 
-        logging.error("Error processing missing companies")
-
-      
+    limit = env_int("SCRAPER_LIMIT")
+    if limit:
+        df = df.head(limit)
+
+    # Companies that fail transiently are retried during the run, and the rest are listed in the failure report
+    csrhub_scraper(df, export_path)
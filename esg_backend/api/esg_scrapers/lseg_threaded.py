@@ -3,13 +3,13 @@
 
 from utils.scraper_utils.scraper import WebScraper
 from utils.scraper_utils.threader import Threader
+from utils.scraper_utils.retry import classify_failure, note_failure
 from utils.scraper_utils.cleaning_utils import clean_company_name
 import logging
 import pandas as pd
 from queue import Queue
 from tqdm import tqdm
 from threading import Lock
-from time import sleep
 
 # Configure logging
 logging.basicConfig(
@@ -22,8 +22,12 @@ URL = "https://www.lseg.com/en/data-analytics/sustainable-finance/esg-scores"
 headername = 'Longname'
 export_path = 'api/data/lseg.csv'
 
+# Resource types LSEG's pages need; the scores are plain text, so every type is blocked
+ALLOWED_RESOURCES = set()
+
 def lseg_scraper(company_data: pd.DataFrame, user_agents: 
-                 Queue, processed_tickers: set, lock: Lock) -> list[dict]:
+                 Queue, processed_tickers: set, lock: Lock,
+                 results: list = None) -> list[dict]:
     '''
     This function scrapes LSEG. 
 
@@ -32,11 +36,12 @@ def lseg_scraper(company_data: pd.DataFrame, user_agents:
         user_agents: [queue] Queue of user agents.
         processed_tickers: [set] Tickers of companies that have been processed by all threads.
         lock: [lock] Places a lock on a company as it is being processed to avoid conflicts between threads.
+        results: [list] List the results are appended to as each company is scraped (a new list if None).
 
     Returns:
         list[dict] : List of dictionaries where each dictionary contains the scraping results for 1 company.
     '''
-    results = []
+    results = results if results is not None else []
     bot = None
     try:
         # Initialize user agents if needed
@@ -44,13 +49,14 @@ def lseg_scraper(company_data: pd.DataFrame, user_agents:
             user_agents.put("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
         
         # Initialize browser
-        bot = WebScraper(URL, user_agents)
+        bot = WebScraper(URL, user_agents, allowed_resources=ALLOWED_RESOURCES)
         if not bot or not hasattr(bot, 'driver'):
             logging.error("Failed to initialize WebScraper")
             return None
             
         # Accept cookies
-        bot.accept_cookies(id_name="onetrust-accept-btn-handler")
+        with bot.timed_step("accept cookies"):
+            bot.accept_cookies(id_name="onetrust-accept-btn-handler")
 
         # Iterate through companies
         for idx, row in tqdm(company_data.iterrows(),
@@ -70,31 +76,30 @@ def lseg_scraper(company_data: pd.DataFrame, user_agents:
                 logging.info(f"Processing company: {company_name}")
 
                 # Send request to search bar
-                search_bar = bot.locate_element(xpath='//*[@id="searchInput-1"]')
+                search_button = None
+                with bot.timed_step("search"):
+                    search_bar = bot.wait_clickable(xpath='//*[@id="searchInput-1"]')
+                    if search_bar:
+                        search_bar.clear()
+                        search_bar.send_keys(company_name)
+                        logging.info(f"Entered company name: {company_name}")
+
+                        # Click search button once the input has enabled it
+                        search_button = bot.wait_clickable(xpath='//*[@id="esg-data-body"]/div[1]/div/div/div[1]/div/button[2]')
+                        if search_button:
+                            search_button.click()
+                            logging.info("Clicked search button")
                 if search_bar:
-                    search_bar.clear()
-                    sleep(1) 
-                    for char in company_name: 
-                        search_bar.send_keys(char)
-                        sleep(0.1)  
-                    logging.info(f"Entered company name: {company_name}")
-                    sleep(2) 
-                    
-                    # Click search button
-                    search_button = bot.locate_element(xpath='//*[@id="esg-data-body"]/div[1]/div/div/div[1]/div/button[2]')
                     if search_button:
-                        search_button.click()
-                        logging.info("Clicked search button")
-                        sleep(7)
-
-                        # Extract ESG scores
-                        esg_score = bot.locate_element(xpath='//*[@id="esg-data-body"]/div[2]/div/div/div/div/div/div[1]/div/div/div[1]/h3/strong')
-                        sleep(2) 
-
-                        # Extract specific ESG scores for sub categories 
-                        environment = bot.locate_element(xpath='//*[@id="esg-data-body"]/div[2]/div/div/div/div/div/div[1]/div/div/div[1]/div[1]/div[2]/b')
-                        social = bot.locate_element(xpath='//*[@id="esg-data-body"]/div[2]/div/div/div/div/div/div[1]/div/div/div[1]/div[5]/div[2]/b')
-                        governance = bot.locate_element(xpath='//*[@id="esg-data-body"]/div[2]/div/div/div/div/div/div[1]/div/div/div[1]/div[10]/div[2]/b')
+                        # Extract ESG scores once shown, and wait for the sub category scores to finish rendering
+                        with bot.timed_step("scores"):
+                            esg_score = bot.wait_visible(xpath='//*[@id="esg-data-body"]/div[2]/div/div/div/div/div/div[1]/div/div/div[1]/h3/strong')
+                            bot.wait_dom_stable()
+
+                            # Extract specific ESG scores for sub categories 
+                            environment = bot.locate_element(xpath='//*[@id="esg-data-body"]/div[2]/div/div/div/div/div/div[1]/div/div/div[1]/div[1]/div[2]/b')
+                            social = bot.locate_element(xpath='//*[@id="esg-data-body"]/div[2]/div/div/div/div/div/div[1]/div/div/div[1]/div[5]/div[2]/b')
+                            governance = bot.locate_element(xpath='//*[@id="esg-data-body"]/div[2]/div/div/div/div/div/div[1]/div/div/div[1]/div[10]/div[2]/b')
                         
                         # Append dictionary with company results to list
                         results.append({
@@ -112,45 +117,26 @@ def lseg_scraper(company_data: pd.DataFrame, user_agents:
 
             except Exception as e:
                 logging.error(f"Error processing company {row[headername]}: {e}")
+                note_failure(classify_failure(e), str(e))
 
             # Refresh page for next company
-            bot.driver.get(URL)
-            sleep(2)
+            with bot.timed_step("refresh"):
+                bot.open()
 
         return results
 
     except Exception as e:
         logging.error(f"Error in scraper: {e}")
+        note_failure(classify_failure(e), str(e))
         return None
     finally:
         if bot and hasattr(bot, 'driver'):
             logging.info("Closing browser")
-            bot.driver.quit()
+            bot.log_step_times()
+            bot.quit()
 
 # If file is run, applies Threader function to lseg_scraper function 
 # and outputs results to export_path
-if __name__ == "__main__": 
-    # Initialize user agents queue
-    user_agents = Queue()
-    user_agents.put("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
-
-    # Run threaded scraper
-    Threader(lseg_scraper, export_path) 
-    
-    try: 
-        logging.info("Checking for missing companies")
-        lseg_df = pd.read_csv(export_path)
-        sp500_df = pd.read_csv('api/data/SP500.csv') 
-        sp500_df = sp500_df.head(4)  # Needs to match number of inputs in the threader function 
-
-        lseg_companies = set(lseg_df['LSEG_ESG_Company']) 
-        sp500_companies = set(sp500_df['Longname'])
-
-        missing_companies = list(sp500_companies - sp500_companies)
-        logging.info(f"Found {len(missing_companies)} missing companies")
-        
-        # Re-run Threader function if missing companies identified
-        if missing_companies is not None: 
-            Threader(lseg_scraper, export_path, missing_companies)
-    except: 
-        logging.error("Error processing missing companies")
+if __name__ == "__main__":
+    # Companies that fail transiently are retried during the run, and the rest are listed in the failure report
+    Threader(lseg_scraper, export_path, provider_url=URL)
@@ -3,14 +3,18 @@
 
 from utils.scraper_utils.scraper import WebScraper
 from utils.scraper_utils.threader import Threader
+from utils.scraper_utils.retry import classify_failure, note_failure
 from utils.scraper_utils.cleaning_utils import (clean_company_name,
+                                                    clean_flag_class,
                                                     clean_flag_element)
+from utils.scraper_utils.http_fetcher import HTTP_ENABLED, HttpFetcher
 import logging
+import os
 import pandas as pd
+import re
 from queue import Queue
 from tqdm import tqdm
 from threading import Lock
-from time import sleep
 
 # Configure logging
 logging.basicConfig(
@@ -20,11 +24,90 @@ logging.basicConfig(
 )
 
 URL = "https://www.msci.com/our-solutions/esg-investing/esg-ratings-climate-search-tool"
+HTTP_URL = os.environ.get("MSCI_HTTP_URL", "https://www.msci.com")
+SEARCH_PATH = "our-solutions/esg-investing/esg-ratings-climate-search-tool"
 headername = 'Longname'
 export_path = 'api/data/msci.csv'
 
+# Resource types MSCI's pages need; the rating and flags are read from class names rather than icons, so every type is blocked
+ALLOWED_RESOURCES = set()
+
+# Query parameters of the search tool's portlet resources (the autocomplete and the rating profile)
+PORTLET_PARAMS = {
+    "p_p_id": "esg_ratings_profile",
+    "p_p_lifecycle": "2",
+    "p_p_state": "normal",
+    "p_p_mode": "view",
+    "p_p_cacheability": "cacheLevelPage",
+}
+
+# Rating circle classes, checked in order so 'aaa' is matched before 'aa' and 'a'
+RATING_MAP = {
+    "esg-rating-circle-aaa": "AAA",
+    "esg-rating-circle-aa": "AA",
+    "esg-rating-circle-a": "A",
+    "esg-rating-circle-bbb": "BBB",
+    "esg-rating-circle-bb": "BB",
+    "esg-rating-circle-b": "B",
+    "esg-rating-circle-ccc": "CCC",
+}
+
+# Output column, class and text of each controversy flag in the controversies table
+FLAGS = [
+    ("MSCI_Environment_Flag", "column-controversy", "Environment"),
+    ("MSCI_Social_Flag", "column-controversy", "Social"),
+    ("MSCI_Governance_Flag", "column-controversy", "Governance"),
+    ("MSCI_Customer_Flag", "subcolumn-controversy", "Customers"),
+    ("MSCI_Human_Rights_Flag", "subcolumn-controversy", "Human Rights"),
+    ("MSCI_Labor_Rights_Flag", "subcolumn-controversy", "Labor Rights"),
+]
+
+def msci_http_fetch(fetcher: HttpFetcher, company_name: str, cleaned_name: str) -> dict | None:
+    '''
+    This function fetches a company's rating and controversy flags from the JSON behind the
+    search tool's autocomplete and the HTML of its rating profile.
+
+    Args:
+        fetcher: [HttpFetcher] Fetcher for HTTP_URL.
+        company_name: [str] The company's name.
+        cleaned_name: [str] The company's cleaned name, as entered into the search bar.
+
+    Returns:
+        [dict] : The scraping results for the company, or None if they couldn't be fetched.
+    '''
+    # Find the company among the autocomplete results
+    matches = fetcher.get_json(SEARCH_PATH, {**PORTLET_PARAMS, "p_p_resource_id": "searchEsgRatingsProfiles",
+                                             "_esg_ratings_profile_keywords": cleaned_name})
+    if not isinstance(matches, list):
+        return None
+    issuer = next((match for match in matches
+                   if clean_company_name(match.get("title", "")) == cleaned_name), None)
+    if issuer is None or not issuer.get("url"):
+        return None
+
+    # Fetch the rating profile of the issuer
+    issuer_id = issuer["url"].rstrip("/").split("/")[-1]
+    page = fetcher.get_text(SEARCH_PATH, {**PORTLET_PARAMS, "p_p_resource_id": "showEsgRatingsProfile",
+                                          "_esg_ratings_profile_issuerId": issuer_id})
+    if page is None:
+        return None
+
+    rating_class = re.search(r'class="([^"]*\bratingdata-company-rating\b[^"]*)"', page)
+    if rating_class is None:
+        return None
+    esg_rating = next((rating for key, rating in RATING_MAP.items() if key in rating_class.group(1)), "Unknown")
+    result = {"MSCI_Company": company_name, "MSCI_ESG_Rating": esg_rating}
+
+    for column, flag_class, text in FLAGS:
+        flag = re.search(rf'<div[^>]*class="([^"]*\b{flag_class}\b[^"]*)"[^>]*>[^<]*{text}', page)
+        if flag is None:
+            return None
+        result[column] = clean_flag_class(flag.group(1))
+    return result
+
 def msci_scraper(company_data: pd.DataFrame, user_agents: Queue, 
-                 processed_tickers: set, lock: Lock) -> list[dict]:
+                 processed_tickers: set, lock: Lock,
+                 results: list = None) -> list[dict]:
     '''
     This function scrapes MSCI's ESG Ratings Climate Search Tool. 
 
@@ -33,12 +116,13 @@ def msci_scraper(company_data: pd.DataFrame, user_agents: Queue,
         user_agents: [queue] Queue of user agents.
         processed_tickers: [set] Tickers of companies that have been processed by all threads.
         lock: [lock] Places a lock on a company as it is being processed to avoid conflicts between threads.
+        results: [list] List the results are appended to as each company is scraped (a new list if None).
 
     Returns:
         list[dict] : List of dictionaries where each dictionary contains the scraping results for 1 company.
     '''
     # Helper function for resetting queue and initalizing webscraper
-    def reset_and_initialize(list_of_agents: list, first_attempt: bool = False):
+    def reset_and_initialize(list_of_agents: list):
         '''
         Helper function for resetting queue and initializing webscraper.
         '''
@@ -49,14 +133,9 @@ def msci_scraper(company_data: pd.DataFrame, user_agents: Queue,
         for agent in list_of_agents:
             user_agents.put(agent)
         
-        bot = WebScraper(URL, user_agents)
-        if not hasattr(bot, 'driver') and first_attempt:
-            logging.error("Failed to initialize WebDriver")
-            return None
-        sleep(5)
-        return bot
+        return WebScraper(URL, user_agents, allowed_resources=ALLOWED_RESOURCES)
 
-    output = []
+    output = results if results is not None else []
     companies_processed = 0
     
     # Save original user agents to reuse
@@ -64,34 +143,17 @@ def msci_scraper(company_data: pd.DataFrame, user_agents: Queue,
     while not user_agents.empty():
         original_agents.append(user_agents.get())
     
-    try:
-        # Initialize first browser instance
-        bot = reset_and_initialize(original_agents, first_attempt=True)
-        
-        # Accept initial cookies
-        cookies_path = "onetrust-accept-btn-handler"
-        bot.accept_cookies(id_name=cookies_path)
+    bot = None
+    fetcher = HttpFetcher(HTTP_URL, original_agents[0] if original_agents else None) if HTTP_ENABLED else None
+    cookies_path = "onetrust-accept-btn-handler"
 
+    try:
         # Iterate through companies
         for index, row in tqdm(company_data.iterrows(),
                              total=len(company_data),
                              desc=f"Processing chunk",
                              position=1,
                              leave=False):
-            
-            # Restart browser every 2 companies
-            if companies_processed > 0 and companies_processed % 2 == 0:
-                logging.info("Restarting browser with clean cache")
-                bot.driver.quit()
-                sleep(2)               
-                bot = reset_and_initialize(original_agents)
-                if not hasattr(bot, 'driver'):
-                    logging.error("Failed to initialize WebDriver")
-                    continue
-                
-                # Accept cookies
-                bot.accept_cookies(id_name=cookies_path)
-            
             try:
                 # Check if company has already been processed
                 with lock:
@@ -104,80 +166,85 @@ def msci_scraper(company_data: pd.DataFrame, user_agents: Queue,
                 # Clean company name to input into search bar
                 company_name = row[headername]
                 cleaned_name = clean_company_name(company_name)
-                
-                # Navigate to URL
-                bot.driver.get(URL)
-                sleep(2)
-                
-                # Send request to search bar
-                bot.send_request_to_search_bar(cleaned_name, id_name="_esgratingsprofile_keywords")
 
-                sleep(4)
+                # Try the autocomplete JSON and rating profile before starting a browser
+                if fetcher is not None:
+                    result = msci_http_fetch(fetcher, company_name, cleaned_name)
+                    if result:
+                        output.append(result)
+                        logging.info(f"Fetched data over HTTP for {company_name}")
+                        continue
+
+                # Start a browser when first needed, and recycle it every 2 companies
+                if bot is None or (companies_processed > 0 and companies_processed % 2 == 0):
+                    if bot is not None:
+                        logging.info("Recycling browser with clean cookies, cache and storage")
+                        bot.log_step_times()
+                        bot.quit()
+                    bot = reset_and_initialize(original_agents)
+                    if not hasattr(bot, 'driver'):
+                        logging.error("Failed to initialize WebDriver")
+                        bot = None
+                        continue
 
-                # Record results from dropdown menu
-                dropdown = bot.locate_element(class_name="ui-autocomplete")
+                    # Accept cookies
+                    with bot.timed_step("accept cookies"):
+                        bot.accept_cookies(id_name=cookies_path)
 
-                if dropdown:
-                    results = bot.locate_element_within_element(dropdown, class_name="msci-ac-search-section-title", multiple=True)
+                # Navigate to URL and send request to search bar
+                with bot.timed_step("search"):
+                    bot.open()
+                    bot.send_request_to_search_bar(cleaned_name, id_name="_esgratingsprofile_keywords")
 
-                results = bot.locate_element_within_element(dropdown, class_name="msci-ac-search-section-title", multiple=True)
+                    # Record results from dropdown menu once they're shown
+                    dropdown = bot.wait_visible(class_name="ui-autocomplete")
+                    search_results = bot.locate_element_within_element(dropdown, class_name="msci-ac-search-section-title", multiple=True)
 
                 # Iterate through results from dropdown menu
-                for result in results:
+                for result in search_results:
                     result_name = result.get_attribute('data-value')
                     cleaned_result = clean_company_name(result_name)
                     
                     # If the result matches the company being searched for, then try different methods of clicking on the company
                     if cleaned_result == cleaned_name:
-                        try:
-                            bot.driver.execute_script("arguments[0].click();", result)
-                        except:
+                        with bot.timed_step("open profile"):
                             try:
-                                result.click()
+                                bot.driver.execute_script("arguments[0].click();", result)
                             except:
-                                parent = bot.locate_element_within_element(result, xpath="..")
-                                bot.driver.execute_script("arguments[0].click();", parent)                        
-                        logging.info("Found match in dropdown: %s", cleaned_result)
-                        sleep(3)
-
-                        # Click on ESG Transparency toggle
-                        toggle_path = "esg-transparency-toggle-link"
-                        toggle = bot.locate_element(id_name=toggle_path)
-                        toggle.click()
-                        logging.info("Clicked ESG transparency toggle")
-                        sleep(3)
+                                try:
+                                    result.click()
+                                except:
+                                    parent = bot.locate_element_within_element(result, xpath="..")
+                                    bot.driver.execute_script("arguments[0].click();", parent)                        
+                            logging.info("Found match in dropdown: %s", cleaned_result)
+
+                            # Click on ESG Transparency toggle
+                            toggle_path = "esg-transparency-toggle-link"
+                            toggle = bot.wait_clickable(id_name=toggle_path)
+                            toggle.click()
+                            logging.info("Clicked ESG transparency toggle")
 
                         # Locate and clean ESG rating
-                        rating_map = {
-                            "esg-rating-circle-aaa": "AAA",
-                            "esg-rating-circle-aa": "AA",
-                            "esg-rating-circle-a": "A",
-                            "esg-rating-circle-bbb": "BBB",
-                            "esg-rating-circle-bb": "BB",
-                            "esg-rating-circle-b": "B",
-                            "esg-rating-circle-ccc": "CCC",
-                        }
-                        rating_section = bot.locate_element(class_name="ratingdata-container")
-                        outer_circle = bot.locate_element(class_name="ratingdata-outercircle")
-                        rating_div = bot.locate_element_within_element(outer_circle, class_name="ratingdata-company-rating")
-                        class_str = rating_div.get_attribute("class")
-                        esg_rating = next((rating for key, rating in rating_map.items() if key in class_str), "Unknown")
-                        logging.info("ESG Rating: %s", esg_rating)
-
-                        # Click on Controversies toggle
-                        controversies_toggle = bot.locate_element(id_name="esg-controversies-toggle-link")
-                        controversies_toggle.click()
-                        logging.info("Clicked controversies toggle")
-                        sleep(3)
-
-                        # Locate colors of flags representative of different causes
-                        controversies_table = bot.locate_element(id_name="controversies-table")
-                        env_flag = bot.locate_element_within_element(controversies_table, xpath=".//div[contains(@class, 'column-controversy') and contains(text(), 'Environment')]")
-                        social_flag = bot.locate_element_within_element(controversies_table, xpath=".//div[contains(@class, 'column-controversy') and contains(text(), 'Social')]")
-                        gov_flag = bot.locate_element_within_element(controversies_table, xpath=".//div[contains(@class, 'column-controversy') and contains(text(), 'Governance')]")
-                        customer_flag = bot.locate_element_within_element(controversies_table, xpath=".//div[contains(@class, 'subcolumn-controversy') and contains(text(), 'Customers')]")
-                        hr_flag = bot.locate_element_within_element(controversies_table, xpath=".//div[contains(@class, 'subcolumn-controversy') and contains(text(), 'Human Rights')]")
-                        labor_flag = bot.locate_element_within_element(controversies_table, xpath=".//div[contains(@class, 'subcolumn-controversy') and contains(text(), 'Labor Rights')]")
+                        with bot.timed_step("rating"):
+                            outer_circle = bot.wait_visible(class_name="ratingdata-outercircle")
+                            rating_div = bot.locate_element_within_element(outer_circle, class_name="ratingdata-company-rating")
+                            class_str = rating_div.get_attribute("class")
+                            esg_rating = next((rating for key, rating in RATING_MAP.items() if key in class_str), "Unknown")
+                            logging.info("ESG Rating: %s", esg_rating)
+
+                        # Click on Controversies toggle and locate colors of flags representative of different causes
+                        with bot.timed_step("controversies"):
+                            controversies_toggle = bot.wait_clickable(id_name="esg-controversies-toggle-link")
+                            controversies_toggle.click()
+                            logging.info("Clicked controversies toggle")
+
+                            controversies_table = bot.wait_visible(id_name="controversies-table")
+                            env_flag = bot.locate_element_within_element(controversies_table, xpath=".//div[contains(@class, 'column-controversy') and contains(text(), 'Environment')]")
+                            social_flag = bot.locate_element_within_element(controversies_table, xpath=".//div[contains(@class, 'column-controversy') and contains(text(), 'Social')]")
+                            gov_flag = bot.locate_element_within_element(controversies_table, xpath=".//div[contains(@class, 'column-controversy') and contains(text(), 'Governance')]")
+                            customer_flag = bot.locate_element_within_element(controversies_table, xpath=".//div[contains(@class, 'subcolumn-controversy') and contains(text(), 'Customers')]")
+                            hr_flag = bot.locate_element_within_element(controversies_table, xpath=".//div[contains(@class, 'subcolumn-controversy') and contains(text(), 'Human Rights')]")
+                            labor_flag = bot.locate_element_within_element(controversies_table, xpath=".//div[contains(@class, 'subcolumn-controversy') and contains(text(), 'Labor Rights')]")
 
                         # Append dictionary with company results to list
                         output.append({
@@ -195,36 +262,24 @@ def msci_scraper(company_data: pd.DataFrame, user_agents: Queue,
 
             except Exception as e:
                 logging.error(f"Error processing company {row[headername]}: {e}")
+                note_failure(classify_failure(e), str(e))
                 continue
         return output
     except Exception as e:
         logging.error(f"Error in scraper: {e}")
+        note_failure(classify_failure(e), str(e))
         return None
     
     # Quit the webdriver once finished with assigned companies
     finally:
-        if 'bot' in locals() and hasattr(bot, 'driver'):
-            bot.driver.quit()
+        if fetcher is not None:
+            fetcher.close()
+        if bot is not None and hasattr(bot, 'driver'):
+            bot.log_step_times()
+            bot.quit()
 
 # If file is run, applies Threader function to msci_scraper function 
 # and outputs results to export_path
 if __name__ == "__main__":
-    Threader(msci_scraper, export_path)
-    
-    try:
-        logging.info("Checking for missing companies") 
-        msci_df = pd.read_csv(export_path)
-        sp500_df = pd.read_csv('api/data/SP500.csv')
-        sp500_df = sp500_df.head(4)  # Needs to match number of inputs in the threader function 
-
-        msci_companies = set(msci_df['MSCI_company']) 
-        sp500_companies = set(sp500_df['Longname'])
-
-        missing_companies = list(sp500_companies - msci_companies)
-        logging.info(f"Found {len(missing_companies)} missing companies")
-        
-        # Re-run Threader function if missing companies identified
-        if missing_companies is not None: 
-            Threader(missing_companies, msci_scraper, export_path)
-    except: 
-        logging.error("Error processing missing companies")
\ No newline at end of file
+    # Companies that fail transiently are retried during the run, and the rest are listed in the failure report
+    Threader(msci_scraper, export_path, provider_url=URL)
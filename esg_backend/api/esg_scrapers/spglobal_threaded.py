@@ -3,13 +3,14 @@
 
 from utils.scraper_utils.scraper import  WebScraper
 from utils.scraper_utils.threader import Threader
+from utils.scraper_utils.retry import TRANSIENT_FAILURES, classify_failure, note_failure
 from selenium.webdriver.common.keys import Keys
+from selenium.webdriver.support import expected_conditions as EC
 import logging
 import pandas as pd
 from queue import Queue
 from tqdm import tqdm
 from threading import Lock
-from time import sleep
 
 # Configure logging
 logging.basicConfig(
@@ -22,8 +23,12 @@ URL = "https://www.spglobal.com/esg/scores/"
 headername = 'Longname'
 export_path = 'api/data/spglobal.csv'
 
+# Resource types S&P Global's pages need; the scores are plain text, so every type is blocked
+ALLOWED_RESOURCES = set()
+
 def spglobal_scraper(company_data: pd.DataFrame, user_agents: Queue, 
-                    processed_tickers: set, lock: Lock) -> list[dict]:
+                    processed_tickers: set, lock: Lock,
+                    results: list = None) -> list[dict]:
     '''
     This function scrapes SPGlobal. 
 
@@ -32,18 +37,20 @@ def spglobal_scraper(company_data: pd.DataFrame, user_agents: Queue,
         user_agents: [queue] Queue of user agents.
         processed_tickers: [set] Tickers of companies that have been processed by all threads.
         lock: [lock] Places a lock on a company as it is being processed to avoid conflicts between threads.
+        results: [list] List the results are appended to as each company is scraped (a new list if None).
 
     Returns:
         [list[dict]] : List of dictionaries where each dictionary contains the scraping results for 1 company.
     '''
     try:
         # Initialize browser
-        bot = WebScraper(URL, user_agents)
-        results = []
+        bot = WebScraper(URL, user_agents, allowed_resources=ALLOWED_RESOURCES)
+        results = results if results is not None else []
 
         # Accept cookies
         cookies_xpath = '//*[@id="onetrust-accept-btn-handler"]'
-        bot.accept_cookies(cookies_xpath)
+        with bot.timed_step("accept cookies"):
+            bot.accept_cookies(cookies_xpath)
 
         # Iterate through all companies in this subset
         for idx, row in tqdm(company_data.iterrows(),
@@ -60,20 +67,24 @@ def spglobal_scraper(company_data: pd.DataFrame, user_agents: Queue,
                     processed_tickers.add(row[headername])
                 logging.debug(f"Processing company: {row[headername]}")
                 
-                # Send request to search bar
-                search_bar = bot.send_request_to_search_bar(row[headername], class_name='banner-search__input')
-                search_bar.send_keys(Keys.RETURN)
-                sleep(3)
+                # Send request to search bar, then wait for the previous company's page to be replaced
+                with bot.timed_step("search"):
+                    previous_page = bot.locate_element(id_name="company-name", multiple=True)
+                    search_bar = bot.send_request_to_search_bar(row[headername], class_name='banner-search__input')
+                    search_bar.send_keys(Keys.RETURN)
+                    if previous_page:
+                        bot.wait_until(EC.staleness_of(previous_page[0]), description="search results to load")
 
                 # Extract company details
-                ESG_Company = bot.locate_element('//*[@id="company-name"]')
-                ESG_Score = bot.locate_element(class_name="scoreModule__score")
-                ESG_Country = bot.locate_element('//*[@id="company-country"]')
-                ESG_Industry = bot.locate_element('//*[@id="company-industry"]')
-                ESG_Ticker = bot.locate_element('//*[@id="company-ticker"]')
-                ESG_environment = bot.locate_element(xpath="/html/body/div[3]/div[10]/div[1]/div/div[3]/div/div[3]/div/div/figure/div[1]/div[2]/ul/li[1]/span")
-                ESG_social = bot.locate_element(xpath="/html/body/div[3]/div[10]/div[1]/div/div[3]/div/div[3]/div/div/figure/div[2]/div[2]/ul/li[1]/span")
-                ESG_governance = bot.locate_element(xpath="/html/body/div[3]/div[10]/div[1]/div/div[3]/div/div[3]/div/div/figure/div[3]/div[2]/ul/li[1]/span")
+                with bot.timed_step("scores"):
+                    ESG_Company = bot.wait_visible('//*[@id="company-name"]')
+                    ESG_Score = bot.wait_visible(class_name="scoreModule__score")
+                    ESG_Country = bot.locate_element('//*[@id="company-country"]')
+                    ESG_Industry = bot.locate_element('//*[@id="company-industry"]')
+                    ESG_Ticker = bot.locate_element('//*[@id="company-ticker"]')
+                    ESG_environment = bot.locate_element(xpath="/html/body/div[3]/div[10]/div[1]/div/div[3]/div/div[3]/div/div/figure/div[1]/div[2]/ul/li[1]/span")
+                    ESG_social = bot.locate_element(xpath="/html/body/div[3]/div[10]/div[1]/div/div[3]/div/div[3]/div/div/figure/div[2]/div[2]/ul/li[1]/span")
+                    ESG_governance = bot.locate_element(xpath="/html/body/div[3]/div[10]/div[1]/div/div[3]/div/div[3]/div/div/figure/div[3]/div[2]/ul/li[1]/span")
 
                 # Append dictionary with company results to list
                 results.append({
@@ -89,8 +100,11 @@ def spglobal_scraper(company_data: pd.DataFrame, user_agents: Queue,
                 logging.info(f"Successfully scraped data for {row[headername]}")
             except Exception as e:
                 logging.error(f"Error processing company {row[headername]}: {e}")
-                
-                # If error processing company, append company with N/A for all values.
+                failure = note_failure(classify_failure(e), str(e))
+
+                # Transient failures are retried, so only append N/A for all values if the company can't be scraped
+                if failure in TRANSIENT_FAILURES:
+                    continue
                 results.append({
                     "SnP_ESG_Company": row[headername],
                     "SnP_ESG_Score": "N/A",
@@ -105,14 +119,16 @@ def spglobal_scraper(company_data: pd.DataFrame, user_agents: Queue,
         return results
     except Exception as e:
         logging.error(f"Error with user agent {bot.user_agent}: {e}")
+        note_failure(classify_failure(e), str(e))
         return None
     
     # Quit the webdriver once finished with assigned companies
     finally:
         if 'bot' in locals():
-            bot.driver.quit()
+            bot.log_step_times()
+            bot.quit()
 
 # If file is run, applies Threader function to spglobal_scraper function 
 # and outputs results to export_path
 if __name__ == "__main__":
-    Threader(spglobal_scraper, export_path)
\ No newline at end of file
+    Threader(spglobal_scraper, export_path, provider_url=URL)
\ No newline at end of file
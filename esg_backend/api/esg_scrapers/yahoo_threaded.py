@@ -3,12 +3,15 @@
 
 from utils.scraper_utils.scraper import WebScraper
 from utils.scraper_utils.threader import Threader
+from utils.scraper_utils.retry import classify_failure, note_failure
+from utils.scraper_utils.http_fetcher import HTTP_ENABLED, HttpFetcher, peek_user_agent
 import logging
+import os
 import pandas as pd
+import requests
 from queue import Queue
 from tqdm import tqdm
 from threading import Lock
-from time import sleep
 
 # Configure logging
 logging.basicConfig(
@@ -18,11 +21,76 @@ logging.basicConfig(
 )
 
 URL = "https://finance.yahoo.com/lookup/"
+HTTP_URL = os.environ.get("YAHOO_HTTP_URL", "https://query2.finance.yahoo.com")
+# Page that sets the session cookie Yahoo Finance ties the quote summary's crumb to
+COOKIE_URL = os.environ.get("YAHOO_COOKIE_URL", "https://fc.yahoo.com")
 export_path = 'api/data/yahoo.csv'
 headername = 'Symbol'
 
+# Resource types Yahoo Finance's pages need; the ratings are plain text, so every type is blocked
+ALLOWED_RESOURCES = set()
+
+def yahoo_crumb(fetcher: HttpFetcher) -> str | None:
+    '''
+    This function gets the crumb Yahoo Finance requires with every quote summary request.
+    The crumb is tied to a session cookie, so COOKIE_URL is visited first to set it.
+
+    Args:
+        fetcher: [HttpFetcher] Fetcher for HTTP_URL.
+
+    Returns:
+        [str] : The crumb, or None if it couldn't be fetched.
+    '''
+    # The cookie page answers with an error status, but still sets the cookie
+    try:
+        fetcher.session.get(COOKIE_URL, timeout=fetcher.timeout)
+    except requests.RequestException as e:
+        logging.warning("Failed to get Yahoo Finance's session cookie: %s", e)
+        return None
+    crumb = (fetcher.get_text("v1/test/getcrumb") or "").strip()
+    return crumb or None
+
+def yahoo_http_fetch(fetcher: HttpFetcher, ticker: str, crumb: str) -> dict | None:
+    '''
+    This function fetches a company's metrics and ESG scores from Yahoo Finance's quote summary JSON.
+
+    Args:
+        fetcher: [HttpFetcher] Fetcher for HTTP_URL, holding the session cookie of the crumb.
+        ticker: [str] The company's ticker.
+        crumb: [str] The crumb returned by yahoo_crumb.
+
+    Returns:
+        [dict] : The scraping results for the company, or None if they couldn't be fetched.
+    '''
+    data = fetcher.get_json(f"v10/finance/quoteSummary/{ticker}",
+                            {"modules": "price,summaryDetail,defaultKeyStatistics,esgScores",
+                             "crumb": crumb})
+    try:
+        modules = data["quoteSummary"]["result"][0]
+    except (KeyError, IndexError, TypeError):
+        return None
+
+    # Read the formatted value of a field, as displayed on the quote page
+    def fmt(module: str, field: str) -> str | None:
+        return (modules.get(module, {}).get(field) or {}).get("fmt")
+
+    result = {
+        "Yahoo_ESG_Company": ticker,
+        "Yahoo_Market_Cap": fmt("price", "marketCap"),
+        "Yahoo_PE_Ratio": fmt("summaryDetail", "trailingPE"),
+        "Yahoo EPS": fmt("defaultKeyStatistics", "trailingEps"),
+        "Yahoo_ESG_Total": fmt("esgScores", "totalEsg"),
+        "Yahoo_Environment": fmt("esgScores", "environmentScore"),
+        "Yahoo_Social": fmt("esgScores", "socialScore"),
+        "Yahoo Governance": fmt("esgScores", "governanceScore")
+    }
+    if result["Yahoo_ESG_Total"] is None:
+        return None
+    return result
+
 def yahoo_scraper(company_data: pd.DataFrame, user_agents: Queue, 
-                  processed_tickers: set, lock: Lock) -> list[dict]:
+                  processed_tickers: set, lock: Lock,
+                  results: list = None) -> list[dict]:
     '''
     This function scrapes Yahoo Finance. 
 
@@ -31,14 +99,16 @@ def yahoo_scraper(company_data: pd.DataFrame, user_agents: Queue,
         user_agents: [queue] Queue of user agents.
         processed_tickers: [set] Tickers of companies that have been processed by all threads.
         lock: [lock] Places a lock on a company as it is being processed to avoid conflicts between threads.
+        results: [list] List the results are appended to as each company is scraped (a new list if None).
 
     Returns:
         [list[dict]] : List of dictionaries where each dictionary contains the scraping results for 1 company.
     '''
+    bot = None
+    fetcher = HttpFetcher(HTTP_URL, peek_user_agent(user_agents)) if HTTP_ENABLED else None
+    crumb = None
     try:
-        # Initialize browser
-        bot = WebScraper(URL, user_agents)
-        output = []
+        output = results if results is not None else []
 
         # Iterate through all companies in this subset
         for index, row in tqdm(company_data.iterrows(),
@@ -54,17 +124,36 @@ def yahoo_scraper(company_data: pd.DataFrame, user_agents: Queue,
                         continue
                     processed_tickers.add(row[headername])
                 logging.debug(f"Processing company: {row[headername]}")
-                
-                # Send request to search bar
-                bot.driver.get(URL)
-                bot.send_request_to_search_bar(row[headername], id_name="ybar-sbq")
 
-                # Wait for dropdown and find results
-                results = bot.locate_element(xpath="//li[@data-type='quotes']", multiple = True)
+                # Try the quote summary JSON before starting a browser, scraping with
+                # the browser alone if no crumb can be fetched
+                if fetcher is not None and crumb is None:
+                    crumb = yahoo_crumb(fetcher)
+                    if crumb is None:
+                        logging.warning("No Yahoo Finance crumb, falling back to the browser")
+                        fetcher.close()
+                        fetcher = None
+                if fetcher is not None:
+                    result = yahoo_http_fetch(fetcher, row[headername], crumb)
+                    if result:
+                        output.append(result)
+                        logging.info(f"Fetched data over HTTP for {row[headername]}")
+                        continue
+
+                # Initialize browser
+                if bot is None:
+                    bot = WebScraper(URL, user_agents, allowed_resources=ALLOWED_RESOURCES)
+
+                # Send request to search bar and wait for the quote results in the dropdown
+                with bot.timed_step("search"):
+                    bot.open()
+                    bot.send_request_to_search_bar(row[headername], id_name="ybar-sbq")
+                    bot.wait_visible(xpath="//li[@data-type='quotes']")
+                    search_results = bot.locate_element(xpath="//li[@data-type='quotes']", multiple = True)
 
                 # Look for exact ticker match
                 target_result = None
-                for result in results:
+                for result in search_results:
                     symbol = bot.locate_element_within_element(result, class_name = "modules-module_quoteSymbol__BGsyF").text
                     if symbol == row[headername]:
                         target_result = result
@@ -73,25 +162,25 @@ def yahoo_scraper(company_data: pd.DataFrame, user_agents: Queue,
                 
                 # Click on exact ticker match
                 if target_result:
-                    target_result.click()
-                    logging.info(f"Clicked on matching result")
-                    sleep(2)
-
-                    # Extracting profitability metrics
-                    market_cap = bot.locate_element(xpath="//*[@id='nimbus-app']/section/section/section/article/div[2]/ul/li[9]/span[2]/fin-streamer").text
-                    pe_ratio = bot.locate_element(xpath="//*[@id='nimbus-app']/section/section/section/article/div[2]/ul/li[11]/span[2]/fin-streamer").text
-                    eps = bot.locate_element(xpath="//*[@id='nimbus-app']/section/section/section/article/div[2]/ul/li[12]/span[2]/fin-streamer").text
-
-                    # Locate and click Sustainability tab
-                    sustainability_tab = bot.locate_element(xpath="//*[@id='nimbus-app']/section/section/aside/section/nav/ul/li[13]/a/span")
-                    sustainability_tab.click()
-                    sleep(2)
-
-                    # Extracting ESG scores
-                    total_score = bot.locate_element(xpath="//*[@id='nimbus-app']/section/section/section/article/section[2]/section[1]/div/section[1]/div/div/h4").text
-                    environmental_score = bot.locate_element(xpath="//*[@id='nimbus-app']/section/section/section/article/section[2]/section[1]/div/section[2]/div/div/h4").text
-                    social_score = bot.locate_element(xpath="//*[@id='nimbus-app']/section/section/section/article/section[2]/section[1]/div/section[3]/div/div/h4").text
-                    governance_score = bot.locate_element(xpath="//*[@id='nimbus-app']/section/section/section/article/section[2]/section[1]/div/section[4]/div/div/h4").text
+                    with bot.timed_step("quote"):
+                        target_result.click()
+                        logging.info(f"Clicked on matching result")
+
+                        # Extracting profitability metrics once the quote page has rendered them
+                        market_cap = bot.wait_visible(xpath="//*[@id='nimbus-app']/section/section/section/article/div[2]/ul/li[9]/span[2]/fin-streamer").text
+                        pe_ratio = bot.locate_element(xpath="//*[@id='nimbus-app']/section/section/section/article/div[2]/ul/li[11]/span[2]/fin-streamer").text
+                        eps = bot.locate_element(xpath="//*[@id='nimbus-app']/section/section/section/article/div[2]/ul/li[12]/span[2]/fin-streamer").text
+
+                    with bot.timed_step("sustainability"):
+                        # Locate and click Sustainability tab
+                        sustainability_tab = bot.wait_clickable(xpath="//*[@id='nimbus-app']/section/section/aside/section/nav/ul/li[13]/a/span")
+                        sustainability_tab.click()
+
+                        # Extracting ESG scores
+                        total_score = bot.wait_visible(xpath="//*[@id='nimbus-app']/section/section/section/article/section[2]/section[1]/div/section[1]/div/div/h4").text
+                        environmental_score = bot.locate_element(xpath="//*[@id='nimbus-app']/section/section/section/article/section[2]/section[1]/div/section[2]/div/div/h4").text
+                        social_score = bot.locate_element(xpath="//*[@id='nimbus-app']/section/section/section/article/section[2]/section[1]/div/section[3]/div/div/h4").text
+                        governance_score = bot.locate_element(xpath="//*[@id='nimbus-app']/section/section/section/article/section[2]/section[1]/div/section[4]/div/div/h4").text
 
                     # Append dictionary with company results to list
                     output.append({
@@ -107,18 +196,23 @@ def yahoo_scraper(company_data: pd.DataFrame, user_agents: Queue,
                     logging.info(f"Successfully scraped data for {row[headername]}")                        
             except Exception as e:
                 logging.error(f"Error processing company {row[headername]}: {e}")
+                note_failure(classify_failure(e), str(e))
                 continue
         return output
     except Exception as e:
-        logging.error(f"Error with user agent {bot.user_agent}: {e}")
+        logging.error(f"Error in scraper: {e}")
+        note_failure(classify_failure(e), str(e))
         return None
     
     # Quit the webdriver once finished with assigned companies
     finally:
-        if 'bot' in locals():
-            bot.driver.quit()
+        if fetcher is not None:
+            fetcher.close()
+        if bot is not None and hasattr(bot, 'driver'):
+            bot.log_step_times()
+            bot.quit()
                             
 # If file is run, applies Threader function to yahoo_scraper function 
 # and outputs results to export_path
 if __name__ == "__main__":
-    Threader(yahoo_scraper, export_path)
+    Threader(yahoo_scraper, export_path, company_column=headername, provider_url=URL)
@@ -1,23 +1,111 @@
 ''' This module contains the routes for the ESG API. '''
 
+from flask import request
 from utils.route_utils.route_utils import (get_table,
                                             get_company_from_table,
-                                            get_company_scores)
+                                            get_company_scores,
+                                            get_batch_company_scores,
+                                            get_composite_score,
+                                            get_composite_rankings,
+                                            get_group_rankings,
+                                            get_company_percentiles,
+                                            get_snapshots,
+                                            get_score_diff,
+                                            get_result_cache_stats,
+                                            parse_tickers)
 
 BASE_URL="/esg_api"
+TABLE_FILTERS = ["min_esg_score", "max_esg_score", "sector", "industry"]
 
 def all_routes(app):
     @app.route('/', methods=['GET'])
     def home():
         return "Welcome to the ESG API!"
     
+    @app.route(f'{BASE_URL}/cache_stats', methods=['GET'])
+    def get_cache_stats():
+        """Returns the result cache counters in JSON format.
+
+        See get_result_cache_stats docstring for more information for returns.
+        """
+        return get_result_cache_stats()
+
+    @app.route(f'{BASE_URL}/composite', methods=['GET'])
+    def get_composite_ranking():
+        """Returns companies ranked by composite ESG score in JSON format.
+
+        Pass ?limit=N for the number of companies and ?min_coverage=K to require
+        scores from at least K providers (default 2).
+        See get_composite_rankings docstring for more information for args and returns.
+        """
+        return get_composite_rankings(limit=request.args.get("limit"),
+                                      min_coverage=request.args.get("min_coverage"))
+
+    @app.route(f'{BASE_URL}/composite/<string:ticker>', methods=['GET'])
+    def get_company_composite_score(ticker):
+        """Returns the composite ESG score of a company in JSON format.
+
+        See get_composite_score docstring for more information for args and returns.
+        """
+        return get_composite_score(ticker)
+
+    @app.route(f'{BASE_URL}/rankings', methods=['GET'])
+    def get_rankings():
+        """Returns the top companies of a sector, an industry or the whole index in JSON format.
+
+        Pass ?sector=... or ?industry=... to pick the group, ?provider=<table>
+        to rank by one provider instead of the composite score and ?top=N.
+        See get_group_rankings docstring for more information for args and returns.
+        """
+        return get_group_rankings(sector=request.args.get("sector"),
+                                  industry=request.args.get("industry"),
+                                  provider=request.args.get("provider"),
+                                  top=request.args.get("top"))
+
+    @app.route(f'{BASE_URL}/percentile/<string:ticker>', methods=['GET'])
+    def get_company_percentile(ticker):
+        """Returns a company's rank and percentile within its sector and industry in JSON format.
+
+        Pass ?provider=<table> or ?provider=composite to return a single provider.
+        See get_company_percentiles docstring for more information for args and returns.
+        """
+        return get_company_percentiles(ticker, provider=request.args.get("provider"))
+
+    @app.route(f'{BASE_URL}/snapshots', methods=['GET'])
+    def get_score_snapshots():
+        """Returns every loaded snapshot of the scores in JSON format.
+
+        See get_snapshots docstring for more information for returns.
+        """
+        return get_snapshots()
+
+    @app.route(f'{BASE_URL}/diff', methods=['GET'])
+    def get_score_changes():
+        """Returns the scores that changed between two dates in JSON format.
+
+        Pass ?from=YYYY-MM-DD&to=YYYY-MM-DD and optionally ?provider=<table>.
+        See get_score_diff docstring for more information for args and returns.
+        """
+        return get_score_diff(request.args.get("from"), request.args.get("to"),
+                              provider=request.args.get("provider"))
+
     @app.route(f'{BASE_URL}/<string:table_name>', methods=['GET'])
     def get_table_by_name(table_name):
         """Returns the table with the given name in JSON format.
 
+        Pass ?stream=json or ?stream=ndjson to stream the table in batches,
+        ?fields=a,b to select columns, ?after=<company>&limit=N to paginate and
+        ?min_esg_score, ?max_esg_score, ?sector or ?industry to filter rows.
         See get_table docstring for more information for args and returns.
         """
-        return get_table(table_name)
+        fields = request.args.get("fields")
+        filters = {name: request.args.get(name) for name in TABLE_FILTERS}
+        return get_table(table_name,
+                         stream_format=request.args.get("stream"),
+                         fields=fields.split(",") if fields else None,
+                         after=request.args.get("after"),
+                         limit=request.args.get("limit"),
+                         filters=filters)
     
     @app.route(f'{BASE_URL}/<string:table_name>/<string:ticker>', methods=['GET'])
     def get_company_data_from_table(table_name, ticker):
@@ -31,6 +119,22 @@ def all_routes(app):
     def get_company_scores_from_tables(ticker):
         """Returns the ESG scores from all tables for a company in JSON format.
 
+        Pass ?as_of=YYYY-MM-DD to get the scores as they were loaded on that day.
         See get_company_scores docstring for more information for args and returns.
         """
-        return get_company_scores(ticker)
+        return get_company_scores(ticker, as_of=request.args.get("as_of"))
+
+    @app.route(f'{BASE_URL}/all_tables', methods=['GET', 'POST'])
+    def get_batch_company_scores_from_tables():
+        """Returns the ESG scores from all tables for many companies in JSON format.
+
+        Tickers are passed as ?tickers=A,B,C or as a JSON body {"tickers": [...]},
+        and ?as_of=YYYY-MM-DD returns the scores as they were loaded on that day.
+        See get_batch_company_scores docstring for more information for args and returns.
+        """
+        if request.method == 'POST':
+            body = request.get_json(silent=True) or {}
+            tickers = body.get("tickers", []) if isinstance(body, dict) else body
+        else:
+            tickers = request.args.get("tickers", "")
+        return get_batch_company_scores(parse_tickers(tickers), as_of=request.args.get("as_of"))
@@ -1,13 +1,40 @@
 """This module creates a flask app by registering routes."""
 
+import os
 from flask import Flask
 from api.routes.routes import all_routes
+from utils.route_utils.db_pool import init_db_pool
+from utils.route_utils.http_cache import init_http_cache
+from utils.route_utils.json_provider import CompactJSONProvider
+from utils.route_utils.result_cache import init_result_cache
+from utils.route_utils.snapshot import init_snapshot
 
 
 def create_app():
     """Create a Flask Application with default parameters and a name."""
     app = Flask(__name__)
 
+    # Serialize the SQL path like the snapshot, so both return the same bytes
+    app.json = CompactJSONProvider(app)
+
+    # Share pooled read-only database connections across requests
+    pool_size = os.environ.get("DB_POOL_SIZE")
+    init_db_pool(app, int(pool_size) if pool_size else None)
+
+    # Answer conditional GETs from the database version stamp
+    max_age = os.environ.get("CACHE_MAX_AGE")
+    init_http_cache(app, int(max_age) if max_age else None)
+
+    # Bound the in-process result cache
+    cache_entries = os.environ.get("RESULT_CACHE_ENTRIES")
+    cache_bytes = os.environ.get("RESULT_CACHE_BYTES")
+    init_result_cache(int(cache_entries) if cache_entries else None,
+                      int(cache_bytes) if cache_bytes else None)
+
+    # Optionally serve table and ticker routes from a pre-serialized snapshot
+    if os.environ.get("SNAPSHOT_MODE", "").lower() in ("1", "true", "yes"):
+        init_snapshot(app)
+
     # Register routes
     all_routes(app)
 
@@ -16,4 +43,4 @@ def create_app():
 app = create_app()
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5001)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=5001)
@@ -0,0 +1,115 @@
+"""This module benchmarks the throughput of the API routes.
+
+Requests are issued through Flask's test client so the numbers measure the
+route layer (SQL, serialization, connection handling) without network noise.
+
+Usage:
+    python benchmarks/route_benchmark.py --requests 2000
+"""
+
+import argparse
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+import utils.route_utils.db_pool as db_pool
+from utils.route_utils.result_cache import init_result_cache
+from app import create_app
+
+TICKERS = ["AAPL", "MSFT", "NVDA", "AMZN", "GOOGL", "META", "JPM", "XOM"]
+TABLES = ["csrhub_table", "lseg_table", "msci_table", "spglobal_table", "yahoo_table"]
+
+
+def build_urls() -> list[str]:
+    """Builds the mix of route URLs used by the benchmark."""
+    urls = [f"/esg_api/all_tables/{ticker}" for ticker in TICKERS]
+    urls += [f"/esg_api/{table}/{ticker}" for table in TABLES for ticker in TICKERS]
+    urls += [f"/esg_api/{table}" for table in TABLES]
+    return urls
+
+def run(app, urls: list[str], num_requests: int, num_threads: int) -> float:
+    """Issues num_requests requests spread over num_threads threads.
+
+    Args:
+        app: [Flask] Flask application under test
+        urls: [list] URLs cycled through by the benchmark
+        num_requests: [int] total number of requests to issue
+        num_threads: [int] number of concurrent client threads
+
+    Returns:
+        [float]: requests per second
+    """
+    def worker(offset: int) -> None:
+        client = app.test_client()
+        for i in range(offset, num_requests, num_threads):
+            response = client.get(urls[i % len(urls)])
+            response.close()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=num_threads) as executor:
+        list(executor.map(worker, range(num_threads)))
+    return num_requests / (time.perf_counter() - start)
+
+def benchmark_pool(num_requests: int, num_threads: int) -> dict:
+    """Compares a connection per request against the pooled connections."""
+    urls = build_urls()
+    results = {}
+    for label, pool_size in (("unpooled", 0), ("pooled", db_pool.DEFAULT_POOL_SIZE)):
+        app = create_app()
+        init_result_cache(max_entries=0)
+        db_pool.pool.close_all()
+        db_pool.pool = db_pool.ConnectionPool(max_size=pool_size)
+        run(app, urls, len(urls), num_threads)  # warm up
+        results[label] = run(app, urls, num_requests, num_threads)
+    return results
+
+def benchmark_result_cache(num_requests: int, num_threads: int) -> dict:
+    """Compares per-ticker routes with the result cache off and on."""
+    urls = [url for url in build_urls() if url.count("/") == 3]
+    results = {}
+    for label, max_entries in (("uncached", 0), ("cached", None)):
+        app = create_app()
+        init_result_cache(max_entries=max_entries)
+        run(app, urls, len(urls), num_threads)  # warm up
+        results[label] = run(app, urls, num_requests, num_threads)
+    return results
+
+def benchmark_snapshot(num_requests: int, num_threads: int) -> dict:
+    """Compares per-request latency of the SQL path against snapshot mode.
+
+    Both modes run without the result cache so the SQL path queries every time.
+
+    Returns:
+        [dict]: mode mapped to (mean, p50, p99) latency in microseconds
+    """
+    urls = build_urls()
+    results = {}
+    for label, snapshot_mode in (("sql", "0"), ("snapshot", "1")):
+        os.environ["SNAPSHOT_MODE"] = snapshot_mode
+        app = create_app()
+        init_result_cache(max_entries=0)
+        client = app.test_client()
+        latencies = []
+        for i in range(len(urls) + num_requests):
+            start = time.perf_counter()
+            client.get(urls[i % len(urls)]).close()
+            if i >= len(urls):  # skip the warm up pass
+                latencies.append((time.perf_counter() - start) * 1e6)
+        latencies.sort()
+        results[label] = (statistics.mean(latencies),
+                          latencies[len(latencies) // 2],
+                          latencies[int(len(latencies) * 0.99)])
+    os.environ.pop("SNAPSHOT_MODE")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the ESG API routes.")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per mode")
+    parser.add_argument("--threads", type=int, default=4, help="Concurrent client threads")
+    args = parser.parse_args()
+
+    for benchmark in (benchmark_pool, benchmark_result_cache):
+        for label, rps in benchmark(args.requests, args.threads).items():
+            print(f"{label:>10}: {rps:8.1f} requests/sec")
+    for label, (mean, p50, p99) in benchmark_snapshot(args.requests, args.threads).items():
+        print(f"{label:>10}: mean {mean:8.1f} us, p50 {p50:8.1f} us, p99 {p99:8.1f} us")
@@ -0,0 +1,131 @@
+"""This module tests the MSCI and Yahoo Finance HTTP fetch paths against recorded responses.
+
+The fixtures in tests/fixtures are served by a local server that, like Yahoo Finance,
+only answers the quote summary with the crumb of the session cookie it set.
+
+Usage:
+    PYTHONPATH=. python -m unittest discover -s tests
+"""
+
+import os
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+# Don't pace the requests to the local server
+os.environ.setdefault("SCRAPER_RATE", "1000")
+
+from api.esg_scrapers import msci_threaded, yahoo_threaded
+from api.esg_scrapers.msci_threaded import SEARCH_PATH, msci_http_fetch
+from api.esg_scrapers.yahoo_threaded import yahoo_crumb, yahoo_http_fetch
+from utils.scraper_utils.cleaning_utils import clean_company_name
+from utils.scraper_utils.http_fetcher import HttpFetcher
+
+FIXTURES = Path(__file__).parent / "fixtures"
+COOKIE = "A3=fixture-session"
+CRUMB = "fixtureCrumb"
+MSCI_ISSUER_ID = "IID000000002157615"
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """Serves the fixture responses for the MSCI search tool and Yahoo Finance."""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        has_cookie = COOKIE in (self.headers.get("Cookie") or "")
+
+        if url.path == "/cookie":
+            self.respond(404, "text/plain", b"", {"Set-Cookie": f"{COOKIE}; Path=/"})
+        elif url.path == "/v1/test/getcrumb":
+            if has_cookie:
+                self.respond(200, "text/plain", CRUMB.encode())
+            else:
+                self.respond(401, "text/plain", b"")
+        elif url.path == "/v10/finance/quoteSummary/AAPL":
+            if has_cookie and query.get("crumb") == CRUMB:
+                self.respond(200, "application/json", (FIXTURES / "yahoo_quote_summary.json").read_bytes())
+            else:
+                self.respond(401, "application/json",
+                             b'{"finance":{"result":null,"error":{"code":"Unauthorized","description":"Invalid Crumb"}}}')
+        elif url.path == f"/{SEARCH_PATH}" and query.get("p_p_resource_id") == "searchEsgRatingsProfiles":
+            self.respond(200, "application/json", (FIXTURES / "msci_autocomplete.json").read_bytes())
+        elif (url.path == f"/{SEARCH_PATH}" and query.get("p_p_resource_id") == "showEsgRatingsProfile"
+              and query.get("_esg_ratings_profile_issuerId") == MSCI_ISSUER_ID):
+            self.respond(200, "text/html", (FIXTURES / "msci_profile.html").read_bytes())
+        else:
+            self.respond(404, "text/plain", b"")
+
+    def respond(self, status: int, content_type: str, body: bytes, headers: dict = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class HttpFetchTest(unittest.TestCase):
+    """Tests the rows parsed from the fixture responses."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.fetcher = HttpFetcher(self.base_url)
+
+    def tearDown(self):
+        self.fetcher.close()
+
+    def test_msci_rating_and_flags(self):
+        result = msci_http_fetch(self.fetcher, "Apple Inc.", clean_company_name("Apple Inc."))
+        self.assertEqual(result, {
+            "MSCI_Company": "Apple Inc.",
+            "MSCI_ESG_Rating": "BBB",
+            "MSCI_Environment_Flag": "Green",
+            "MSCI_Social_Flag": "Orange",
+            "MSCI_Governance_Flag": "Yellow",
+            "MSCI_Customer_Flag": "Yellow",
+            "MSCI_Human_Rights_Flag": "Orange",
+            "MSCI_Labor_Rights_Flag": "Yellow",
+        })
+
+    def test_msci_unmatched_company(self):
+        self.assertIsNone(msci_http_fetch(self.fetcher, "Pear Inc.", clean_company_name("Pear Inc.")))
+
+    def test_yahoo_metrics_and_scores(self):
+        with mock.patch.object(yahoo_threaded, "COOKIE_URL", f"{self.base_url}/cookie"):
+            crumb = yahoo_crumb(self.fetcher)
+        self.assertEqual(crumb, CRUMB)
+        self.assertEqual(yahoo_http_fetch(self.fetcher, "AAPL", crumb), {
+            "Yahoo_ESG_Company": "AAPL",
+            "Yahoo_Market_Cap": "3.44T",
+            "Yahoo_PE_Ratio": "35.12",
+            "Yahoo EPS": "6.57",
+            "Yahoo_ESG_Total": "18.8",
+            "Yahoo_Environment": "0.6",
+            "Yahoo_Social": "7.4",
+            "Yahoo Governance": "10.8",
+        })
+
+    def test_yahoo_requires_crumb(self):
+        self.assertIsNone(yahoo_http_fetch(self.fetcher, "AAPL", "staleCrumb"))
+
+
+if __name__ == "__main__":
+    unittest.main()
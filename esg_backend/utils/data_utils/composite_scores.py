@@ -0,0 +1,147 @@
+"""This module precomputes cross-provider composite ESG scores with NumPy."""
+
+import logging
+import numpy as np
+
+# Providers whose score measures ESG risk, so a lower score is better
+LOWER_IS_BETTER = ["yahoo_table"]
+
+
+def load_score_matrix(conn, scores_table_name: str, sp500_table_name: str,
+                      pillar: str = "esg") -> tuple:
+    """Reads one pillar of every provider's scores into a (ticker x provider) matrix.
+
+    Args:
+        conn: [sqlite3.Connection] SQLite connection
+        scores_table_name: [str] Name of the long-format scores table
+        sp500_table_name: [str] Name of the S&P 500 table
+        pillar: [str] Pillar of the scores to read
+
+    Returns:
+        [tuple]: List of tickers, list of providers and the score matrix, with
+        NaN where a provider has no score for a ticker
+    """
+    rows = conn.execute(f"""
+        SELECT ticker, provider, value FROM {scores_table_name}
+        WHERE pillar = ? AND ticker IN (SELECT ticker FROM {sp500_table_name})
+    """, (pillar,)).fetchall()
+
+    tickers = sorted({row[0] for row in rows})
+    providers = sorted({row[1] for row in rows})
+    ticker_ids = {ticker: i for i, ticker in enumerate(tickers)}
+    provider_ids = {provider: i for i, provider in enumerate(providers)}
+
+    matrix = np.full((len(tickers), len(providers)), np.nan)
+    if rows:
+        ticker_column, provider_column, values = zip(*rows)
+        matrix[[ticker_ids[t] for t in ticker_column], [provider_ids[p] for p in provider_column]] = \
+            np.array(values, dtype=np.float64)
+    return tickers, providers, matrix
+
+def percentile_ranks(matrix: np.ndarray) -> np.ndarray:
+    """Computes each score's percentile rank among its provider's scores.
+
+    Tied scores share the midpoint of their ranks; missing scores stay NaN.
+
+    Args:
+        matrix: [np.ndarray] (ticker x provider) score matrix
+
+    Returns:
+        [np.ndarray]: Percentile ranks from 0 to 100, in the same layout
+    """
+    percentiles = np.full(matrix.shape, np.nan)
+    for column in range(matrix.shape[1]):
+        values = matrix[:, column]
+        present = ~np.isnan(values)
+        ranked = np.sort(values[present])
+        if not len(ranked):
+            continue
+        below = np.searchsorted(ranked, values[present], side="left")
+        at_or_below = np.searchsorted(ranked, values[present], side="right")
+        percentiles[present, column] = 100 * (below + 0.5 * (at_or_below - below)) / len(ranked)
+    return percentiles
+
+def z_scores(matrix: np.ndarray) -> np.ndarray:
+    """Standardizes each provider's scores to zero mean and unit variance.
+
+    Args:
+        matrix: [np.ndarray] (ticker x provider) score matrix
+
+    Returns:
+        [np.ndarray]: z-scores in the same layout (0 where a provider's scores don't vary)
+    """
+    mean = np.nanmean(matrix, axis=0)
+    std = np.nanstd(matrix, axis=0)
+    return (matrix - mean) / np.where(std > 0, std, 1.0)
+
+def create_composite_tables(conn, composite_table_name: str, percentiles_table_name: str) -> None:
+    """Create the composite score table and the per-provider percentile table."""
+    conn.execute(f"""
+    CREATE TABLE {composite_table_name} (
+        ticker TEXT PRIMARY KEY,
+        composite_score REAL NOT NULL,
+        composite_z REAL NOT NULL,
+        coverage INTEGER NOT NULL,
+        rank INTEGER NOT NULL
+    ) WITHOUT ROWID
+    """)
+    conn.execute(f"CREATE INDEX idx_{composite_table_name}_rank ON {composite_table_name} (rank)")
+    conn.execute(f"""
+    CREATE TABLE {percentiles_table_name} (
+        ticker TEXT NOT NULL,
+        provider TEXT NOT NULL,
+        percentile REAL NOT NULL,
+        z_score REAL NOT NULL,
+        PRIMARY KEY (ticker, provider)
+    ) WITHOUT ROWID
+    """)
+    conn.commit()
+
+def build_composite_scores(conn, scores_table_name: str = "scores",
+                           sp500_table_name: str = "sp500_table",
+                           composite_table_name: str = "composite_scores",
+                           percentiles_table_name: str = "score_percentiles",
+                           lower_is_better: list = LOWER_IS_BETTER) -> None:
+    """Computes a composite ESG score for every S&P 500 company that has a score.
+
+    Each provider's overall scores are converted to percentile ranks and z-scores
+    (flipping the providers in lower_is_better so higher is always better). A
+    company's composite score is the mean of its available percentiles, and its
+    coverage is the number of providers that scored it.
+
+    Args:
+        conn: [sqlite3.Connection] SQLite connection
+        scores_table_name: [str] Name of the long-format scores table
+        sp500_table_name: [str] Name of the S&P 500 table
+        composite_table_name: [str] Name of the composite score table to create
+        percentiles_table_name: [str] Name of the per-provider percentile table to create
+        lower_is_better: [list] Providers whose lower scores are better
+    """
+    tickers, providers, matrix = load_score_matrix(conn, scores_table_name, sp500_table_name)
+    flip = np.array([-1.0 if provider in lower_is_better else 1.0 for provider in providers])
+    matrix = matrix * flip
+
+    percentiles = percentile_ranks(matrix)
+    z = z_scores(matrix)
+    present = ~np.isnan(matrix)
+    coverage = present.sum(axis=1)
+
+    # Average over the providers that scored each company
+    scored = coverage > 0
+    composite = np.where(present, percentiles, 0.0).sum(axis=1) / np.maximum(coverage, 1)
+    composite_z = np.where(present, z, 0.0).sum(axis=1) / np.maximum(coverage, 1)
+
+    # Rank by composite score, breaking ties by coverage and then ticker
+    order = [i for i in np.lexsort((np.arange(len(tickers)), -coverage, -composite)) if scored[i]]
+    ranks = {i: rank for rank, i in enumerate(order, start=1)}
+
+    create_composite_tables(conn, composite_table_name, percentiles_table_name)
+    conn.executemany(f"INSERT INTO {composite_table_name} VALUES (?, ?, ?, ?, ?)",
+                     [(tickers[i], float(composite[i]), float(composite_z[i]), int(coverage[i]), rank)
+                      for i, rank in ranks.items()])
+    rows, columns = np.nonzero(present)
+    conn.executemany(f"INSERT INTO {percentiles_table_name} VALUES (?, ?, ?, ?)",
+                     [(tickers[i], providers[j], float(percentiles[i, j]), float(z[i, j]))
+                      for i, j in zip(rows, columns)])
+    conn.commit()
+    logging.info(f"Computed composite scores for {len(ranks)} companies from {len(providers)} providers")
@@ -5,13 +5,16 @@ import os
 from loading_utils import (
     create_tables_and_load_data,
     create_empty_sqlite_db,
+    create_db_connection,
+    analyze_db,
+    report_query_plans,
     rm_db,
 )
 
 DATA_DIR = os.environ["DATA_DIR"]
 
 if __name__ == "__main__":
-    command_list = ["db_create", "db_load", "db_rm", "db_clean"]
+    command_list = ["db_create", "db_load", "db_rm", "db_clean", "db_analyze"]
     parser = argparse.ArgumentParser(description="Manage the SQLite database.")
 
     parser.add_argument(
@@ -43,3 +46,14 @@ if __name__ == "__main__":
                                     lseg_table_name , msci_table_name,
                                     spglobal_table_name, yahoo_table_name,
                                     sp500_table_name)
+    if args.command == "db_analyze":
+        conn = create_db_connection()
+        analyze_db(conn)
+        provider_table_names = [csrhub_table_name, lseg_table_name, msci_table_name,
+                                spglobal_table_name, yahoo_table_name]
+        plans = report_query_plans(conn, provider_table_names, sp500_table_name)
+        for query, plan in plans.items():
+            print(query)
+            for step in plan:
+                print(f"    {step}")
+        conn.close()
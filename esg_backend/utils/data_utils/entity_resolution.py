@@ -0,0 +1,229 @@
+"""This module resolves provider company names to S&P 500 tickers with fuzzy matching."""
+
+import csv
+import logging
+import re
+import numpy as np
+
+# Scores range from 0 (no shared n-grams) to 1 (same normalized name)
+MATCH_THRESHOLD = 0.85
+AUDIT_THRESHOLD = 0.95
+
+# Minimum lead the best ticker must have over the runner-up ticker to be accepted
+MIN_MARGIN = 0.05
+
+NGRAM_SIZE = 3
+
+# Upper bound on the cells of the dense (names x candidates) score matrix scored at once
+MAX_SCORE_CELLS = 4_000_000
+
+# Words that carry no information about which company a name refers to
+NAME_STOPWORDS = {
+    "the", "inc", "incorporated", "corp", "corporation", "co", "company", "companies",
+    "ltd", "limited", "plc", "llc", "lp", "sa", "nv", "ag", "se", "holdings", "holding",
+    "class", "new",
+}
+
+AUDIT_COLUMNS = ["table_name", "company", "ticker", "matched_name", "score", "runner_up_score", "accepted"]
+
+
+def normalize_company_name(name: str) -> str:
+    """Normalize a company name for fuzzy matching.
+
+    Parenthesized qualifiers, punctuation and legal-form words are dropped and
+    a trailing share class letter is removed, e.g. "Alphabet Inc. Class A" and
+    "Alphabet Inc" both become "alphabet".
+
+    Args:
+        name: [str] Name to be normalized.
+
+    Returns:
+        [str] : Normalized name.
+    """
+    name = re.sub(r"\(.*?\)", " ", name.lower()).replace("&", " and ")
+    words = [word for word in re.split(r"[^a-z0-9]+", name) if word]
+    if len(words) > 2 and words[-2] == "class" and len(words[-1]) == 1:
+        words = words[:-2]
+    return " ".join(word for word in words if word not in NAME_STOPWORDS)
+
+def company_ngrams(name: str, n: int = NGRAM_SIZE) -> set:
+    """Split a normalized name into its set of character n-grams.
+
+    Args:
+        name: [str] Normalized name.
+        n: [int] Length of each n-gram.
+
+    Returns:
+        [set] : Character n-grams, padded so word starts and ends are weighted.
+    """
+    padded = f"  {name} "
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+class NameIndex():
+    '''
+    This class indexes candidate company names by their character n-grams.
+
+    Each name is scored against every candidate sharing at least one n-gram
+    with it (the inverted index is the blocking step), using the Dice
+    coefficient of the two n-gram sets. Names are scored in batches as a dense
+    (names x candidates) matrix so the work is vectorized with numpy.
+
+    Attributes:
+        names: [list] Normalized candidate names.
+        tickers: [list] Ticker each candidate name belongs to.
+    '''
+
+    def __init__(self, names: list, tickers: list):
+        self.names = []
+        self.tickers = []
+        seen = set()
+        for name, ticker in zip(names, tickers):
+            normalized = normalize_company_name(name) if name else ""
+            # When two companies share a name the first one wins
+            if normalized and normalized not in seen:
+                seen.add(normalized)
+                self.names.append(normalized)
+                self.tickers.append(ticker)
+
+        postings = {}
+        sizes = []
+        for candidate_id, name in enumerate(self.names):
+            grams = company_ngrams(name)
+            sizes.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, []).append(candidate_id)
+        self._postings = {gram: np.array(ids, dtype=np.int64) for gram, ids in postings.items()}
+        self._sizes = np.array(sizes, dtype=np.float64)
+
+        ticker_ids = {}
+        self._ticker_ids = np.array([ticker_ids.setdefault(ticker, len(ticker_ids))
+                                     for ticker in self.tickers], dtype=np.int64)
+
+    @classmethod
+    def from_table(cls, conn, sp500_table_name: str) -> "NameIndex":
+        '''
+        This function indexes the short and long names of every S&P 500 company.
+
+        Args:
+            conn: [sqlite3.Connection] SQLite connection.
+            sp500_table_name: [str] Name of the S&P 500 table.
+
+        Returns:
+            [NameIndex] : Index over the table's company names.
+        '''
+        rows = conn.execute(f"SELECT ticker, short_name, long_name FROM {sp500_table_name} ORDER BY rowid")
+        names, tickers = [], []
+        for ticker, short_name, long_name in rows:
+            names += [short_name, long_name]
+            tickers += [ticker, ticker]
+        return cls(names, tickers)
+
+    def match(self, names: list) -> list:
+        '''
+        This function finds the best matching ticker for each name.
+
+        Args:
+            names: [list] Raw company names to resolve.
+
+        Returns:
+            [list] : A (ticker, matched_name, score, runner_up_score) tuple per name,
+            where runner_up_score is the best score of any other ticker.
+        '''
+        num_candidates = len(self.names)
+        if not names or not num_candidates:
+            return [(None, None, 0.0, 0.0) for _ in names]
+
+        batch_size = max(1, MAX_SCORE_CELLS // num_candidates)
+        matches = []
+        for start in range(0, len(names), batch_size):
+            matches += self._match_batch(names[start:start + batch_size])
+        return matches
+
+    def _match_batch(self, names: list) -> list:
+        '''
+        This function scores one batch of names against all candidates at once.
+        '''
+        num_candidates = len(self.names)
+        rows, columns, sizes = [], [], []
+        for row, name in enumerate(names):
+            grams = company_ngrams(normalize_company_name(name or ""))
+            sizes.append(len(grams))
+            for gram in grams:
+                candidate_ids = self._postings.get(gram)
+                if candidate_ids is not None:
+                    columns.append(candidate_ids)
+                    rows.append(np.full(len(candidate_ids), row, dtype=np.int64))
+
+        # Count the n-grams each name shares with each candidate
+        overlap = np.zeros(len(names) * num_candidates, dtype=np.float64)
+        if columns:
+            cells = np.concatenate(rows) * num_candidates + np.concatenate(columns)
+            overlap = np.bincount(cells, minlength=len(overlap)).astype(np.float64)
+        overlap = overlap.reshape(len(names), num_candidates)
+
+        scores = 2 * overlap / (np.array(sizes, dtype=np.float64)[:, None] + self._sizes[None, :])
+        best = scores.argmax(axis=1)
+        best_scores = scores[np.arange(len(names)), best]
+
+        # The runner-up is the best candidate belonging to a different ticker
+        same_ticker = self._ticker_ids[None, :] == self._ticker_ids[best][:, None]
+        runner_up_scores = np.where(same_ticker, 0.0, scores).max(axis=1)
+
+        return [(self.tickers[candidate], self.names[candidate], float(score), float(runner_up))
+                if score > 0 else (None, None, 0.0, 0.0)
+                for candidate, score, runner_up in zip(best, best_scores, runner_up_scores)]
+
+
+def resolve_company_names(conn, table_name: str, sp500_table_name: str, name_index: NameIndex,
+                          threshold: float = MATCH_THRESHOLD,
+                          audit_threshold: float = AUDIT_THRESHOLD) -> list:
+    """Fuzzy matches the company names in a table that aren't tickers yet.
+
+    A match is applied when its score reaches threshold and beats every other
+    ticker by MIN_MARGIN. Matches scoring under audit_threshold, applied or not,
+    are returned for review.
+
+    Args:
+        conn: [sqlite3.Connection] SQLite connection
+        table_name: [str] Name of the provider table
+        sp500_table_name: [str] Name of the S&P 500 table
+        name_index: [NameIndex] Index over the S&P 500 company names
+        threshold: [float] Minimum score for a match to be applied
+        audit_threshold: [float] Matches scoring below this are audited
+
+    Returns:
+        [list]: Audit rows (dicts keyed by AUDIT_COLUMNS) of the low-confidence matches
+    """
+    cursor = conn.execute(f"""
+        SELECT DISTINCT company FROM {table_name}
+        WHERE company NOT IN (SELECT ticker FROM {sp500_table_name})
+    """)
+    companies = [row[0] for row in cursor]
+
+    updates, audit_rows = [], []
+    for company, (ticker, matched_name, score, runner_up) in zip(companies, name_index.match(companies)):
+        accepted = score >= threshold and score - runner_up >= MIN_MARGIN
+        if accepted:
+            updates.append((ticker, company))
+        if score < audit_threshold:
+            audit_rows.append(dict(zip(AUDIT_COLUMNS, (table_name, company, ticker, matched_name,
+                                                       round(score, 4), round(runner_up, 4), accepted))))
+
+    conn.executemany(f"UPDATE {table_name} SET company = ? WHERE company = ?", updates)
+    conn.commit()
+    logging.info(f"Fuzzy matched {len(updates)} of {len(companies)} unmatched companies in {table_name}")
+    return audit_rows
+
+def write_audit_csv(audit_rows: list, audit_path: str) -> None:
+    """Writes the low-confidence matches to a CSV file for review.
+
+    Args:
+        audit_rows: [list] Audit rows returned by resolve_company_names
+        audit_path: [str] Path of the CSV file to write
+    """
+    with open(audit_path, mode='w', encoding='utf-8', newline='') as audit_file:
+        writer = csv.DictWriter(audit_file, fieldnames=AUDIT_COLUMNS)
+        writer.writeheader()
+        writer.writerows(audit_rows)
+    logging.info(f"Wrote {len(audit_rows)} low-confidence matches to {audit_path}")
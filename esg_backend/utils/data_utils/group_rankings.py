@@ -0,0 +1,127 @@
+"""This module precomputes ESG score rankings and quantiles within each sector and industry."""
+
+import logging
+import numpy as np
+from utils.data_utils.composite_scores import LOWER_IS_BETTER, load_score_matrix, percentile_ranks
+
+# Ranking groups: every company, or the companies of one sector or industry
+GROUP_TYPES = ["all", "sector", "industry"]
+
+# Name of the composite score in the ranking tables
+COMPOSITE_PROVIDER = "composite"
+
+
+def create_group_tables(conn, rankings_table_name: str, stats_table_name: str) -> None:
+    """Create the group rankings table and the group statistics table.
+
+    Rankings are keyed by rank so the top N of a group is a primary key range read.
+    """
+    conn.execute(f"""
+    CREATE TABLE {rankings_table_name} (
+        group_type TEXT NOT NULL,
+        group_name TEXT NOT NULL,
+        provider TEXT NOT NULL,
+        rank INTEGER NOT NULL,
+        ticker TEXT NOT NULL,
+        value REAL NOT NULL,
+        percentile REAL NOT NULL,
+        PRIMARY KEY (group_type, group_name, provider, rank)
+    ) WITHOUT ROWID
+    """)
+    conn.execute(f"CREATE INDEX idx_{rankings_table_name}_ticker ON {rankings_table_name} (ticker, provider)")
+    conn.execute(f"""
+    CREATE TABLE {stats_table_name} (
+        group_type TEXT NOT NULL,
+        group_name TEXT NOT NULL,
+        provider TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        mean REAL NOT NULL,
+        min REAL NOT NULL,
+        p25 REAL NOT NULL,
+        median REAL NOT NULL,
+        p75 REAL NOT NULL,
+        max REAL NOT NULL,
+        PRIMARY KEY (group_type, group_name, provider)
+    ) WITHOUT ROWID
+    """)
+    conn.commit()
+
+def rank_group(values: np.ndarray, flip: np.ndarray) -> tuple:
+    """Ranks the companies of one group within each provider.
+
+    Args:
+        values: [np.ndarray] (company x provider) scores of the group, NaN where missing
+        flip: [np.ndarray] -1 for providers whose lower scores are better, else 1
+
+    Returns:
+        [tuple]: (company x provider) ranks starting at 1 for the best score
+        (0 where missing) and percentile ranks from 0 to 100
+    """
+    oriented = values * flip
+    percentiles = percentile_ranks(oriented)
+    ranks = np.zeros(values.shape, dtype=np.int64)
+    for column in range(values.shape[1]):
+        present = np.flatnonzero(~np.isnan(oriented[:, column]))
+        # Best first; the stable sort keeps tied companies in ticker order
+        order = present[np.argsort(-oriented[present, column], kind="stable")]
+        ranks[order, column] = np.arange(1, len(order) + 1)
+    return ranks, percentiles
+
+def build_group_rankings(conn, scores_table_name: str = "scores",
+                         sp500_table_name: str = "sp500_table",
+                         composite_table_name: str = "composite_scores",
+                         rankings_table_name: str = "group_rankings",
+                         stats_table_name: str = "group_stats",
+                         lower_is_better: list = LOWER_IS_BETTER) -> None:
+    """Ranks every company's overall and composite scores within its sector and industry.
+
+    For each group and provider the companies are stored in rank order with their
+    percentile, along with the group's count, mean and quantiles of the scores.
+
+    Args:
+        conn: [sqlite3.Connection] SQLite connection
+        scores_table_name: [str] Name of the long-format scores table
+        sp500_table_name: [str] Name of the S&P 500 table
+        composite_table_name: [str] Name of the composite score table
+        rankings_table_name: [str] Name of the group rankings table to create
+        stats_table_name: [str] Name of the group statistics table to create
+        lower_is_better: [list] Providers whose lower scores are better
+    """
+    tickers, providers, matrix = load_score_matrix(conn, scores_table_name, sp500_table_name)
+
+    # Add the composite score as one more provider column
+    composite = dict(conn.execute(f"SELECT ticker, composite_score FROM {composite_table_name}"))
+    matrix = np.column_stack([matrix, [composite.get(ticker, np.nan) for ticker in tickers]])
+    providers = providers + [COMPOSITE_PROVIDER]
+    flip = np.array([-1.0 if provider in lower_is_better else 1.0 for provider in providers])
+
+    # Map every group to the rows of its companies
+    groups = {}
+    ticker_ids = {ticker: i for i, ticker in enumerate(tickers)}
+    for ticker, sector, industry in conn.execute(f"SELECT ticker, sector, industry FROM {sp500_table_name}"):
+        if ticker not in ticker_ids:
+            continue
+        for group in (("all", "all"), ("sector", sector), ("industry", industry)):
+            groups.setdefault(group, []).append(ticker_ids[ticker])
+
+    create_group_tables(conn, rankings_table_name, stats_table_name)
+    rankings, stats = [], []
+    for (group_type, group_name), rows in groups.items():
+        rows = np.array(sorted(set(rows)))
+        values = matrix[rows]
+        ranks, percentiles = rank_group(values, flip)
+        for column, provider in enumerate(providers):
+            present = ~np.isnan(values[:, column])
+            if not present.any():
+                continue
+            scores = values[present, column]
+            stats.append((group_type, group_name, provider, int(present.sum()), float(scores.mean()),
+                          *map(float, np.percentile(scores, [0, 25, 50, 75, 100]))))
+            for i in np.flatnonzero(present):
+                rankings.append((group_type, group_name, provider, int(ranks[i, column]),
+                                 tickers[rows[i]], float(values[i, column]), float(percentiles[i, column])))
+
+    conn.executemany(f"INSERT INTO {rankings_table_name} VALUES (?, ?, ?, ?, ?, ?, ?)", rankings)
+    conn.executemany(f"INSERT INTO {stats_table_name} VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", stats)
+    conn.commit()
+    logging.info(f"Ranked {len(tickers)} companies within {len(groups)} groups")
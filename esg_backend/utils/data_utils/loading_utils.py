@@ -1,11 +1,20 @@
 """This module provides utilities for database management module."""
 
 import csv
+import itertools
 import os
 import sqlite3
+import uuid
 import zipfile
+from datetime import datetime, timezone
 from pathlib import Path
+from typing import Callable
 import logging
+from utils.data_utils.composite_scores import build_composite_scores
+from utils.data_utils.entity_resolution import NameIndex, resolve_company_names, write_audit_csv
+from utils.data_utils.group_rankings import build_group_rankings
+from utils.data_utils.score_history import build_score_history
+from utils.scraper_utils.cleaning_utils import clean_company_name, csrhub_clean_company_name
 
 # Configure logging
 logging.basicConfig(
@@ -16,6 +25,29 @@ logging.basicConfig(
 
 DB_PATH = os.environ["DB_PATH"]
 
+# Name cleaning functions tried, in order, on names without an exact match
+NAME_NORMALIZERS = {
+    "clean_company_name": clean_company_name,
+    "csrhub_clean_company_name": csrhub_clean_company_name,
+}
+
+# MSCI letter ratings mapped to an ordinal, from worst (CCC) to best (AAA)
+MSCI_RATINGS = {"CCC": 1, "B": 2, "BB": 3, "BBB": 4, "A": 5, "AA": 6, "AAA": 7}
+
+# MSCI pillar flags mapped to an ordinal, from worst (Red) to best (Green)
+MSCI_FLAGS = {"Red": 1, "Orange": 2, "Yellow": 3, "Green": 4}
+
+# Number of CSV rows inserted per executemany call during a load
+LOAD_CHUNK_SIZE = 10000
+
+# Pragmas applied to read-only connections used by the routes
+READ_PRAGMAS = {
+    "query_only": "ON",
+    "cache_size": "-16000",     # ~16 MB page cache per connection
+    "mmap_size": "268435456",   # memory-map up to 256 MB of the file
+    "temp_store": "MEMORY",
+}
+
 def create_empty_sqlite_db(db_path: str = None) -> bool:
     """Creates an empty SQLite database at the specified path.
 
@@ -60,6 +92,69 @@ def create_db_connection(db_path: str = None) -> sqlite3.Connection:
     conn = sqlite3.connect(db_path)
     return conn
 
+class BulkLoadConnection(sqlite3.Connection):
+    """SQLite connection that turns a whole database build into one transaction.
+
+    The table helpers commit after every statement; on this connection those
+    commits are deferred until commit_load is called.
+    """
+
+    def commit(self) -> None:
+        """Defers the commit to commit_load."""
+        return None
+
+    def commit_load(self) -> None:
+        """Commits everything written since the build started."""
+        super().commit()
+
+def create_bulk_load_connection(db_path: str) -> BulkLoadConnection:
+    """Creates a new database file tuned for a one-off bulk build.
+
+    Journaling and fsyncs are turned off since a failed build is simply discarded,
+    and a single transaction is opened for the entire build.
+
+    Args:
+        db_path: [str] Path of the database file to build (replaced if it exists)
+
+    Returns:
+        [BulkLoadConnection]: Connection with an open build transaction
+    """
+    rm_db(db_path)
+    Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(db_path, factory=BulkLoadConnection)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("PRAGMA cache_size=-64000")
+    conn.execute("BEGIN")
+    return conn
+
+def create_readonly_db_connection(db_path: str = None) -> sqlite3.Connection:
+    """Opens a read-only SQLite connection tuned for serving queries.
+
+    The connection is opened in read-only URI mode and may be handed between
+    threads by a pool, so it is never used by two requests at once.
+
+    Args:
+        db_path: [str] Path to the SQLite database.
+
+    Returns:
+        [sqlite3.Connection]: Read-only connection to the database
+    """
+    # If no db_path is provided, use the default path
+    if not db_path:
+        db_path = DB_PATH
+
+    # If the database does not exist, raise an error
+    if not Path(db_path).exists():
+        raise FileExistsError(f"Database does not exist at: {db_path}")
+
+    # Connect to the database in read-only mode
+    uri = f"{Path(db_path).resolve().as_uri()}?mode=ro"
+    conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+    for pragma, value in READ_PRAGMAS.items():
+        conn.execute(f"PRAGMA {pragma} = {value}")
+    return conn
+
 def execute_sql_command(conn, sql_query: str) -> None:
     """Executes the given SQL command"""
     cur = conn.cursor()
@@ -153,17 +248,137 @@ def create_sp500_table(conn, table_name: str) -> None:
     """
     execute_sql_command(conn, create_table_stocks)
 
+def create_scores_table(conn, table_name: str) -> None:
+    """Create a long-format table of every provider's numeric scores.
+
+    Each row holds one pillar score of one provider for one ticker. Ratings that
+    are not numbers (MSCI letters and flags) are stored as an ordinal in value
+    with the original rating kept in label. value is left untyped so whole-number
+    scores stay integers, as they are in their provider tables.
+    """
+    create_table_scores = f"""
+    CREATE TABLE {table_name} (
+        ticker TEXT NOT NULL,
+        provider TEXT NOT NULL,
+        pillar TEXT NOT NULL,
+        value,
+        label TEXT,
+        as_of TEXT NOT NULL,
+        PRIMARY KEY (ticker, provider, pillar)
+    ) WITHOUT ROWID
+    """
+    execute_sql_command(conn, create_table_scores)
+
+def create_company_lookup_table(conn, table_name: str) -> None:
+    """Create a table mapping company names and their normalized variants to tickers."""
+    create_table_lookup = f"""
+    CREATE TABLE {table_name} (
+        method TEXT NOT NULL,
+        name TEXT NOT NULL,
+        ticker TEXT NOT NULL,
+        PRIMARY KEY (method, name)
+    ) WITHOUT ROWID
+    """
+    execute_sql_command(conn, create_table_lookup)
+
+def load_company_lookup(conn, table_name: str, sp500_table_name: str) -> None:
+    """Fills the lookup table with every name a provider may use for an S&P 500 company.
+
+    Each company's ticker, short name and long name are stored as 'exact' names,
+    and the short and long names once more under each normalizer in NAME_NORMALIZERS.
+    When two companies share a name, the first one in the S&P 500 table wins.
+
+    Args:
+        conn: [sqlite3.Connection] SQLite connection
+        table_name: [str] Name of the company lookup table
+        sp500_table_name: [str] Name of the S&P 500 table
+    """
+    rows = conn.execute(f"SELECT ticker, short_name, long_name FROM {sp500_table_name} ORDER BY rowid")
+    entries = []
+    for ticker, *names in rows:
+        entries += [("exact", name, ticker) for name in (ticker, *names) if name]
+        for method, normalizer in NAME_NORMALIZERS.items():
+            entries += [(method, normalizer(name), ticker) for name in names if name]
+    conn.executemany(f"INSERT OR IGNORE INTO {table_name} VALUES (?, ?, ?)", entries)
+    conn.commit()
+    logging.info(f"Loaded {len(entries)} company names into {table_name}")
+
+def parse_score(raw) -> tuple:
+    """Parses a numeric score, treating placeholders such as 'N/A' as missing.
+
+    Returns:
+        [tuple]: The score as an int if it's a whole number like '91', otherwise
+        a float (or None), and no label
+    """
+    if isinstance(raw, (int, float)):
+        return raw, None
+    for number in (int, float):
+        try:
+            return number(raw), None
+        except (TypeError, ValueError):
+            continue
+    return None, None
+
+def parse_msci_rating(raw) -> tuple:
+    """Parses an MSCI letter rating into its ordinal.
+
+    Returns:
+        [tuple]: The ordinal from MSCI_RATINGS (or None) and the rating
+    """
+    return MSCI_RATINGS.get(raw), raw or None
+
+def parse_msci_flag(raw) -> tuple:
+    """Parses an MSCI pillar flag into its ordinal.
+
+    Returns:
+        [tuple]: The ordinal from MSCI_FLAGS (or None) and the flag
+    """
+    return MSCI_FLAGS.get(raw), raw or None
+
+def load_scores(conn, table_name: str, score_config: dict, as_of: str) -> None:
+    """Parses each provider's overall and pillar scores into the long-format scores table.
+
+    Args:
+        conn: [sqlite3.Connection] SQLite connection
+        table_name: [str] Name of the scores table
+        score_config: [dict] Provider table name mapped to a dict of pillar to
+            the (column, parser) holding that pillar's score
+        as_of: [str] ISO timestamp of the load
+    """
+    for provider_table, pillars in score_config.items():
+        columns = ", ".join(column for column, _ in pillars.values())
+        rows = conn.execute(f"SELECT company, {columns} FROM {provider_table} ORDER BY rowid")
+        scores = []
+        for company, *raw_scores in rows:
+            for pillar, (_, parser), raw in zip(pillars, pillars.values(), raw_scores):
+                scores.append((company, provider_table, pillar, *parser(raw), as_of))
+
+        # Rows are replaced in load order so a provider's last row for a ticker wins
+        conn.executemany(f"INSERT OR REPLACE INTO {table_name} VALUES (?, ?, ?, ?, ?, ?)", scores)
+        conn.commit()
+
+    # Serve numeric filters and rankings of one provider's pillar from the index
+    execute_sql_command(conn, f"""
+        CREATE INDEX IF NOT EXISTS idx_{table_name}_provider_pillar_value
+        ON {table_name} (provider, pillar, value)
+    """)
+    logging.info(f"Loaded provider scores into {table_name}")
+
 def load_csv_to_db(conn, data_dir: str, 
                    table_name: str, csv_file_name: str, 
-                   num_columns: int) -> bool:
+                   num_columns: int, chunk_size: int = LOAD_CHUNK_SIZE) -> bool:
     """Load CSV files into an existing SQLite table.
 
+    The file is streamed and inserted in chunks of chunk_size rows, so memory use
+    does not grow with the size of the file.
+
     Args:
         conn: [sqlite3.Connection] SQLite connection
         data_dir: [str] Path to the directory containing CSV files
         table_name: [str] Name of existing table
         csv_file_name: [str] Name of CSV file to load
         num_columns: [int] Number of columns to pull data from in the CSV file
+        chunk_size: [int] Number of rows inserted per executemany call
 
     Returns:
         [bool]: True if file is loaded successfully
@@ -173,22 +388,29 @@ def load_csv_to_db(conn, data_dir: str,
     if csv_file_name in os.listdir(data_dir):
         logging.info(f"Reading file: {csv_file_name}")
         file_path = os.path.join(data_dir, csv_file_name)
-        with open(file_path, mode='r', encoding='utf-8') as csv_file:
+        with open(file_path, mode='r', encoding='utf-8', newline='') as csv_file:
             reader = csv.reader(csv_file)
             next(reader, None)  # Skip header row
-            data_to_insert = [tuple(row[:num_columns]) for row in reader]
-            
+            rows = (tuple(row[:num_columns]) for row in reader)
+
             # Get number of columns from first row of data
-            num_columns = len(data_to_insert[0]) if data_to_insert else 0
+            first_row = next(rows, None)
+            num_columns = len(first_row) if first_row else 0
+            rows = itertools.chain([first_row] if first_row else [], rows)
             placeholders = ','.join(['?' for _ in range(num_columns)])
-                
             insert_query = f"""
                 INSERT INTO {table_name} 
                 VALUES ({placeholders})
                 """
-                
-            cur.executemany(insert_query, data_to_insert)
-            logging.info(f"Loaded data from {csv_file_name} into {table_name}")
+
+            num_rows = 0
+            while True:
+                chunk = list(itertools.islice(rows, chunk_size))
+                if not chunk:
+                    break
+                cur.executemany(insert_query, chunk)
+                num_rows += len(chunk)
+            logging.info(f"Loaded {num_rows} rows from {csv_file_name} into {table_name}")
     else:
         raise FileNotFoundError(f"CSV file not found: {csv_file_name}")
     conn.commit()
@@ -203,31 +425,166 @@ def clean_spglobal_company_column(conn, table_name: str) -> None:
     """
     execute_sql_command(conn, clean_company_column)
 
-def clean_tables(conn, table_name: str) -> None:
-    """ Updates 'company' column in table with ticker from sp500_table."""
-    clean_company_column = f"""
+def normalize_name(normalizer: Callable[[str], str]) -> Callable[[str], str]:
+    """Wraps a name cleaning function so it passes empty names through unchanged."""
+    def normalize(name):
+        return normalizer(name) if name else name
+    return normalize
+
+def clean_tables(conn, table_name: str, lookup_table_name: str = "company_lookup",
+                 sp500_table_name: str = "sp500_table") -> None:
+    """Updates 'company' column in table with the ticker it resolves to.
+
+    Names are first matched exactly against the lookup table, then each
+    normalized variant in NAME_NORMALIZERS is tried on the names still unmatched.
+    Every pass is a single UPDATE joined on the lookup table's primary key.
+
+    Args:
+        conn: [sqlite3.Connection] SQLite connection
+        table_name: [str] Name of the provider table to clean
+        lookup_table_name: [str] Name of the company lookup table
+        sp500_table_name: [str] Name of the S&P 500 table
+    """
+    for method, normalizer in NAME_NORMALIZERS.items():
+        conn.create_function(method, 1, normalize_name(normalizer), deterministic=True)
+
+    resolve_exact = f"""
         UPDATE {table_name}
-        SET company = (
-            SELECT ticker 
-            FROM sp500_table 
-            WHERE {table_name}.company IN (ticker, short_name, long_name)
-            LIMIT 1
-        )
-        WHERE EXISTS (
-            SELECT 1 
-            FROM sp500_table
-            WHERE {table_name}.company IN (ticker, short_name, long_name)
+        SET company = lookup.ticker
+        FROM {lookup_table_name} AS lookup
+        WHERE lookup.method = 'exact' AND lookup.name = {table_name}.company
+    """
+    execute_sql_command(conn, resolve_exact)
+
+    for method in NAME_NORMALIZERS:
+        resolve_normalized = f"""
+            UPDATE {table_name}
+            SET company = lookup.ticker
+            FROM {lookup_table_name} AS lookup
+            WHERE lookup.method = '{method}' AND lookup.name = {method}({table_name}.company)
+            AND {table_name}.company NOT IN (SELECT ticker FROM {sp500_table_name})
+        """
+        execute_sql_command(conn, resolve_normalized)
+
+def report_unmatched_companies(conn, table_name: str, sp500_table_name: str) -> list:
+    """Logs the company names in a table that were not resolved to a ticker.
+
+    Args:
+        conn: [sqlite3.Connection] SQLite connection
+        table_name: [str] Name of the provider table
+        sp500_table_name: [str] Name of the S&P 500 table
+
+    Returns:
+        [list]: Names that could not be resolved to a ticker
+    """
+    cursor = conn.execute(f"""
+        SELECT DISTINCT company FROM {table_name}
+        WHERE company NOT IN (SELECT ticker FROM {sp500_table_name})
+        ORDER BY company
+    """)
+    unmatched = [row[0] for row in cursor]
+    if unmatched:
+        logging.warning(f"{len(unmatched)} companies in {table_name} not matched to a ticker: "
+                        f"{', '.join(map(str, unmatched))}")
+    else:
+        logging.info(f"All companies in {table_name} matched to a ticker")
+    return unmatched
+
+def write_db_version(conn, table_name: str = "db_metadata", loaded_at: str = None) -> str:
+    """Stamps the database with a new version and load time.
+
+    The API derives its cache validators (ETag and Last-Modified) from this stamp,
+    so it must be rewritten every time the data changes.
+
+    Args:
+        conn: [sqlite3.Connection] SQLite connection
+        table_name: [str] Name of the metadata table
+        loaded_at: [str] ISO timestamp of the load (defaults to now)
+
+    Returns:
+        [str]: The new version
+    """
+    version = uuid.uuid4().hex
+    if not loaded_at:
+        loaded_at = datetime.now(timezone.utc).replace(microsecond=0).isoformat()
+    execute_sql_command(conn, f"""
+        CREATE TABLE IF NOT EXISTS {table_name} (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
         )
+    """)
+    conn.executemany(f"INSERT OR REPLACE INTO {table_name} VALUES (?, ?)",
+                     [("version", version), ("loaded_at", loaded_at)])
+    conn.commit()
+    logging.info(f"Database version {version} loaded at {loaded_at}")
+    return version
+
+def read_db_version(conn, table_name: str = "db_metadata") -> tuple:
+    """Returns the (version, loaded_at) stamp written by write_db_version.
+
+    Args:
+        conn: [sqlite3.Connection] SQLite connection
+        table_name: [str] Name of the metadata table
+
+    Returns:
+        [tuple]: version string and load time as a datetime, or (None, None) if
+        the database was loaded before versions were recorded
     """
-    execute_sql_command(conn, clean_company_column)
+    try:
+        rows = dict(conn.execute(f"SELECT key, value FROM {table_name}").fetchall())
+    except sqlite3.OperationalError:
+        return None, None
+    loaded_at = rows.get("loaded_at")
+    return rows.get("version"), datetime.fromisoformat(loaded_at) if loaded_at else None
+
+def create_indexes(conn, table_name: str, columns: list) -> None:
+    """Creates an index on each of the given columns of a table."""
+    for column in columns:
+        create_index = f"""
+            CREATE INDEX IF NOT EXISTS idx_{table_name}_{column}
+            ON {table_name} ({column})
+        """
+        execute_sql_command(conn, create_index)
+    logging.info(f"Created indexes on {table_name}: {', '.join(columns)}")
+
+def analyze_db(conn) -> None:
+    """Refreshes the statistics the SQLite query planner uses to pick indexes."""
+    execute_sql_command(conn, "ANALYZE")
+    logging.info("Analyzed database")
+
+def report_query_plans(conn, provider_table_names: list, sp500_table_name: str,
+                       scores_table_name: str = "scores") -> dict:
+    """Returns the query plan SQLite picks for each lookup used by the routes.
 
-def create_tables_and_load_data(data_path, csrhub_table_name: str, 
-                                lseg_table_name: str, msci_table_name: str,
-                                spglobal_table_name: str, yahoo_table_name: str,
-                                sp500_table_name: str):
-    """Creates tables, loads data from csv files, and standardizes company names."""
-    conn = create_db_connection()
+    Args:
+        conn: [sqlite3.Connection] SQLite connection
+        provider_table_names: [list] Names of the provider tables
+        sp500_table_name: [str] Name of the S&P 500 table
+        scores_table_name: [str] Name of the scores table
 
+    Returns:
+        [dict]: SQL query mapped to the list of steps in its query plan
+    """
+    queries = [f"SELECT * FROM {table_name} WHERE company = ?" for table_name in provider_table_names]
+    queries.append(f"SELECT * FROM {scores_table_name} WHERE ticker = ?")
+    queries.append(f"SELECT ticker FROM {scores_table_name} WHERE provider = ? AND pillar = ? AND value >= ?")
+    queries += [f"SELECT ticker FROM {sp500_table_name} WHERE {column} = ?"
+                for column in ("ticker", "short_name", "long_name")]
+
+    plans = {}
+    for query in queries:
+        rows = conn.execute(f"EXPLAIN QUERY PLAN {query}", ("",) * query.count("?")).fetchall()
+        plans[query] = [row[-1] for row in rows]
+    return plans
+
+def build_tables(conn, data_path, csrhub_table_name: str, 
+                 lseg_table_name: str, msci_table_name: str,
+                 spglobal_table_name: str, yahoo_table_name: str,
+                 sp500_table_name: str, scores_table_name: str,
+                 company_lookup_table_name: str, audit_path: str):
+    """Creates tables, loads data from csv files, standardizes company names,
+    parses every provider's scores into the long-format scores table and
+    precomputes the composite scores and sector and industry rankings."""
     # Mapping of table names to their corresponding table creation functions and csv file names
     table_config = {
         sp500_table_name: (create_sp500_table, "SP500.csv", 6),
@@ -239,12 +596,99 @@ def create_tables_and_load_data(data_path, csrhub_table_name: str,
     }
 
     # Iterate through the configuration and create tables
+    audit_rows = []
     for table_name, (create_table_func, csv_file_name, num_columns) in table_config.items():
         create_table_func(conn, table_name)
         load_csv_to_db(conn, data_path, table_name, csv_file_name, num_columns)
         if table_name == spglobal_table_name: clean_spglobal_company_column(conn, table_name)
-        if table_name != sp500_table_name: clean_tables(conn, table_name)
-    
+        if table_name != sp500_table_name:
+            clean_tables(conn, table_name, company_lookup_table_name, sp500_table_name)
+            audit_rows += resolve_company_names(conn, table_name, sp500_table_name, name_index)
+            report_unmatched_companies(conn, table_name, sp500_table_name)
+
+        # Index after cleaning so the name updates don't have to maintain the index
+        if table_name == sp500_table_name:
+            create_indexes(conn, table_name, ["ticker", "short_name", "long_name"])
+            # Build the name lookup once so each provider table is resolved with joins
+            create_company_lookup_table(conn, company_lookup_table_name)
+            load_company_lookup(conn, company_lookup_table_name, sp500_table_name)
+            name_index = NameIndex.from_table(conn, sp500_table_name)
+        else:
+            create_indexes(conn, table_name, ["company"])
+
+    write_audit_csv(audit_rows, audit_path)
+
+    # Column and parser holding each provider's esg, environment, social and governance scores
+    pillar_scores = {
+        "esg": ("esg_score", parse_score),
+        "environment": ("environment_score", parse_score),
+        "social": ("social_score", parse_score),
+        "governance": ("governance_score", parse_score),
+    }
+    score_config = {
+        csrhub_table_name: {"esg": ("esg_score", parse_score)},
+        lseg_table_name: {**pillar_scores, "governance": ("government_score", parse_score)},
+        msci_table_name: {
+            "esg": ("esg_score", parse_msci_rating),
+            "environment": ("environment_flag", parse_msci_flag),
+            "social": ("social_flag", parse_msci_flag),
+            "governance": ("governance_flag", parse_msci_flag),
+        },
+        spglobal_table_name: pillar_scores,
+        yahoo_table_name: pillar_scores,
+    }
+    loaded_at = datetime.now(timezone.utc).replace(microsecond=0).isoformat()
+    create_scores_table(conn, scores_table_name)
+    load_scores(conn, scores_table_name, score_config, loaded_at)
+    build_composite_scores(conn, scores_table_name, sp500_table_name)
+    build_group_rankings(conn, scores_table_name, sp500_table_name)
+    analyze_db(conn)
+    write_db_version(conn, loaded_at=loaded_at)
+
+def create_tables_and_load_data(data_path, csrhub_table_name: str, 
+                                lseg_table_name: str, msci_table_name: str,
+                                spglobal_table_name: str, yahoo_table_name: str,
+                                sp500_table_name: str,
+                                scores_table_name: str = "scores",
+                                company_lookup_table_name: str = "company_lookup",
+                                audit_path: str = "entity_resolution_audit.csv",
+                                db_path: str = None):
+    """Builds a fresh database from the csv files and swaps it into place.
+
+    The database is built in a temporary file next to db_path in a single
+    transaction, then atomically renamed over db_path. Running API workers
+    keep reading the previous file until they reopen their connections, so
+    they never see a half-loaded database. The score history of the previous
+    database is carried over and this load is appended to it as a new snapshot.
+    """
+    # If no db_path is provided, use the default path
+    if not db_path:
+        db_path = DB_PATH
+    build_path = f"{db_path}.building"
+
+    conn = create_bulk_load_connection(build_path)
+    try:
+        build_tables(conn, data_path, csrhub_table_name, lseg_table_name,
+                     msci_table_name, spglobal_table_name, yahoo_table_name,
+                     sp500_table_name, scores_table_name,
+                     company_lookup_table_name, audit_path)
+        conn.commit_load()
+        _, loaded_at = read_db_version(conn)
+        build_score_history(conn, db_path, loaded_at.isoformat(), scores_table_name)
+        conn.execute("PRAGMA journal_mode=DELETE")
+        conn.close()
+    except Exception:
+        conn.close()
+        rm_db(build_path)
+        logging.error(f"Database build failed, {db_path} left unchanged")
+        raise
+
+    # Drop WAL files left by older WAL-mode databases so they aren't replayed into the new file
+    for suffix in ("-wal", "-shm"):
+        Path(f"{db_path}{suffix}").unlink(missing_ok=True)
+    os.replace(build_path, db_path)
+    logging.info(f"Database built and swapped into {db_path}")
+
 def rm_db(db_path: str = None) -> None:
     """Delete the Database file not recoverable, be careful."""
     # If no db_path is provided, use the default path
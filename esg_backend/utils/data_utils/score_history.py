@@ -0,0 +1,126 @@
+"""This module keeps a delta-encoded history of the scores across database loads."""
+
+import logging
+from pathlib import Path
+
+
+def create_history_tables(conn, history_table_name: str, snapshots_table_name: str) -> None:
+    """Create the snapshot and score history tables.
+
+    A history row records the value a score took from one snapshot until the next
+    row for the same score, so a load only adds rows for the scores that changed.
+    Scores that disappear from a load are recorded with removed set. Snapshots
+    are ordered by snapshot_id, since two loads can share an as_of second.
+    """
+    conn.execute(f"""
+    CREATE TABLE IF NOT EXISTS {snapshots_table_name} (
+        snapshot_id INTEGER PRIMARY KEY,
+        as_of TEXT NOT NULL,
+        changed_scores INTEGER NOT NULL
+    )
+    """)
+    conn.execute(f"""
+    CREATE TABLE IF NOT EXISTS {history_table_name} (
+        ticker TEXT NOT NULL,
+        provider TEXT NOT NULL,
+        as_of TEXT NOT NULL,
+        pillar TEXT NOT NULL,
+        value,
+        label TEXT,
+        removed INTEGER NOT NULL DEFAULT 0,
+        snapshot_id INTEGER NOT NULL,
+        PRIMARY KEY (ticker, provider, pillar, snapshot_id)
+    ) WITHOUT ROWID
+    """)
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{history_table_name}_as_of ON {history_table_name} (as_of)")
+
+def copy_previous_history(conn, previous_db_path: str, history_table_name: str,
+                          snapshots_table_name: str) -> None:
+    """Copies the snapshots and score history of the database being replaced.
+
+    Must be called outside a transaction, since SQLite can't attach a database
+    inside one.
+
+    Args:
+        conn: [sqlite3.Connection] Connection to the database being built
+        previous_db_path: [str] Path of the database being replaced
+        history_table_name: [str] Name of the score history table
+        snapshots_table_name: [str] Name of the snapshots table
+    """
+    if not Path(previous_db_path).exists():
+        return
+    conn.execute("ATTACH DATABASE ? AS previous", (previous_db_path,))
+    try:
+        tables = {row[0] for row in conn.execute("SELECT name FROM previous.sqlite_master WHERE type = 'table'")}
+        if {history_table_name, snapshots_table_name} <= tables:
+            conn.execute(f"INSERT INTO {snapshots_table_name} SELECT * FROM previous.{snapshots_table_name}")
+            conn.execute(f"INSERT INTO {history_table_name} SELECT * FROM previous.{history_table_name}")
+            conn.commit_load()
+            logging.info(f"Copied score history from {previous_db_path}")
+    finally:
+        conn.execute("DETACH DATABASE previous")
+
+def record_snapshot(conn, as_of: str, scores_table_name: str, history_table_name: str,
+                    snapshots_table_name: str) -> int:
+    """Appends the scores that changed since the last snapshot to the history.
+
+    Args:
+        conn: [sqlite3.Connection] SQLite connection
+        as_of: [str] ISO timestamp of the load
+        scores_table_name: [str] Name of the long-format scores table
+        history_table_name: [str] Name of the score history table
+        snapshots_table_name: [str] Name of the snapshots table
+
+    Returns:
+        [int]: Number of history rows added
+    """
+    cursor = conn.execute(f"INSERT INTO {snapshots_table_name} (as_of, changed_scores) VALUES (?, 0)", (as_of,))
+    snapshot_id = cursor.lastrowid
+
+    # The latest history row of every score before this snapshot
+    latest = f"""
+        SELECT ticker, provider, pillar, value, label, removed, MAX(snapshot_id)
+        FROM {history_table_name}
+        GROUP BY ticker, provider, pillar
+    """
+    added = conn.execute(f"""
+        INSERT INTO {history_table_name}
+        SELECT s.ticker, s.provider, ?, s.pillar, s.value, s.label, 0, ?
+        FROM {scores_table_name} AS s
+        LEFT JOIN ({latest}) AS l
+        ON l.ticker = s.ticker AND l.provider = s.provider AND l.pillar = s.pillar
+        WHERE l.ticker IS NULL OR l.removed OR l.value IS NOT s.value OR l.label IS NOT s.label
+    """, (as_of, snapshot_id)).rowcount
+    removed = conn.execute(f"""
+        INSERT INTO {history_table_name}
+        SELECT l.ticker, l.provider, ?, l.pillar, NULL, NULL, 1, ?
+        FROM ({latest}) AS l
+        WHERE NOT l.removed AND NOT EXISTS (
+            SELECT 1 FROM {scores_table_name} AS s
+            WHERE s.ticker = l.ticker AND s.provider = l.provider AND s.pillar = l.pillar
+        )
+    """, (as_of, snapshot_id)).rowcount
+
+    conn.execute(f"UPDATE {snapshots_table_name} SET changed_scores = ? WHERE snapshot_id = ?",
+                 (added + removed, snapshot_id))
+    logging.info(f"Snapshot {snapshot_id} at {as_of}: {added} scores changed, {removed} removed")
+    return added + removed
+
+def build_score_history(conn, previous_db_path: str, as_of: str, scores_table_name: str = "scores",
+                        history_table_name: str = "score_history",
+                        snapshots_table_name: str = "snapshots") -> None:
+    """Carries the score history of the previous database over and records this load.
+
+    Args:
+        conn: [BulkLoadConnection] Connection to the database being built, with
+            its build transaction committed
+        previous_db_path: [str] Path of the database being replaced
+        as_of: [str] ISO timestamp of the load
+        scores_table_name: [str] Name of the long-format scores table
+        history_table_name: [str] Name of the score history table
+        snapshots_table_name: [str] Name of the snapshots table
+    """
+    create_history_tables(conn, history_table_name, snapshots_table_name)
+    copy_previous_history(conn, previous_db_path, history_table_name, snapshots_table_name)
+    record_snapshot(conn, as_of, scores_table_name, history_table_name, snapshots_table_name)
+    conn.commit_load()
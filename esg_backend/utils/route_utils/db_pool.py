@@ -0,0 +1,202 @@
+''' This module contains a pool of read-only database connections shared by the routes. '''
+
+import atexit
+import logging
+import os
+import sqlite3
+from datetime import datetime, timezone
+from queue import LifoQueue, Empty, Full
+from flask import g
+from utils.data_utils.loading_utils import (DB_PATH,
+                                            create_readonly_db_connection,
+                                            read_db_version)
+
+DEFAULT_POOL_SIZE = 8
+
+# (file key, (version, loaded_at)) of the last version read from the database
+_cached_version = (None, (None, None))
+
+
+class ConnectionPool():
+    '''
+    This class keeps a bounded pool of read-only SQLite connections for one worker.
+
+    Connections are handed out to one request at a time and returned to the pool
+    when the app context ends, so a worker reuses a handful of open connections
+    instead of opening a new one per request. When a reload swaps a new database
+    file into place, connections to the old file are closed instead of reused.
+
+    Attributes:
+        db_path: [str] Path to the SQLite database (defaults to DB_PATH).
+        max_size: [int] Maximum number of idle connections kept open. A size
+        of 0 disables pooling and closes every connection after use.
+    '''
+
+    def __init__(self, db_path: str = None, max_size: int = DEFAULT_POOL_SIZE):
+        self.db_path = db_path
+        self.max_size = max_size
+        self._idle = LifoQueue(maxsize=max_size) if max_size > 0 else None
+        self._file_ids = {}
+
+    def _file_id(self) -> tuple:
+        '''
+        This function identifies the database file currently at db_path.
+        '''
+        try:
+            stat = os.stat(self.db_path or DB_PATH)
+        except FileNotFoundError:
+            return None
+        return (stat.st_dev, stat.st_ino)
+
+    def acquire(self) -> sqlite3.Connection:
+        '''
+        This function returns an idle connection to the current file or opens a new one.
+
+        Returns:
+            [sqlite3.Connection] : Read-only connection to the database.
+        '''
+        file_id = self._file_id()
+        conn = None
+        while self._idle is not None and conn is None:
+            try:
+                idle_file_id, idle_conn = self._idle.get_nowait()
+            except Empty:
+                break
+            if idle_file_id == file_id:
+                conn = idle_conn
+            else:
+                logging.info("Database file replaced, closing stale pooled connection")
+                idle_conn.close()
+        if conn is None:
+            conn = create_readonly_db_connection(self.db_path)
+        self._file_ids[id(conn)] = file_id
+        return conn
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        '''
+        This function returns a connection to the pool, closing it if the pool is full.
+
+        Args:
+            conn: [sqlite3.Connection] Connection previously returned by acquire.
+        '''
+        file_id = self._file_ids.pop(id(conn), None)
+        if self._idle is not None:
+            try:
+                self._idle.put_nowait((file_id, conn))
+                return
+            except Full:
+                pass
+        conn.close()
+
+    def close_all(self) -> None:
+        '''
+        This function closes every idle connection held by the pool.
+        '''
+        if self._idle is None:
+            return
+        while True:
+            try:
+                self._idle.get_nowait()[1].close()
+            except Empty:
+                break
+        logging.info("Closed all pooled database connections")
+
+
+pool = ConnectionPool()
+
+
+def close_db_pool() -> None:
+    """Closes the worker's pooled connections when the process exits"""
+    pool.close_all()
+
+atexit.register(close_db_pool)
+
+
+def get_db_connection() -> sqlite3.Connection:
+    """Returns the connection bound to the current app context
+
+    The first call in a request acquires a connection from the pool; later calls
+    in the same request reuse it.
+
+    Returns:
+        [sqlite3.Connection]: read-only connection to the database
+    """
+    if "db_conn" not in g:
+        g.db_conn = pool.acquire()
+    return g.db_conn
+
+def release_db_connection(exception=None) -> None:
+    """Returns the app context's connection to the pool
+
+    Args:
+        exception: [Exception] exception raised while handling the request, if any
+    """
+    conn = g.pop("db_conn", None)
+    if conn is None:
+        return
+    if exception is not None:
+        # Don't hand a connection in an unknown state to the next request
+        conn.close()
+        return
+    pool.release(conn)
+
+def db_file_key(db_path: str = None) -> tuple:
+    """Returns a key that changes whenever the database files change
+
+    Args:
+        db_path: [str] path to the SQLite database (defaults to DB_PATH)
+
+    Returns:
+        [tuple]: inode, modification time and size of the database and its WAL file
+    """
+    db_path = db_path or DB_PATH
+    key = []
+    for path in (db_path, f"{db_path}-wal"):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        key.append((stat.st_ino, stat.st_mtime_ns, stat.st_size))
+    return tuple(key)
+
+def get_db_version() -> tuple:
+    """Returns the version stamp of the loaded database
+
+    The stamp is only re-read from the database when its files change on disk,
+    over a short-lived connection so the request doesn't hold a pooled one.
+    Databases loaded before versions were recorded fall back to the file's
+    modification time and size.
+
+    Returns:
+        [tuple]: version string and load time as a datetime
+    """
+    global _cached_version
+    key = db_file_key()
+    cached_key, cached_value = _cached_version
+    if key == cached_key:
+        return cached_value
+
+    conn = create_readonly_db_connection()
+    try:
+        version, loaded_at = read_db_version(conn)
+    finally:
+        conn.close()
+    if version is None and key:
+        _, mtime_ns, size = key[0]
+        version = f"{mtime_ns:x}-{size:x}"
+        loaded_at = datetime.fromtimestamp(mtime_ns / 1e9, timezone.utc)
+    _cached_version = (key, (version, loaded_at))
+    return version, loaded_at
+
+def init_db_pool(app, max_size: int = None) -> None:
+    """Registers the connection pool teardown with the Flask app
+
+    Args:
+        app: [Flask] Flask application
+        max_size: [int] maximum number of idle connections to keep per worker
+    """
+    global pool
+    if max_size is not None and max_size != pool.max_size:
+        pool.close_all()
+        pool = ConnectionPool(pool.db_path, max_size)
+    app.teardown_appcontext(release_db_connection)
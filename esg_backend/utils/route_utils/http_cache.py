@@ -0,0 +1,101 @@
+''' This module contains HTTP caching (ETag, Last-Modified and Cache-Control) for the routes. '''
+
+from flask import current_app, g, request
+from utils.route_utils.db_pool import get_db_version
+from utils.route_utils.route_utils import validate_table_name
+
+DEFAULT_MAX_AGE = 300  # seconds
+
+# Data routes whose responses only change when the database is reloaded
+CACHED_ENDPOINTS = [
+    "get_composite_ranking",
+    "get_company_composite_score",
+    "get_rankings",
+    "get_company_percentile",
+    "get_score_snapshots",
+    "get_score_changes",
+    "get_table_by_name",
+    "get_company_data_from_table",
+    "get_company_scores_from_tables",
+    "get_batch_company_scores_from_tables",
+]
+
+
+def is_not_modified(version, loaded_at):
+    """Checks whether the client's copy matches the database version
+
+    Args:
+        version: [str] version of the loaded database
+        loaded_at: [datetime] load time of the database
+
+    Returns:
+        [bool]: True if the conditional request's validators match
+    """
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(version)
+    since = request.if_modified_since
+    return bool(since and loaded_at and loaded_at.replace(microsecond=0) <= since)
+
+def check_not_modified():
+    """Answers a conditional GET with 304 before any query runs
+
+    Only plain GETs of data routes whose arguments are known to be valid are
+    answered here, since the ETag is shared by every URL. Other conditional
+    GETs are answered by add_cache_headers once the route has returned 200.
+
+    Returns:
+        [Response]: empty 304 response if the client's copy is current, otherwise None
+    """
+    if (request.method not in ("GET", "HEAD") or request.url_rule is None
+            or request.endpoint not in CACHED_ENDPOINTS):
+        return None
+
+    version, loaded_at = get_db_version()
+    g.cache_validators = (version, loaded_at)
+
+    # Tickers and query parameters are only validated by the route itself
+    view_args = request.view_args or {}
+    if request.args or set(view_args) - {"table_name"}:
+        return None
+    if "table_name" in view_args and not validate_table_name(view_args["table_name"]):
+        return None
+
+    if is_not_modified(version, loaded_at):
+        return current_app.response_class(status=304)
+    return None
+
+def add_cache_headers(response):
+    """Adds the validators and Cache-Control header to successful GET responses
+
+    A 200 response to a conditional GET whose validators match is replaced by a 304.
+
+    Args:
+        response: [Response] response about to be sent
+
+    Returns:
+        [Response]: the same response with caching headers, or a 304 response
+    """
+    validators = g.get("cache_validators")
+    if validators is None or response.status_code not in (200, 304):
+        return response
+
+    version, loaded_at = validators
+    if response.status_code == 200 and is_not_modified(version, loaded_at):
+        response = current_app.response_class(status=304)
+    response.set_etag(version)
+    if loaded_at is not None:
+        response.last_modified = loaded_at
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config["CACHE_MAX_AGE"]
+    return response
+
+def init_http_cache(app, max_age: int = None) -> None:
+    """Registers the conditional GET handling with the Flask app
+
+    Args:
+        app: [Flask] Flask application
+        max_age: [int] seconds clients and CDNs may reuse a response without revalidating
+    """
+    app.config["CACHE_MAX_AGE"] = DEFAULT_MAX_AGE if max_age is None else max_age
+    app.before_request(check_not_modified)
+    app.after_request(add_cache_headers)
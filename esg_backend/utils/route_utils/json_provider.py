@@ -0,0 +1,35 @@
+''' This module contains the JSON serialization shared by the live routes and the snapshot. '''
+
+import json
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def serialize(obj) -> bytes:
+    """Serializes an object to the JSON bytes every route responds with
+
+    Args:
+        obj: [dict | list] object to serialize
+
+    Returns:
+        [bytes]: compact JSON with sorted keys and a trailing newline
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS | orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(obj, sort_keys=True, separators=(",", ":")) + "\n").encode()
+
+
+class CompactJSONProvider(DefaultJSONProvider):
+    '''
+    This class makes jsonify serialize with serialize, so a URL returns the same bytes
+    (and ETag and Content-Length) whether it's answered from SQL or from the snapshot,
+    in debug mode too.
+    '''
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(serialize(obj), mimetype=self.mimetype)
@@ -0,0 +1,142 @@
+''' This module contains an in-process LRU cache of serialized route results. '''
+
+import logging
+from collections import OrderedDict
+from threading import Lock
+
+DEFAULT_MAX_ENTRIES = 4096
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+
+class ResultCache():
+    '''
+    This class caches serialized JSON responses with least-recently-used eviction.
+
+    Every entry belongs to the database version it was computed from; looking up
+    a key with a newer version clears the cache, so a reload never serves stale data.
+
+    Attributes:
+        max_entries: [int] Maximum number of cached responses.
+        max_bytes: [int] Maximum total size of the cached response bodies.
+    '''
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self._version = None
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _check_version(self, version) -> None:
+        '''
+        This function clears the cache when the database version changes.
+        Must be called with the lock held.
+        '''
+        if version == self._version:
+            return
+        if self._entries:
+            self.invalidations += 1
+            logging.info("Database version changed, clearing %d cached results", len(self._entries))
+        self._entries.clear()
+        self._bytes = 0
+        self._version = version
+
+    def get(self, key, version) -> tuple:
+        '''
+        This function returns a cached (body, status) pair.
+
+        Args:
+            key: [tuple] Cache key, e.g. (table_name, ticker).
+            version: [str] Current database version.
+
+        Returns:
+            [tuple] : The cached (body, status), or None on a miss.
+        '''
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, version, body: bytes, status: int) -> None:
+        '''
+        This function caches a response body, evicting the least recently used entries.
+
+        Args:
+            key: [tuple] Cache key, e.g. (table_name, ticker).
+            version: [str] Database version the body was computed from.
+            body: [bytes] Serialized response body.
+            status: [int] HTTP status code of the response.
+        '''
+        if self.max_entries <= 0 or len(body) > self.max_bytes:
+            return
+        with self._lock:
+            self._check_version(version)
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[0])
+            self._entries[key] = (body, status)
+            self._bytes += len(body)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (evicted_body, _) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted_body)
+                self.evictions += 1
+
+    def resize(self, max_entries: int, max_bytes: int) -> None:
+        '''
+        This function changes the cache bounds and empties the cache.
+
+        Args:
+            max_entries: [int] Maximum number of cached responses (0 disables the cache).
+            max_bytes: [int] Maximum total size of the cached response bodies.
+        '''
+        with self._lock:
+            self.max_entries = max_entries
+            self.max_bytes = max_bytes
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        '''
+        This function returns the cache counters.
+
+        Returns:
+            [dict] : Hits, misses, evictions, invalidations and current size.
+        '''
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+            }
+
+
+result_cache = ResultCache()
+
+
+def init_result_cache(max_entries: int = None, max_bytes: int = None) -> None:
+    """Resizes the worker's result cache
+
+    Args:
+        max_entries: [int] maximum number of cached responses (0 disables the cache)
+        max_bytes: [int] maximum total size of cached response bodies
+    """
+    result_cache.resize(DEFAULT_MAX_ENTRIES if max_entries is None else max_entries,
+                        DEFAULT_MAX_BYTES if max_bytes is None else max_bytes)
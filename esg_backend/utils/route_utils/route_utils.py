@@ -1,7 +1,31 @@
 ''' This module contains utility functions for the routes. '''
 
-from flask import jsonify
-from utils.data_utils.loading_utils import create_db_connection
+import itertools
+import json
+import math
+from datetime import date, timedelta
+from flask import current_app, jsonify, Response, stream_with_context
+from utils.route_utils.db_pool import get_db_connection, get_db_version
+from utils.route_utils.result_cache import result_cache
+
+VALID_TABLES = ["csrhub_table", "lseg_table", "msci_table", "spglobal_table", "yahoo_table"]
+MAX_BATCH_TICKERS = 1000
+STREAM_BATCH_SIZE = 500
+STREAM_FORMATS = {"json": "application/json", "ndjson": "application/x-ndjson"}
+MAX_PAGE_SIZE = 1000
+DEFAULT_RANKING_SIZE = 100
+# Companies scored by a single provider would otherwise top the composite ranking
+DEFAULT_MIN_COVERAGE = 2
+DEFAULT_GROUP_RANKING_SIZE = 10
+# Providers ranked in the group rankings: every provider table plus the composite score
+RANKING_PROVIDERS = VALID_TABLES + ["composite"]
+# Pillars of the scores table mapped to the key each one is returned under
+SCORE_PILLARS = {
+    "esg": "esg_score",
+    "environment": "environment_score",
+    "social": "social_score",
+    "governance": "governance_score",
+}
 
 def execute_query_return_list_of_dicts_lm(conn, sql_query, params):
     """Executes SQL query with parameters and returns result
@@ -32,6 +56,124 @@ def execute_query_return_list_of_dicts_lm(conn, sql_query, params):
 
     return return_dict_list
 
+def iter_query_batches(conn, sql_query, params, batch_size=STREAM_BATCH_SIZE):
+    """Executes SQL query with parameters and yields the result in batches
+
+    Args:
+        conn: [sqlite3.Connection] connection to the database
+        sql_query: [str] SQL query to execute
+        params: [tuple] parameters to pass to the SQL query
+        batch_size: [int] number of rows fetched per batch
+
+    Yields:
+        [list]: list of dictionaries for the next batch of rows
+    """
+    cursor = conn.cursor()
+    cursor.execute(sql_query, params)
+    headers = [x[0] for x in cursor.description]
+
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        yield [dict(zip(headers, row)) for row in rows]
+
+def stream_query_response(batches, stream_format):
+    """Streams batches of rows as a chunked JSON array or as NDJSON
+
+    Args:
+        batches: [iterator] iterator of lists of row dictionaries
+        stream_format: [str] "json" for a JSON array, "ndjson" for one object per line
+
+    Returns:
+        [Response]: streaming response that pulls the next batch as it is sent
+    """
+    def generate():
+        first = True
+        if stream_format == "json":
+            yield "["
+        for batch in batches:
+            if stream_format == "ndjson":
+                yield "".join(json.dumps(row) + "\n" for row in batch)
+                continue
+            chunk = ",".join(json.dumps(row) for row in batch)
+            yield chunk if first else "," + chunk
+            first = False
+        if stream_format == "json":
+            yield "]"
+
+    return Response(stream_with_context(generate()), mimetype=STREAM_FORMATS[stream_format])
+
+# Scores of a batch of tickers as of the latest snapshot before a cutoff date
+HISTORY_SCORES_QUERY = """
+    SELECT h.ticker, h.provider, h.pillar, COALESCE(h.label, h.value)
+    FROM score_history AS h
+    WHERE h.ticker IN (SELECT value FROM json_each(?)) AND NOT h.removed
+    AND h.snapshot_id = (
+        SELECT MAX(snapshot_id) FROM score_history
+        WHERE ticker = h.ticker AND provider = h.provider AND pillar = h.pillar AND as_of < ?
+    )
+"""
+
+def parse_as_of(as_of):
+    """Parses an as_of date into the cutoff of the snapshots loaded up to that day
+
+    Args:
+        as_of: [str] date in YYYY-MM-DD format
+
+    Returns:
+        [str]: ISO date of the following day, before which the snapshots must be loaded
+
+    Raises:
+        ValueError: if as_of is not a valid date
+    """
+    try:
+        day = date.fromisoformat(as_of)
+    except (TypeError, ValueError):
+        raise ValueError("as_of must be a date (YYYY-MM-DD)")
+    return (day + timedelta(days=1)).isoformat()
+
+def group_scores(rows):
+    """Groups long-format score rows into each ticker's scores by provider
+
+    Args:
+        rows: [iterable] (ticker, provider, pillar, score) rows from the scores table
+
+    Returns:
+        [dict]: ticker mapped to provider mapped to its esg, environment, social
+        and governance scores (None where the provider has no such score)
+    """
+    result = {}
+    for ticker, provider, pillar, score in rows:
+        provider_scores = result.setdefault(ticker, {}).setdefault(
+            provider, dict.fromkeys(SCORE_PILLARS.values()))
+        provider_scores[SCORE_PILLARS[pillar]] = score
+    return result
+
+def cached_json_response(key, build_response):
+    """Serves a route result from the result cache, computing it on a miss
+
+    Only successful responses are cached; entries are dropped when the
+    database version changes.
+
+    Args:
+        key: [tuple] cache key, e.g. (table_name, ticker)
+        build_response: [callable] returns the (response, status) to cache
+
+    Returns:
+        [tuple]: JSON response and status code
+    """
+    version, _ = get_db_version()
+    cached = result_cache.get(key, version)
+    if cached is not None:
+        body, status = cached
+        return current_app.response_class(body, mimetype="application/json"), status
+
+    response, status = build_response()
+    if status == 200:
+        result_cache.put(key, version, response.get_data(), status)
+    return response, status
+
 def validate_table_name(table_name):
     """Validates the table name
 
@@ -41,38 +183,190 @@ def validate_table_name(table_name):
     Returns:
         [bool]: True if the table name is valid, False otherwise
     """
-    valid_tables = ["csrhub_table", "lseg_table", "msci_table", "spglobal_table", "yahoo_table"]
-    if table_name not in valid_tables:
+    if table_name not in VALID_TABLES:
         return False
     return True
 
-def get_table(table_name):
-    """Returns the entire table as a JSON response
+def get_table_columns(conn, table_name):
+    """Returns the column names of a table from its schema
+
+    Args:
+        conn: [sqlite3.Connection] connection to the database
+        table_name: [str] name of a validated table
+
+    Returns:
+        [list]: column names in table order
+    """
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table_name})")]
+
+def validate_fields(conn, table_name, fields):
+    """Validates requested fields against the table schema
+
+    Args:
+        conn: [sqlite3.Connection] connection to the database
+        table_name: [str] name of a validated table
+        fields: [list] requested column names
+
+    Returns:
+        [list]: columns to select, always including company, or None if a field is invalid
+    """
+    columns = get_table_columns(conn, table_name)
+    if any(field not in columns for field in fields):
+        return None
+    return ["company"] + [field for field in dict.fromkeys(fields) if field != "company"]
+
+def build_table_filters(table_name, filters):
+    """Builds the WHERE clause for the table filters
+
+    Args:
+        table_name: [str] name of a validated table
+        filters: [dict] min_esg_score, max_esg_score, sector and industry filter values
+
+    Returns:
+        [tuple]: list of SQL conditions and their parameters
+
+    Raises:
+        ValueError: if a filter value is invalid for the table
+    """
+    conditions, params = [], []
+    for name, operator in (("min_esg_score", ">="), ("max_esg_score", "<=")):
+        value = filters.get(name)
+        if value is None:
+            continue
+        try:
+            value = float(value)
+        except ValueError:
+            raise ValueError(f"{name} must be a number")
+        if not math.isfinite(value):
+            raise ValueError(f"{name} must be a finite number")
+        # Compare the parsed scores (MSCI ratings as their ordinal) using the scores index
+        conditions.append(f"""company IN (
+            SELECT ticker FROM scores WHERE provider = ? AND pillar = 'esg' AND value {operator} ?
+        )""")
+        params += [table_name, value]
+
+    # Sector and industry come from the S&P 500 table joined on ticker
+    for name in ("sector", "industry"):
+        value = filters.get(name)
+        if value is None:
+            continue
+        conditions.append(f"company IN (SELECT ticker FROM sp500_table WHERE {name} = ?)")
+        params.append(value)
+    return conditions, params
+
+def parse_limit(limit, name="limit"):
+    """Parses the page size for keyset pagination
+
+    Args:
+        limit: [str] requested page size
+        name: [str] name of the query parameter, used in error messages
+
+    Returns:
+        [int]: page size between 1 and MAX_PAGE_SIZE
+
+    Raises:
+        ValueError: if the page size is not a valid integer in range
+    """
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be an integer")
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"{name} must be between 1 and {MAX_PAGE_SIZE}")
+    return limit
+
+def get_table(table_name, stream_format=None, fields=None, after=None, limit=None, filters=None):
+    """Returns the entire table, or a filtered page of it, as a JSON response
+
+    Pages are keyset paginated on company: pass the next_after value of one page
+    as after to get the next. A page never splits the rows of one company, so
+    streaming can't be combined with pagination.
 
     Args:
         table_name: [str] name of the table to query
+        stream_format: [str] "json" or "ndjson" to stream the table in batches
+            instead of building the whole response in memory
+        fields: [list] columns to return (company is always included)
+        after: [str] return only companies sorted after this one
+        limit: [str] maximum number of companies per page
+        filters: [dict] min_esg_score, max_esg_score, sector and industry filters
 
     Returns:
-        [dict]: entire table as a JSON response
+        [dict]: table rows as a JSON response, wrapped with next_after when paginated;
+        an empty list when the filters match no rows
     """
     # Validate the table name
     if not validate_table_name(table_name):
         return jsonify({"error": "Invalid table name"}), 400
-    
+    if stream_format is not None and stream_format not in STREAM_FORMATS:
+        return jsonify({"error": "Invalid stream format"}), 400
+    if stream_format is not None and (limit is not None or after is not None):
+        return jsonify({"error": "stream cannot be combined with limit or after"}), 400
+
+    # Get the pooled DB connection
+    conn = get_db_connection()
+
+    # Validate the projection against the table schema
+    columns = "*"
+    if fields:
+        selected = validate_fields(conn, table_name, fields)
+        if selected is None:
+            return jsonify({"error": "Invalid field name"}), 400
+        columns = ", ".join(selected)
+
+    # Build the filters and pagination
+    try:
+        conditions, params = build_table_filters(table_name, filters or {})
+        page_size = parse_limit(limit) if limit is not None else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    filtered = bool(conditions)
+    keyset_conditions, keyset_params = conditions, params
+    if after is not None:
+        keyset_conditions = conditions + ["company > ?"]
+        keyset_params = params + [after]
+
     # Build the SQL query
-    query = f"SELECT * FROM {table_name}"
+    where = f" WHERE {' AND '.join(keyset_conditions)}" if keyset_conditions else ""
+    query = f"SELECT {columns} FROM {table_name}{where}"
+    paginated = page_size is not None or after is not None
+    if paginated:
+        query += " ORDER BY company, rowid"
+    if page_size is not None:
+        query += f" LIMIT {page_size}"
 
-    # Create the DB connection and execute the query
-    conn = create_db_connection()
-    result = execute_query_return_list_of_dicts_lm(conn, query, ())
+    # Stream the table, reading the first batch up front to detect an empty table
+    if stream_format:
+        batches = iter_query_batches(conn, query, tuple(keyset_params))
+        first_batch = next(batches, None)
+        if first_batch is None and not filtered:
+            return jsonify({"error": "Table not found"}), 404
+        return stream_query_response(itertools.chain([first_batch or []], batches), stream_format)
 
-    # If no data is found, return a 404 error
-    if not result:
-        return jsonify({"error": "Table not found"}), 404
+    # Execute the query
+    result = execute_query_return_list_of_dicts_lm(conn, query, tuple(keyset_params))
 
-    return jsonify(result), 200
+    if not paginated:
+        # If the table is empty, return a 404 error (filters matching no rows return an empty list)
+        if not result and not filtered:
+            return jsonify({"error": "Table not found"}), 404
+        return jsonify(result), 200
 
-def get_company_from_table(table_name, ticker):
+    # Finish the last company on a full page so the next page can start after it
+    next_after = None
+    if page_size is not None and len(result) == page_size:
+        next_after = result[-1]["company"]
+        seen = sum(1 for row in result if row["company"] == next_after)
+        remainder_where = " AND ".join(conditions + ["company = ?"])
+        remainder_query = f"""
+            SELECT {columns} FROM {table_name} WHERE {remainder_where}
+            ORDER BY rowid LIMIT -1 OFFSET {seen}
+        """
+        result += execute_query_return_list_of_dicts_lm(conn, remainder_query, tuple(params + [next_after]))
+
+    return jsonify({"results": result, "next_after": next_after}), 200
+
+def query_company_from_table(table_name, ticker):
     """Returns the company data from the table with the given name in JSON format.
 
     Args:
@@ -89,8 +383,8 @@ def get_company_from_table(table_name, ticker):
     # Build the SQL query
     query = f"SELECT * FROM {table_name} WHERE company = ?"
 
-    # Create the DB connection and execute the query
-    conn = create_db_connection()
+    # Get the pooled DB connection and execute the query
+    conn = get_db_connection()
     result = execute_query_return_list_of_dicts_lm(conn, query, (ticker,))
 
     # If no data is found, return a 404 error
@@ -99,29 +393,355 @@ def get_company_from_table(table_name, ticker):
 
     return jsonify(result), 200
 
-def get_company_scores(ticker):
+def query_company_scores(ticker, as_of_cutoff=None):
     """Returns the ESG scores from all tables for a company in JSON format.
 
+    Scores are read from the long-format scores table built at load time,
+    so the lookup is a single primary key range read. Past scores are read
+    from the score history instead.
+
     Args:
         ticker: [str] ticker of the company to query
+        as_of_cutoff: [str] return the scores of the last snapshot loaded before
+            this date (see parse_as_of) instead of the current scores
 
     Returns:
-        [dict]: ESG scores from all tables for a company in JSON format
+        [dict]: overall and pillar ESG scores from each table for a company in JSON format
+    """
+    # MSCI scores are returned as their original rating rather than the ordinal
+    query = """
+        SELECT ticker, provider, pillar, COALESCE(label, value)
+        FROM scores
+        WHERE ticker = ?
     """
-    tables = ["csrhub_table", "lseg_table", "msci_table", "spglobal_table", "yahoo_table"]
+    params = (ticker,)
+    if as_of_cutoff is not None:
+        query, params = HISTORY_SCORES_QUERY, (json.dumps([ticker]), as_of_cutoff)
+
+    conn = get_db_connection()
+    result = group_scores(conn.execute(query, params)).get(ticker, {})
+
+    return jsonify(result), 200
+
+def parse_tickers(tickers):
+    """Normalizes a batch of tickers from a query string or JSON body
+
+    Args:
+        tickers: [str | list] comma separated string or list of tickers
+
+    Returns:
+        [list]: stripped, de-duplicated tickers in request order
+    """
+    if isinstance(tickers, str):
+        tickers = tickers.split(",")
+    if not isinstance(tickers, list):
+        return []
+    cleaned = (str(ticker).strip() for ticker in tickers)
+    return list(dict.fromkeys(ticker for ticker in cleaned if ticker))
+
+def get_company_from_table(table_name, ticker):
+    """Returns the company data from the table with the given name in JSON format.
+
+    Results are served from the in-process result cache when possible.
+    See query_company_from_table docstring for more information for args and returns.
+    """
+    # Validate the table name before it becomes part of a cache key
+    if not validate_table_name(table_name):
+        return jsonify({"error": "Invalid table name"}), 400
+    return cached_json_response((table_name, ticker),
+                                lambda: query_company_from_table(table_name, ticker))
+
+def get_company_scores(ticker, as_of=None):
+    """Returns the ESG scores from all tables for a company in JSON format.
+
+    Results are served from the in-process result cache when possible.
+    Pass as_of (YYYY-MM-DD) to get the scores as they were loaded on that day.
+    See query_company_scores docstring for more information for args and returns.
+    """
+    try:
+        as_of_cutoff = parse_as_of(as_of) if as_of is not None else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return cached_json_response(("all_tables", ticker, as_of_cutoff),
+                                lambda: query_company_scores(ticker, as_of_cutoff))
+
+def get_result_cache_stats():
+    """Returns the result cache hit, miss and eviction counters in JSON format."""
+    return jsonify(result_cache.stats()), 200
+
+def get_batch_company_scores(tickers, as_of=None):
+    """Returns the ESG scores from all tables for many companies in JSON format.
+
+    All tickers are resolved against the scores table in one query.
+
+    Args:
+        tickers: [list] tickers of the companies to query
+        as_of: [str] date (YYYY-MM-DD) to return the scores as they were loaded on
+
+    Returns:
+        [dict]: ticker mapped to its scores from each table (empty if not found)
+    """
+    if not tickers:
+        return jsonify({"error": "No tickers provided"}), 400
+    if len(tickers) > MAX_BATCH_TICKERS:
+        return jsonify({"error": f"At most {MAX_BATCH_TICKERS} tickers per request"}), 400
+
+    # Bind the whole batch as one JSON array so the query has a single parameter
+    query = """
+        SELECT ticker, provider, pillar, COALESCE(label, value)
+        FROM scores
+        WHERE ticker IN (SELECT value FROM json_each(?))
+    """
+    params = (json.dumps(tickers),)
+    if as_of is not None:
+        try:
+            query, params = HISTORY_SCORES_QUERY, params + (parse_as_of(as_of),)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+    conn = get_db_connection()
+    scores = group_scores(conn.execute(query, params))
+    result = {ticker: scores.get(ticker, {}) for ticker in tickers}
+
+    return jsonify(result), 200
+
+def query_composite_score(ticker):
+    """Returns the composite ESG score of a company in JSON format.
+
+    Args:
+        ticker: [str] ticker of the company to query
+
+    Returns:
+        [dict]: composite score, z-score, coverage and rank of the company, with
+        its percentile and z-score within each provider
+    """
+    query = """
+        SELECT ticker, composite_score, composite_z, coverage, rank
+        FROM composite_scores
+        WHERE ticker = ?
+    """
+
+    conn = get_db_connection()
+    result = execute_query_return_list_of_dicts_lm(conn, query, (ticker,))
+
+    # If no data is found, return a 404 error
+    if not result:
+        return jsonify({"error": "Company not found"}), 404
+
+    providers = conn.execute("""
+        SELECT provider, percentile, z_score FROM score_percentiles WHERE ticker = ?
+    """, (ticker,))
+    result = result[0]
+    result["providers"] = {provider: {"percentile": percentile, "z_score": z_score}
+                           for provider, percentile, z_score in providers}
+
+    return jsonify(result), 200
+
+def get_composite_score(ticker):
+    """Returns the composite ESG score of a company in JSON format.
+
+    Results are served from the in-process result cache when possible.
+    See query_composite_score docstring for more information for args and returns.
+    """
+    return cached_json_response(("composite", ticker), lambda: query_composite_score(ticker))
+
+def get_composite_rankings(limit=None, min_coverage=None):
+    """Returns companies ranked by composite ESG score in JSON format.
+
+    Args:
+        limit: [str] number of companies to return (default DEFAULT_RANKING_SIZE)
+        min_coverage: [str] minimum number of providers that scored a company (default DEFAULT_MIN_COVERAGE)
+
+    Returns:
+        [list]: composite score, z-score, coverage and rank of the top companies
+    """
+    try:
+        page_size = parse_limit(limit) if limit is not None else DEFAULT_RANKING_SIZE
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        min_coverage = int(min_coverage) if min_coverage is not None else DEFAULT_MIN_COVERAGE
+    except ValueError:
+        return jsonify({"error": "min_coverage must be an integer"}), 400
+
+    query = f"""
+        SELECT ticker, composite_score, composite_z, coverage, rank
+        FROM composite_scores
+        WHERE coverage >= ?
+        ORDER BY rank
+        LIMIT {page_size}
+    """
+
+    conn = get_db_connection()
+    result = execute_query_return_list_of_dicts_lm(conn, query, (min_coverage,))
+
+    return jsonify(result), 200
+
+def get_group_rankings(sector=None, industry=None, provider=None, top=None):
+    """Returns the top companies of a sector, an industry or the whole index in JSON format.
+
+    Rankings and quantiles are precomputed at load time, so the top N is a
+    primary key range read.
+
+    Args:
+        sector: [str] sector to rank within
+        industry: [str] industry to rank within (not combined with sector)
+        provider: [str] provider table or "composite" (the default)
+        top: [str] number of companies to return (default DEFAULT_GROUP_RANKING_SIZE)
+
+    Returns:
+        [dict]: the group's score statistics and its top companies with their
+        rank, score and percentile within the group
+    """
+    if sector is not None and industry is not None:
+        return jsonify({"error": "Pass either sector or industry, not both"}), 400
+    provider = provider or "composite"
+    if provider not in RANKING_PROVIDERS:
+        return jsonify({"error": "Invalid provider"}), 400
+    try:
+        top = parse_limit(top, name="top") if top is not None else DEFAULT_GROUP_RANKING_SIZE
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if sector is not None:
+        group_type, group_name = "sector", sector
+    elif industry is not None:
+        group_type, group_name = "industry", industry
+    else:
+        group_type, group_name = "all", "all"
+    group = (group_type, group_name, provider)
+
+    conn = get_db_connection()
+    stats = execute_query_return_list_of_dicts_lm(conn, """
+        SELECT count, mean, min, p25, median, p75, max FROM group_stats
+        WHERE group_type = ? AND group_name = ? AND provider = ?
+    """, group)
+
+    # If no data is found, return a 404 error
+    if not stats:
+        return jsonify({"error": "Group not found"}), 404
+
+    results = execute_query_return_list_of_dicts_lm(conn, f"""
+        SELECT rank, ticker, value, percentile FROM group_rankings
+        WHERE group_type = ? AND group_name = ? AND provider = ?
+        ORDER BY rank
+        LIMIT {top}
+    """, group)
+
+    return jsonify({group_type: group_name, "provider": provider,
+                    "stats": stats[0], "results": results}), 200
+
+def query_company_percentiles(ticker, provider=None):
+    """Returns a company's rank and percentile within its sector, industry and the whole index.
+
+    Args:
+        ticker: [str] ticker of the company to query
+        provider: [str] provider table or "composite" to restrict the result to
+
+    Returns:
+        [dict]: provider mapped to group type mapped to the group's name and size
+        and the company's rank, score and percentile within it
+    """
+    if provider is not None and provider not in RANKING_PROVIDERS:
+        return jsonify({"error": "Invalid provider"}), 400
+
+    query = """
+        SELECT r.provider, r.group_type, r.group_name, r.rank, s.count, r.value, r.percentile
+        FROM group_rankings AS r
+        JOIN group_stats AS s
+        ON s.group_type = r.group_type AND s.group_name = r.group_name AND s.provider = r.provider
+        WHERE r.ticker = ?
+    """
+    params = (ticker,)
+    if provider is not None:
+        query += " AND r.provider = ?"
+        params = (ticker, provider)
+
+    conn = get_db_connection()
+    rows = execute_query_return_list_of_dicts_lm(conn, query, params)
+
+    # If no data is found, return a 404 error
+    if not rows:
+        return jsonify({"error": "Company not found"}), 404
+
     result = {}
+    for row in rows:
+        result.setdefault(row.pop("provider"), {})[row.pop("group_type")] = row
 
-    conn = create_db_connection()
-    cursor = conn.cursor()
-    for table in tables:
-        query = f"SELECT esg_score FROM {table} WHERE company = ?"
-        cursor.execute(query, (ticker,))
-        
-        while True:
-            single_result = cursor.fetchone()
-            if not single_result:
-                break
-            result[table] = single_result[0]
+    return jsonify({"ticker": ticker, "providers": result}), 200
+
+def get_company_percentiles(ticker, provider=None):
+    """Returns a company's rank and percentile within its sector, industry and the whole index.
+
+    Results are served from the in-process result cache when possible.
+    See query_company_percentiles docstring for more information for args and returns.
+    """
+    return cached_json_response(("percentile", ticker, provider),
+                                lambda: query_company_percentiles(ticker, provider))
+
+def get_snapshots():
+    """Returns every loaded snapshot of the scores in JSON format.
+
+    Returns:
+        [list]: snapshot id, load time and number of changed scores of each snapshot
+    """
+    query = "SELECT snapshot_id, as_of, changed_scores FROM snapshots ORDER BY snapshot_id"
+
+    conn = get_db_connection()
+    result = execute_query_return_list_of_dicts_lm(conn, query, ())
 
     return jsonify(result), 200
-    
\ No newline at end of file
+
+def get_score_diff(from_date, to_date, provider=None):
+    """Returns the scores that changed between two dates in JSON format.
+
+    Only scores with a history row between the two dates are compared, and a
+    score counts as changed when its value differs at the two dates.
+
+    Args:
+        from_date: [str] date (YYYY-MM-DD) of the earlier scores
+        to_date: [str] date (YYYY-MM-DD) of the later scores
+        provider: [str] provider table to restrict the diff to
+
+    Returns:
+        [dict]: ticker mapped to provider mapped to each changed score's
+        value at from_date and at to_date (None when it had no score)
+    """
+    try:
+        from_cutoff, to_cutoff = parse_as_of(from_date), parse_as_of(to_date)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if from_cutoff >= to_cutoff:
+        return jsonify({"error": "from must be before to"}), 400
+    if provider is not None and not validate_table_name(provider):
+        return jsonify({"error": "Invalid provider"}), 400
+
+    # The value of a score at a cutoff is its last history row before the cutoff
+    score_at = """(
+        SELECT CASE WHEN h.removed THEN NULL ELSE COALESCE(h.label, h.value) END
+        FROM score_history AS h
+        WHERE h.ticker = c.ticker AND h.provider = c.provider AND h.pillar = c.pillar AND h.as_of < ?
+        ORDER BY h.snapshot_id DESC LIMIT 1
+    )"""
+    query = f"""
+        WITH changed AS (
+            SELECT DISTINCT ticker, provider, pillar FROM score_history
+            WHERE as_of >= ? AND as_of < ? AND provider = COALESCE(?, provider)
+        )
+        SELECT * FROM (
+            SELECT c.ticker, c.provider, c.pillar, {score_at} AS old_score, {score_at} AS new_score
+            FROM changed AS c
+        )
+        WHERE old_score IS NOT new_score
+        ORDER BY ticker, provider, pillar
+    """
+
+    conn = get_db_connection()
+    rows = conn.execute(query, (from_cutoff, to_cutoff, provider, from_cutoff, to_cutoff))
+
+    changes = {}
+    for ticker, row_provider, pillar, old_score, new_score in rows:
+        changes.setdefault(ticker, {}).setdefault(row_provider, {})[SCORE_PILLARS[pillar]] = {
+            "from": old_score, "to": new_score}
+
+    return jsonify({"from": from_date, "to": to_date, "changes": changes}), 200
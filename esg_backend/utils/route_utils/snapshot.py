@@ -0,0 +1,150 @@
+''' This module contains the snapshot mode, which serves pre-serialized responses from memory. '''
+
+import logging
+import signal
+import threading
+import time
+from flask import current_app, request
+from utils.data_utils.loading_utils import create_readonly_db_connection, read_db_version
+from utils.route_utils.db_pool import db_file_key
+from utils.route_utils.json_provider import serialize
+from utils.route_utils.route_utils import VALID_TABLES, group_scores
+
+
+class Snapshot():
+    '''
+    This class holds every table and per-ticker response pre-serialized in memory.
+
+    The snapshot is rebuilt when the database files change on disk or when the
+    worker receives SIGHUP. Requests keep being served from the previous snapshot
+    while a rebuild runs.
+
+    Attributes:
+        db_path: [str] Path to the SQLite database (defaults to DB_PATH).
+        version: [str] Database version the snapshot was built from.
+    '''
+
+    def __init__(self, db_path: str = None):
+        self.db_path = db_path
+        self.version = None
+        self.tables = {}
+        self.companies = {}
+        self.scores = {}
+        self._key = None
+        self._reload_requested = False
+        self._lock = threading.Lock()
+
+    def load(self) -> None:
+        '''
+        This function reads every table and pre-serializes each route's response.
+        '''
+        start = time.perf_counter()
+        key = db_file_key(self.db_path)
+        conn = create_readonly_db_connection(self.db_path)
+        try:
+            tables, companies, scores = {}, {}, {}
+            for table_name in VALID_TABLES:
+                cursor = conn.execute(f"SELECT * FROM {table_name} ORDER BY rowid")
+                headers = [x[0] for x in cursor.description]
+                rows = [dict(zip(headers, row)) for row in cursor]
+                if rows:
+                    tables[table_name] = serialize(rows)
+
+                by_company = {}
+                for row in rows:
+                    by_company.setdefault(row["company"], []).append(row)
+                for company, company_rows in by_company.items():
+                    companies[(table_name, company)] = serialize(company_rows)
+
+            cursor = conn.execute("SELECT ticker, provider, pillar, COALESCE(label, value) FROM scores")
+            for ticker, ticker_scores in group_scores(cursor).items():
+                scores[ticker] = serialize(ticker_scores)
+
+            version, _ = read_db_version(conn)
+        finally:
+            conn.close()
+
+        # Swap in the new snapshot in one step
+        self.tables, self.companies, self.scores = tables, companies, scores
+        self.version, self._key = version, key
+        logging.info("Loaded snapshot of %d tables and %d companies in %.3fs",
+                     len(tables), len(scores), time.perf_counter() - start)
+
+    def request_reload(self, *args) -> None:
+        '''
+        This function marks the snapshot for a rebuild on the next request.
+        '''
+        self._reload_requested = True
+
+    def refresh_if_changed(self) -> None:
+        '''
+        This function rebuilds the snapshot if the database changed or a reload was requested.
+        Only one thread rebuilds; the others keep serving the current snapshot.
+        '''
+        if not self._reload_requested and db_file_key(self.db_path) == self._key:
+            return
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._reload_requested = False
+            self.load()
+        except Exception as e:
+            logging.error("Failed to reload snapshot: %s", e)
+        finally:
+            self._lock.release()
+
+    def lookup(self, endpoint: str, view_args: dict) -> bytes:
+        '''
+        This function returns the pre-serialized body for a route, if there is one.
+
+        Args:
+            endpoint: [str] Name of the matched Flask endpoint.
+            view_args: [dict] URL arguments of the matched route.
+
+        Returns:
+            [bytes] : The response body, or None if the route must be answered from SQL.
+        '''
+        if endpoint == "get_table_by_name":
+            return self.tables.get(view_args["table_name"])
+        if endpoint == "get_company_data_from_table":
+            return self.companies.get((view_args["table_name"], view_args["ticker"]))
+        if endpoint == "get_company_scores_from_tables":
+            return self.scores.get(view_args["ticker"])
+        return None
+
+
+snapshot = Snapshot()
+
+
+def serve_from_snapshot():
+    """Answers plain GETs of the table and ticker routes from the snapshot
+
+    Requests with query parameters, unknown tickers and other routes fall
+    through to the normal SQL path.
+
+    Returns:
+        [Response]: pre-serialized JSON response, or None to fall through
+    """
+    if request.method not in ("GET", "HEAD") or request.args or not request.view_args:
+        return None
+    snapshot.refresh_if_changed()
+    body = snapshot.lookup(request.endpoint, request.view_args)
+    if body is None:
+        return None
+    return current_app.response_class(body, mimetype="application/json")
+
+def init_snapshot(app) -> None:
+    """Loads the snapshot and registers it with the Flask app
+
+    Must be registered after the HTTP cache so conditional GETs are answered first.
+
+    Args:
+        app: [Flask] Flask application
+    """
+    snapshot.load()
+    app.before_request(serve_from_snapshot)
+    try:
+        signal.signal(signal.SIGHUP, snapshot.request_reload)
+    except ValueError:
+        # Signals can only be registered from the main thread
+        logging.warning("Snapshot reload on SIGHUP unavailable outside the main thread")
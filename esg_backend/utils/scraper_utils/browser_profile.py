@@ -0,0 +1,127 @@
+''' This module contains the lean Chrome profile and request blocking used by the scraper browsers. '''
+
+import logging
+import os
+from selenium import webdriver
+
+# Default user agent of a browser that wasn't given one
+DEFAULT_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/87.0.4280.88 Safari/537.36"
+
+# Return from driver.get once the DOM is ready rather than after every subresource has loaded
+PAGE_LOAD_STRATEGY = os.environ.get("SCRAPER_PAGE_LOAD_STRATEGY") or "eager"
+
+# Set SCRAPER_BLOCK_RESOURCES=0 to load every resource the pages request
+BLOCKING_ENABLED = os.environ.get("SCRAPER_BLOCK_RESOURCES", "1") != "0"
+
+# Chrome switches that turn off the features a headless scraper doesn't need
+LEAN_ARGUMENTS = [
+    "--headless",
+    "--no-sandbox",
+    "--disable-dev-shm-usage",
+    "--disable-gpu",
+    "--disable-extensions",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-translate",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-notifications",
+    "--no-first-run",
+    "--no-default-browser-check",
+    "--mute-audio",
+    "--window-size=1280,800",
+]
+
+def extension_patterns(*extensions: str) -> list:
+    '''
+    This function returns the URL patterns of files with the given extensions, with or
+    without a query string, so a path or query that merely contains one isn't matched.
+    '''
+    return [pattern for extension in extensions for pattern in (f"*.{extension}", f"*.{extension}?*")]
+
+# URL patterns blocked over CDP, grouped by the type of resource they match
+BLOCKED_RESOURCES = {
+    "image": extension_patterns("png", "jpg", "jpeg", "gif", "webp", "avif", "svg", "ico"),
+    "media": extension_patterns("mp4", "webm", "m3u8", "mp3", "ogg", "wav"),
+    "font": extension_patterns("woff", "woff2", "ttf", "otf", "eot"),
+    "analytics": [
+        "*google-analytics.com*",
+        "*googletagmanager.com*",
+        "*doubleclick.net*",
+        "*googlesyndication.com*",
+        "*facebook.net*",
+        "*connect.facebook.com*",
+        "*hotjar.com*",
+        "*adobedtm.com*",
+        "*omtrdc.net*",
+        "*demdex.net*",
+        "*bing.com/bat*",
+        "*linkedin.com/px*",
+        "*snap.licdn.com*",
+        "*scorecardresearch.com*",
+        "*quantserve.com*",
+        "*newrelic.com*",
+        "*nr-data.net*",
+    ],
+}
+
+# Configure logging
+logging.basicConfig(
+    filename='parallel_scraping.log',
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+)
+
+def chrome_options(user_agent: str = None) -> webdriver.ChromeOptions:
+    '''
+    This function creates the lean profile every scraper browser is launched with.
+
+    Args:
+        user_agent: [str] The user agent of the browser (defaults to DEFAULT_USER_AGENT).
+
+    Returns:
+        [ChromeOptions] : The Chrome options.
+    '''
+    options = webdriver.ChromeOptions()
+    for argument in LEAN_ARGUMENTS:
+        options.add_argument(argument)
+    options.add_argument(f"user-agent={user_agent or DEFAULT_USER_AGENT}")
+    options.page_load_strategy = PAGE_LOAD_STRATEGY
+
+    # Don't spend memory or requests on password, autofill and notification features
+    options.add_experimental_option("prefs", {
+        "credentials_enable_service": False,
+        "profile.password_manager_enabled": False,
+        "autofill.profile_enabled": False,
+        "profile.default_content_setting_values.notifications": 2,
+    })
+    options.add_experimental_option("excludeSwitches", ["enable-logging"])
+    return options
+
+def blocked_url_patterns(allowed_resources: set = None) -> list:
+    '''
+    This function lists the URL patterns to block for a provider.
+
+    Args:
+        allowed_resources: [set] Resource types in BLOCKED_RESOURCES the provider's pages need (e.g. {"font"}).
+
+    Returns:
+        [list] : The URL patterns of every resource type that isn't allowed.
+    '''
+    allowed_resources = allowed_resources or set()
+    return [pattern for resource, patterns in BLOCKED_RESOURCES.items()
+            if resource not in allowed_resources for pattern in patterns]
+
+def block_resources(driver: webdriver.Chrome, allowed_resources: set = None):
+    '''
+    This function sets which requests a driver blocks over CDP, replacing the
+    patterns set for the provider that last used the driver.
+
+    Args:
+        driver: [webdriver.Chrome] The driver.
+        allowed_resources: [set] Resource types in BLOCKED_RESOURCES the provider's pages need.
+    '''
+    patterns = blocked_url_patterns(allowed_resources) if BLOCKING_ENABLED else []
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+    logging.debug("Blocking %d URL patterns", len(patterns))
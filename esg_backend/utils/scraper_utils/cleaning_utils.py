@@ -33,7 +33,17 @@ def clean_flag_element(element) -> str:
     Returns:
         [str] : The flag color within the web element.
     """
-    classes = element.get_attribute("class")
+    return clean_flag_class(element.get_attribute("class"))
+
+def clean_flag_class(classes: str) -> str:
+    """Clean a flag's class attribute.
+    
+    Args:
+        classes: [str] The class attribute of the flag element.
+
+    Returns:
+        [str] : The flag color within the class attribute.
+    """
     if "Green" in classes: return "Green"
     if "Yellow" in classes: return "Yellow"
     if "Orange" in classes: return "Orange"
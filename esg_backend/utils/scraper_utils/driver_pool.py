@@ -0,0 +1,230 @@
+''' This module contains a pool of warm Chrome drivers that are recycled between scrapers instead of relaunched. '''
+
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue, Empty
+from threading import Lock
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from utils.scraper_utils.browser_profile import DEFAULT_USER_AGENT, chrome_options
+
+# Number of scrapers a driver serves before it is quit and replaced
+DEFAULT_MAX_USES = int(os.environ.get("SCRAPER_DRIVER_MAX_USES") or 50)
+
+# Seconds acquire waits for a pre-launched driver before checking whether launches are still pending
+LAUNCH_POLL_INTERVAL = 0.5
+
+# Configure logging
+logging.basicConfig(
+    filename='parallel_scraping.log',
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+)
+
+class DriverPool():
+    '''
+    This class keeps a pool of launched Chrome drivers for the workers of one process.
+
+    Drivers can be pre-launched in the background when the pool starts. A driver
+    released by a scraper has its cookies, cache and storage cleared over the Chrome
+    DevTools Protocol and is handed to the next scraper, so Chrome is only relaunched
+    when a driver fails its health check or reaches max_uses.
+
+    Attributes:
+        size: [int] Number of idle drivers kept, and pre-launched by prelaunch.
+        max_uses: [int] Number of scrapers a driver serves before it is retired.
+    '''
+
+    def __init__(self, size: int, max_uses: int = DEFAULT_MAX_USES):
+        self.size = size
+        self.max_uses = max_uses
+        self._idle = Queue()
+        self._uses = {}
+        self._launching = 0
+        self._lock = Lock()
+        self._launcher = ThreadPoolExecutor(max_workers=max(size, 1))
+        self.launch_times = []
+        self.recycle_times = []
+        self.retired = 0
+
+    def _launch(self) -> webdriver.Chrome:
+        '''
+        This function launches a new driver and records how long Chrome took to start.
+        '''
+        start = time.perf_counter()
+        driver = webdriver.Chrome(options=chrome_options())
+        with self._lock:
+            self.launch_times.append(time.perf_counter() - start)
+            self._uses[driver.session_id] = 0
+        return driver
+
+    def _prelaunch_one(self):
+        try:
+            self._idle.put(self._launch())
+        except Exception as e:
+            logging.error("Failed to pre-launch driver: %s", e)
+        finally:
+            with self._lock:
+                self._launching -= 1
+
+    def prelaunch(self):
+        '''
+        This function starts launching size drivers in the background, so Chrome
+        starts while the workers do other work.
+        '''
+        with self._lock:
+            self._launching += self.size
+        for _ in range(self.size):
+            self._launcher.submit(self._prelaunch_one)
+
+    def healthy(self, driver: webdriver.Chrome) -> bool:
+        '''
+        This function checks that a driver's browser still responds.
+
+        Args:
+            driver: [webdriver.Chrome] The driver to check.
+
+        Returns:
+            [bool] : True if the browser ran a script.
+        '''
+        try:
+            driver.execute_script("return 1")
+            return True
+        except WebDriverException:
+            return False
+
+    def acquire(self, user_agent: str = None) -> webdriver.Chrome:
+        '''
+        This function returns a healthy idle driver, waiting for one being pre-launched
+        or launching a new one if none are idle, with its user agent set over CDP.
+
+        Args:
+            user_agent: [str] The user agent of the browser (defaults to DEFAULT_USER_AGENT).
+
+        Returns:
+            [webdriver.Chrome] : The driver.
+        '''
+        driver = None
+        while driver is None:
+            with self._lock:
+                launching = self._launching
+            try:
+                # Wait for a pre-launched driver rather than starting another Chrome
+                driver = self._idle.get(timeout=LAUNCH_POLL_INTERVAL) if launching else self._idle.get_nowait()
+            except Empty:
+                if launching:
+                    continue
+                break
+            if not self.healthy(driver):
+                logging.warning("Discarding unresponsive pooled driver")
+                self._retire(driver)
+                driver = None
+        if driver is None:
+            driver = self._launch()
+
+        driver.execute_cdp_cmd("Network.setUserAgentOverride", {"userAgent": user_agent or DEFAULT_USER_AGENT})
+        with self._lock:
+            self._uses[driver.session_id] += 1
+        return driver
+
+    def _retire(self, driver: webdriver.Chrome):
+        with self._lock:
+            self._uses.pop(driver.session_id, None)
+            self.retired += 1
+        try:
+            driver.quit()
+        except WebDriverException:
+            pass
+
+    def release(self, driver: webdriver.Chrome):
+        '''
+        This function clears a driver's session and returns it to the pool, or retires
+        it if it's unhealthy, has reached max_uses or the pool is full.
+
+        Args:
+            driver: [webdriver.Chrome] Driver previously returned by acquire.
+        '''
+        if self._uses.get(driver.session_id, self.max_uses) >= self.max_uses or self._idle.qsize() >= self.size:
+            self._retire(driver)
+            return
+
+        start = time.perf_counter()
+        try:
+            # Clear the session's cookies, cache and site storage, and close any extra windows
+            origin = driver.execute_script("return location.origin")
+            driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+            driver.execute_cdp_cmd("Network.clearBrowserCache", {})
+            if origin and origin != "null":
+                driver.execute_cdp_cmd("Storage.clearDataForOrigin", {"origin": origin, "storageTypes": "all"})
+            for handle in driver.window_handles[1:]:
+                driver.switch_to.window(handle)
+                driver.close()
+            driver.switch_to.window(driver.window_handles[0])
+            driver.get("about:blank")
+        except WebDriverException as e:
+            logging.warning("Failed to recycle driver, retiring it: %s", e)
+            self._retire(driver)
+            return
+        with self._lock:
+            self.recycle_times.append(time.perf_counter() - start)
+        self._idle.put(driver)
+
+    def log_metrics(self):
+        '''
+        This function logs how many drivers were launched, recycled and retired, and how long launches and recycles took.
+        '''
+        for name, times in (("launches", self.launch_times), ("recycles", self.recycle_times)):
+            if times:
+                logging.info("Driver pool %s: %d, mean %.2fs, max %.2fs",
+                             name, len(times), sum(times) / len(times), max(times))
+        logging.info("Driver pool retired %d drivers", self.retired)
+
+    def close_all(self):
+        '''
+        This function quits every idle driver and logs the pool's metrics.
+        '''
+        self._launcher.shutdown(wait=True)
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except Empty:
+                break
+            driver.quit()
+        self.log_metrics()
+
+
+# The pool shared by the scrapers of this process, if one was started
+_shared_pool = None
+
+def start_shared_pool(size: int, max_uses: int = DEFAULT_MAX_USES) -> DriverPool:
+    '''
+    This function starts the pool shared by every WebScraper created in this process and pre-launches its drivers.
+
+    Args:
+        size: [int] Number of drivers to keep warm, usually the number of workers.
+        max_uses: [int] Number of scrapers a driver serves before it is retired.
+
+    Returns:
+        [DriverPool] : The shared pool.
+    '''
+    global _shared_pool
+    _shared_pool = DriverPool(size, max_uses)
+    _shared_pool.prelaunch()
+    return _shared_pool
+
+def shared_pool() -> DriverPool | None:
+    '''
+    This function returns the pool shared by the scrapers of this process, or None if none was started.
+    '''
+    return _shared_pool
+
+def close_shared_pool():
+    '''
+    This function quits the drivers of the shared pool and stops sharing it.
+    '''
+    global _shared_pool
+    if _shared_pool is not None:
+        _shared_pool.close_all()
+        _shared_pool = None
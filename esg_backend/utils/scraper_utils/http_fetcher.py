@@ -0,0 +1,130 @@
+'''This module contains a class for fetching provider pages and JSON over pooled HTTP sessions.'''
+
+import logging
+import os
+import requests
+from queue import Queue
+from requests.adapters import HTTPAdapter
+from utils.scraper_utils.rate_limiter import limiter_for
+
+# Set SCRAPER_HTTP=0 to always scrape with a browser
+HTTP_ENABLED = os.environ.get("SCRAPER_HTTP", "1") != "0"
+
+# Connections kept alive per host, and seconds to wait for a response
+DEFAULT_POOL_SIZE = 4
+DEFAULT_TIMEOUT = 10
+
+# Response statuses a provider throttles requests with
+THROTTLE_STATUSES = (429, 503)
+
+# Configure logging
+logging.basicConfig(
+    filename='parallel_scraping.log',
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+)
+
+def peek_user_agent(user_agents: Queue) -> str | None:
+    '''
+    This function returns the user agent the next WebScraper would take, leaving it in the queue.
+
+    Args:
+        user_agents: [queue] Queue of user agents.
+
+    Returns:
+        [str] : The first user agent in the queue, or None if the queue is empty.
+    '''
+    with user_agents.mutex:
+        return user_agents.queue[0] if user_agents.queue else None
+
+class HttpFetcher():
+    '''
+    This class fetches a provider's JSON and static pages without a browser. It keeps
+    one session with a pool of keep-alive connections, so a worker reuses its
+    connections for every company. Failed requests return None so the scraper
+    can fall back to a WebScraper.
+
+    Attributes:
+        base_url: [str] The scheme and host requests are sent to (e.g. a local fixture server).
+        timeout: [float] Seconds to wait for a response.
+    '''
+
+    def __init__(self, base_url: str, user_agent: str = None,
+                 pool_size: int = DEFAULT_POOL_SIZE, timeout: float = DEFAULT_TIMEOUT):
+        '''
+        This function creates the session and its connection pool.
+        '''
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.limiter = limiter_for(self.base_url)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if user_agent:
+            self.session.headers["User-Agent"] = user_agent
+
+    def get(self, path: str, params: dict = None) -> requests.Response | None:
+        '''
+        This function sends a GET request to a path under the base URL, paced by the
+        domain's rate limiter, which backs off if the request times out or is throttled.
+
+        Args:
+            path: [str] The path of the page.
+            params: [dict] The query parameters.
+
+        Returns:
+            [requests.Response] : The response, or None if the request failed.
+        '''
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        self.limiter.wait()
+        try:
+            response = self.session.get(url, params=params, timeout=self.timeout)
+            if response.status_code in THROTTLE_STATUSES:
+                self.limiter.backoff(f"HTTP {response.status_code}")
+            response.raise_for_status()
+            return response
+        except requests.Timeout as e:
+            self.limiter.backoff("HTTP timeout")
+            logging.warning("HTTP request timed out for %s: %s", url, e)
+            return None
+        except requests.RequestException as e:
+            logging.warning("HTTP request failed for %s: %s", url, e)
+            return None
+
+    def get_json(self, path: str, params: dict = None):
+        '''
+        This function fetches and decodes a JSON response.
+
+        Args:
+            path: [str] The path of the endpoint.
+            params: [dict] The query parameters.
+
+        Returns:
+            [dict | list] : The decoded JSON, or None if the request failed or wasn't JSON.
+        '''
+        response = self.get(path, params)
+        if response is None:
+            return None
+        try:
+            return response.json()
+        except ValueError:
+            logging.warning("Response from %s was not JSON", response.url)
+            return None
+
+    def get_text(self, path: str, params: dict = None) -> str | None:
+        '''
+        This function fetches a static page.
+
+        Args:
+            path: [str] The path of the page.
+            params: [dict] The query parameters.
+
+        Returns:
+            [str] : The page's HTML, or None if the request failed.
+        '''
+        response = self.get(path, params)
+        return response.text if response is not None else None
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,178 @@
+''' This module contains an adaptive rate limiter that paces the requests sent to each provider domain. '''
+
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+# Requests per second first allowed to a domain, and the most the limiter ramps up to
+DEFAULT_RATE = float(os.environ.get("SCRAPER_RATE") or 1.0)
+DEFAULT_MAX_RATE = float(os.environ.get("SCRAPER_MAX_RATE") or 4 * DEFAULT_RATE)
+
+# Slowest rate the limiter backs off to, in requests per second
+MIN_RATE = 0.05
+
+# Rate added per successful company, as a fraction of the starting rate
+RATE_INCREASE = 0.1
+
+# Factor the rate and concurrency are cut by when the provider throttles
+BACKOFF_FACTOR = 0.5
+
+# Seconds after a back-off during which further failures are put down to the same episode
+BACKOFF_COOLDOWN = 5.0
+
+# Seconds between logs of a limiter's rate and concurrency
+LOG_INTERVAL = 30.0
+
+# Configure logging
+logging.basicConfig(
+    filename='parallel_scraping.log',
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+)
+
+class RateLimiter():
+    '''
+    This class paces the requests sent to one provider domain with a token bucket, and
+    limits how many companies are scraped from it at once. Both adapt AIMD-style: each
+    company scraped without a back-off adds to the rate and concurrency, and a page load
+    or HTTP timeout, a throttled response or a block page halves them, so workers settle just below the provider's throttling.
+
+    Attributes:
+        domain: [str] The provider domain.
+        rate: [float] Requests per second currently allowed.
+        concurrency: [float] Companies currently allowed to be scraped at once.
+        max_rate: [float] The most requests per second the rate ramps up to.
+        max_concurrency: [int] The most companies scraped at once, usually the number of workers.
+    '''
+
+    def __init__(self, domain: str, rate: float = DEFAULT_RATE, max_rate: float = DEFAULT_MAX_RATE,
+                 max_concurrency: int = 1):
+        self.domain = domain
+        self.rate = rate
+        self.max_rate = max(max_rate, rate)
+        self.rate_increase = rate * RATE_INCREASE
+        self.concurrency = 1.0
+        self.max_concurrency = max_concurrency
+        self._tokens = 1.0
+        self._updated = time.monotonic()
+        self._active = 0
+        self._last_backoff = 0.0
+        self._last_log = 0.0
+        self._condition = threading.Condition()
+        self._local = threading.local()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(max(self.rate, 1.0), self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait(self):
+        '''
+        This function blocks until the bucket has a token for one request to the domain.
+        '''
+        with self._condition:
+            while True:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    break
+                self._condition.wait((1 - self._tokens) / self.rate)
+            self._log_periodically()
+
+    @contextmanager
+    def slot(self):
+        '''
+        This function holds one of the domain's concurrent scraping slots while a company
+        is scraped. If nothing backs off while the slot is held, the rate and concurrency
+        are ramped up when it's released.
+        '''
+        with self._condition:
+            while self._active >= int(self.concurrency):
+                self._condition.wait()
+            self._active += 1
+        self._local.failed = False
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._active -= 1
+                if not self._local.failed:
+                    self._increase()
+                self._condition.notify_all()
+
+    def _increase(self):
+        level = int(self.concurrency)
+        self.rate = min(self.max_rate, self.rate + self.rate_increase)
+        self.concurrency = min(self.max_concurrency, self.concurrency + 1 / self.concurrency)
+        if int(self.concurrency) != level:
+            self._log("ramped up")
+
+    def backoff(self, reason: str):
+        '''
+        This function halves the rate and concurrency after the provider timed out or
+        blocked a request, once per cooldown so one episode isn't counted per worker.
+
+        Args:
+            reason: [str] What went wrong, for the log.
+        '''
+        self._local.failed = True
+        with self._condition:
+            now = time.monotonic()
+            if now - self._last_backoff < BACKOFF_COOLDOWN:
+                return
+            self._last_backoff = now
+            self.rate = max(MIN_RATE, self.rate * BACKOFF_FACTOR)
+            self.concurrency = max(1.0, self.concurrency * BACKOFF_FACTOR)
+            self._tokens = min(self._tokens, 0.0)
+            self._log(f"backed off after {reason}", logging.WARNING)
+
+    def _log(self, message: str, level: int = logging.INFO):
+        self._last_log = time.monotonic()
+        logging.log(level, "%s %s: %.2f requests/s, %d concurrent (%d active)",
+                    self.domain, message, self.rate, int(self.concurrency), self._active)
+
+    def _log_periodically(self):
+        if time.monotonic() - self._last_log >= LOG_INTERVAL:
+            self._log("rate limit")
+
+
+# Limiters of the provider domains scraped by this process, and the share of each domain's rate it's given
+_limiters = {}
+_limiters_lock = threading.Lock()
+_rate_share = 1.0
+
+def set_rate_share(share: float):
+    '''
+    This function sets the share of each domain's rate given to this process, so processes
+    scraping a provider together stay within its rate.
+
+    Args:
+        share: [float] The fraction of the rate, e.g. 1 / the number of processes.
+    '''
+    global _rate_share
+    _rate_share = share
+
+def limiter_for(url: str, max_concurrency: int = None) -> RateLimiter:
+    '''
+    This function returns the limiter shared by every worker of this process that sends
+    requests to a URL's domain, creating it on first use.
+
+    Args:
+        url: [str] A URL on the provider domain.
+        max_concurrency: [int] The most companies scraped from the domain at once (raises the limiter's if given).
+
+    Returns:
+        [RateLimiter] : The domain's limiter.
+    '''
+    domain = urlparse(url).netloc or url
+    with _limiters_lock:
+        limiter = _limiters.get(domain)
+        if limiter is None:
+            limiter = _limiters[domain] = RateLimiter(domain, DEFAULT_RATE * _rate_share,
+                                                      DEFAULT_MAX_RATE * _rate_share)
+        if max_concurrency:
+            limiter.max_concurrency = max(limiter.max_concurrency, max_concurrency)
+    return limiter
@@ -0,0 +1,235 @@
+''' This module contains the classification and retrying of companies that failed to scrape. '''
+
+import csv
+import logging
+import os
+import random
+import threading
+import time
+from collections import Counter
+import requests
+from selenium.common.exceptions import (TimeoutException,
+                                        NoSuchElementException,
+                                        StaleElementReferenceException)
+
+# Categories of scraping failures
+TIMEOUT = "timeout"
+NOT_FOUND = "not_found"
+LAYOUT_CHANGE = "layout_change"
+BLOCKED = "blocked"
+UNKNOWN = "unknown"
+
+# Failures worth retrying, as the same company may scrape once the provider recovers
+TRANSIENT_FAILURES = {TIMEOUT, BLOCKED, UNKNOWN}
+
+# Attempts made at a company before it's reported as failed, and the backoff between them in seconds
+MAX_ATTEMPTS = int(os.environ.get("SCRAPER_MAX_ATTEMPTS") or 3)
+BASE_DELAY = float(os.environ.get("SCRAPER_RETRY_DELAY") or 5.0)
+MAX_DELAY = 120.0
+
+# Configure logging
+logging.basicConfig(
+    filename='parallel_scraping.log',
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+)
+
+# The failure noted for the company each thread is scraping
+_current = threading.local()
+
+def classify_failure(error: Exception) -> str:
+    '''
+    This function classifies the exception a scraper raised for a company.
+
+    Args:
+        error: [Exception] The exception.
+
+    Returns:
+        [str] : TIMEOUT, NOT_FOUND, LAYOUT_CHANGE or UNKNOWN.
+    '''
+    if isinstance(error, requests.Timeout):
+        return TIMEOUT
+    # Page load timeouts are noted as TIMEOUT when they happen, so a Selenium timeout
+    # here is a wait for an element that never appeared on a loaded page
+    if isinstance(error, TimeoutException):
+        return NOT_FOUND
+    # Elements the scraper expected (or read attributes of) are missing from the page
+    if isinstance(error, (NoSuchElementException, StaleElementReferenceException, AttributeError)):
+        return LAYOUT_CHANGE
+    return UNKNOWN
+
+def note_failure(category: str, detail: str = "") -> str:
+    '''
+    This function notes why the company this thread is scraping failed. The first failure
+    noted is kept, since later errors usually follow from it, except that a timeout or
+    blocked page replaces a missing element, so the company is still retried.
+
+    Args:
+        category: [str] The failure category.
+        detail: [str] A description of the failure.
+
+    Returns:
+        [str] : The category of the failure kept for the company.
+    '''
+    failure = getattr(_current, "failure", None)
+    if failure is None or (category in (TIMEOUT, BLOCKED)
+                           and failure["category"] in (NOT_FOUND, LAYOUT_CHANGE)):
+        _current.failure = {"category": category, "detail": detail}
+    return _current.failure["category"]
+
+def clear_failure():
+    '''
+    This function forgets the failure noted by this thread, when it starts a new company.
+    '''
+    _current.failure = None
+
+def take_failure() -> dict:
+    '''
+    This function returns and clears the failure noted by this thread. A company that
+    failed without an error noted found no match, so it's classified as not found.
+
+    Returns:
+        [dict] : The failure's category and detail.
+    '''
+    failure = getattr(_current, "failure", None) or {"category": NOT_FOUND, "detail": "no matching result"}
+    _current.failure = None
+    return failure
+
+def backoff_delay(attempt: int, base_delay: float = BASE_DELAY) -> float:
+    '''
+    This function returns the jittered exponential delay before retrying a company, so
+    companies that failed together don't all hit the provider again at once.
+
+    Args:
+        attempt: [int] The number of attempts already made.
+        base_delay: [float] The delay after the first attempt, in seconds.
+
+    Returns:
+        [float] : Seconds to wait, between half and all of the exponential delay.
+    '''
+    delay = min(MAX_DELAY, base_delay * 2 ** (attempt - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+class RetryQueue():
+    '''
+    This class holds the companies waiting to be retried, separately from the companies
+    not yet attempted. Transient failures are scheduled with a jittered exponential backoff
+    until a company runs out of attempts, and every company that finally failed is kept
+    for the failure report.
+
+    Attributes:
+        max_attempts: [int] Attempts made at a company before it's reported as failed.
+        base_delay: [float] The delay after the first attempt, in seconds.
+        failures: [dict] The final failure of each company that couldn't be scraped.
+    '''
+
+    def __init__(self, max_attempts: int = MAX_ATTEMPTS, base_delay: float = BASE_DELAY):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.failures = {}
+        self._attempts = Counter()
+        self._scheduled = []
+
+    def schedule(self, company: str, item, failure: dict) -> bool:
+        '''
+        This function schedules a failed company to be retried, or records it as failed
+        if its failure isn't transient or it has run out of attempts.
+
+        Args:
+            company: [str] The company.
+            item: The item to retry, e.g. the company's (index, row) pair.
+            failure: [dict] The failure's category and detail.
+
+        Returns:
+            [bool] : True if the company will be retried.
+        '''
+        company = str(company)
+        self._attempts[company] += 1
+        attempts = self._attempts[company]
+        if failure["category"] not in TRANSIENT_FAILURES or attempts >= self.max_attempts:
+            self.failures[company] = dict(failure, attempts=attempts)
+            logging.warning(f"Giving up on {company} after {attempts} attempts: {failure['category']} {failure['detail']}")
+            return False
+
+        delay = backoff_delay(attempts, self.base_delay)
+        self._scheduled.append((time.monotonic() + delay, company, item, failure))
+        logging.info(f"Retrying {company} in {delay:.1f}s after {failure['category']} (attempt {attempts})")
+        return True
+
+    def succeeded(self, company: str):
+        '''
+        This function forgets any failure of a company that was scraped.
+        '''
+        self.failures.pop(str(company), None)
+
+    def due(self) -> list:
+        '''
+        This function removes and returns the items whose backoff has passed.
+
+        Returns:
+            [list] : The items to retry now.
+        '''
+        now = time.monotonic()
+        ready = [entry for entry in self._scheduled if entry[0] <= now]
+        self._scheduled = [entry for entry in self._scheduled if entry[0] > now]
+        return [item for _, _, item, _ in ready]
+
+    @property
+    def pending(self) -> int:
+        return len(self._scheduled)
+
+    def abandon(self):
+        '''
+        This function records the companies still waiting to be retried as failed, e.g. when every worker has stopped.
+        '''
+        for _, company, _, failure in self._scheduled:
+            self.failures[company] = dict(failure, attempts=self._attempts[company])
+        self._scheduled = []
+
+    def iterate(self, items):
+        '''
+        This function yields the items of a single-threaded scrape, followed by the
+        companies scheduled for retry as their backoff passes.
+
+        Args:
+            items: [iterable] The items to scrape first.
+        '''
+        yield from items
+        while self._scheduled:
+            wait = min(entry[0] for entry in self._scheduled) - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            yield from self.due()
+
+    def report(self, export_path: str) -> str:
+        '''
+        This function logs how many companies failed in each category, and writes
+        every failed company to a csv next to the exported csv.
+
+        Args:
+            export_path: [str] The path for the exported csv.
+
+        Returns:
+            [str] : The path of the failure report.
+        '''
+        report_path = failure_report_path(export_path)
+        with open(report_path, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(["Company", "Category", "Attempts", "Detail"])
+            for company, failure in self.failures.items():
+                writer.writerow([company, failure["category"], failure["attempts"], failure["detail"]])
+
+        counts = Counter(failure["category"] for failure in self.failures.values())
+        if counts:
+            logging.warning("Failed to scrape %d companies (%s); see %s", len(self.failures),
+                            ", ".join(f"{category}: {count}" for category, count in counts.most_common()),
+                            report_path)
+        else:
+            logging.info("Every company was scraped")
+        return report_path
+
+def failure_report_path(export_path: str) -> str:
+    '''
+    This function returns the path of the failure report written for an exported csv.
+    '''
+    return f"{os.path.splitext(export_path)[0]}_failures.csv"
@@ -0,0 +1,160 @@
+'''This module contains a class for journaling scrape progress to SQLite so interrupted runs can resume.'''
+
+import json
+import logging
+import os
+import sqlite3
+from datetime import datetime, timezone
+
+# Statuses of a company in the journal
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# Configure logging
+logging.basicConfig(
+    filename='parallel_scraping.log',
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+)
+
+def default_journal_path(export_path: str) -> str:
+    '''
+    This function returns the journal path set by SCRAPER_JOURNAL, or a journal next to the exported csv.
+
+    Args:
+        export_path: [str] The path for the exported csv.
+
+    Returns:
+        [str] : The path of the journal database.
+    '''
+    return os.environ.get("SCRAPER_JOURNAL") or os.path.join(os.path.dirname(export_path), "scrape_journal.db")
+
+class ScrapeJournal():
+    '''
+    This class records the status, attempts and result of every company a provider's
+    scrape has reached. Each record is committed as it's written, so a restarted run
+    can skip the companies a crashed run already scraped.
+
+    Attributes:
+        path: [str] The path of the journal database.
+        provider: [str] The provider being scraped.
+    '''
+
+    def __init__(self, path: str, provider: str):
+        '''
+        This function opens the journal and creates its tables.
+        '''
+        self.path = path
+        self.provider = provider
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        self.conn.execute("""
+        CREATE TABLE IF NOT EXISTS scrape_runs (
+            provider TEXT PRIMARY KEY,
+            started_at TEXT NOT NULL,
+            finished_at TEXT
+        )
+        """)
+        self.conn.execute("""
+        CREATE TABLE IF NOT EXISTS scrape_journal (
+            provider TEXT NOT NULL,
+            company TEXT NOT NULL,
+            status TEXT NOT NULL,
+            attempt INTEGER NOT NULL,
+            result TEXT,
+            updated_at TEXT NOT NULL,
+            PRIMARY KEY (provider, company)
+        ) WITHOUT ROWID
+        """)
+        self.conn.commit()
+
+    def begin(self) -> dict:
+        '''
+        This function resumes the provider's last run if it didn't finish, and
+        otherwise starts a new run with an empty journal.
+
+        Returns:
+            [dict] : The result of every company the run has already scraped.
+        '''
+        run = self.conn.execute("SELECT started_at, finished_at FROM scrape_runs WHERE provider = ?",
+                                (self.provider,)).fetchone()
+        if run is not None and run[1] is None:
+            completed = self.completed()
+            logging.info(f"Resuming {self.provider} run started at {run[0]}: {len(completed)} companies already scraped")
+            self.conn.execute("UPDATE scrape_runs SET finished_at = NULL WHERE provider = ?", (self.provider,))
+            self.conn.commit()
+            return completed
+
+        self.conn.execute("DELETE FROM scrape_journal WHERE provider = ?", (self.provider,))
+        self.conn.execute("INSERT OR REPLACE INTO scrape_runs VALUES (?, ?, NULL)",
+                          (self.provider, datetime.now(timezone.utc).isoformat()))
+        self.conn.commit()
+        logging.info(f"Started new {self.provider} run")
+        return {}
+
+    def finish(self):
+        '''
+        This function marks the provider's run as finished, so the next run starts afresh.
+        '''
+        self.conn.execute("UPDATE scrape_runs SET finished_at = ? WHERE provider = ?",
+                          (datetime.now(timezone.utc).isoformat(), self.provider))
+        self.conn.commit()
+
+    def record(self, company: str, status: str, result: dict = None):
+        '''
+        This function records a company's status, counting an attempt each time it starts running.
+        A company that has been scraped stays done.
+
+        Args:
+            company: [str] The company.
+            status: [str] RUNNING, DONE or FAILED.
+            result: [dict] The scraping result of a DONE company.
+        '''
+        self.conn.execute("""
+            INSERT INTO scrape_journal (provider, company, status, attempt, result, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (provider, company) DO UPDATE SET
+                status = excluded.status,
+                attempt = attempt + excluded.attempt,
+                result = excluded.result,
+                updated_at = excluded.updated_at
+            WHERE status != 'done'
+        """, (self.provider, str(company), status, int(status == RUNNING),
+              json.dumps(result) if result is not None else None,
+              datetime.now(timezone.utc).isoformat()))
+        self.conn.commit()
+
+    def settled(self, companies: list) -> bool:
+        '''
+        This function checks whether every company has been scraped or has failed, rather
+        than being left running or never reached by a run that was cut short.
+
+        Args:
+            companies: [list] The companies of the run.
+
+        Returns:
+            [bool] : True if every company is done or failed.
+        '''
+        settled = {company for (company,) in self.conn.execute(
+            "SELECT company FROM scrape_journal WHERE provider = ? AND status IN ('done', 'failed')",
+            (self.provider,))}
+        return all(str(company) in settled for company in companies)
+
+    def completed(self) -> dict:
+        '''
+        This function returns the result of every company scraped in the current run, in the order they were scraped.
+
+        Returns:
+            [dict] : Results keyed by company.
+        '''
+        rows = self.conn.execute("""
+            SELECT company, result FROM scrape_journal
+            WHERE provider = ? AND status = 'done'
+            ORDER BY updated_at
+        """, (self.provider,))
+        return {company: json.loads(result) for company, result in rows}
+
+    def close(self):
+        self.conn.close()
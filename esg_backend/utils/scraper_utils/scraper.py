@@ -13,9 +13,14 @@ from selenium.common.exceptions import (TimeoutException,
                                         StaleElementReferenceException)
 from selenium.webdriver.remote.webelement import WebElement
 from selenium.webdriver.support.ui import Select
-from time import sleep
+from contextlib import contextmanager
+import time
 import os
 from queue import Queue
+from utils.scraper_utils.browser_profile import block_resources, chrome_options
+from utils.scraper_utils.driver_pool import DriverPool, shared_pool
+from utils.scraper_utils.rate_limiter import limiter_for
+from utils.scraper_utils.retry import BLOCKED, LAYOUT_CHANGE, NOT_FOUND, TIMEOUT, UNKNOWN, note_failure
 
 # Configure logging
 logging.basicConfig(
@@ -24,6 +29,23 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s',
 )
 
+# Seconds to wait for a condition, between checks of a condition, and without
+# changes before the network or DOM counts as settled
+DEFAULT_WAIT = 10
+POLL_INTERVAL = 0.1
+IDLE_TIME = 0.5
+
+# Scripts returning a count that stops changing once the network or DOM settles
+NETWORK_ACTIVITY_SCRIPT = (
+    "return document.readyState === 'complete' ? performance.getEntriesByType('resource').length : -1"
+)
+DOM_SIZE_SCRIPT = "return document.getElementsByTagName('*').length"
+
+# Titles of the block, challenge and throttling pages served instead of a provider's content
+BLOCKED_PAGE_TITLES = ("access denied", "attention required! | cloudflare", "just a moment...",
+                       "403 forbidden", "429 too many requests", "too many requests",
+                       "503 service unavailable", "request blocked", "are you a robot?")
+
 class WebScraper():
     '''
     This class is used to scrape a website.
@@ -33,46 +55,91 @@ class WebScraper():
         user_agent: [str] The selected user agent (optional). 
     '''
 
-    def __init__(self, URL: str, user_agents: Queue = None, threaded: bool = True):
+    def __init__(self, URL: str, user_agents: Queue = None, threaded: bool = True,
+                 pool: DriverPool = None, allowed_resources: set = None):
         '''
-        This function initializes a Chrome Webdriver and accesses the
-        specified URL.
+        This function takes a Chrome Webdriver from the driver pool (or launches
+        one if no pool was started), blocks the resources the provider doesn't
+        allow, and accesses the specified URL.
         '''
         logging.info("Initializing WebScraper for URL: %s", URL)
         print("Initializing webscraper.")
         self.URL = URL
-        
-        try:
-            options = webdriver.ChromeOptions()
-            options.add_argument("--headless")
-            options.add_argument("--no-sandbox")
-            options.add_argument("--disable-dev-shm-usage")
+        self.step_times = {}
+        self.pool = pool if pool is not None else shared_pool()
+        self.limiter = limiter_for(URL)
+        self.user_agent = None
 
+        try:
             if threaded and user_agents is not None:
                 # Randomly select a user agent
                 if user_agents.empty():
                     raise ValueError("No more user agents available")
-                random_user_agent = user_agents.get()
-                options.add_argument(f"user-agent={random_user_agent}")
+                self.user_agent = user_agents.get()
 
                 # Log which user agent was selected (helpful for debugging)
-                logging.info(f"Using user agent: {random_user_agent}")
-                self.user_agent = random_user_agent
+                logging.info(f"Using user agent: {self.user_agent}")
+
+            if self.pool is not None:
+                self.driver = self.pool.acquire(self.user_agent)
             else:
-                options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/87.0.4280.88 Safari/537.36")
-            
-            self.driver = webdriver.Chrome(options=options)
+                self.driver = webdriver.Chrome(options=chrome_options(self.user_agent))
+            block_resources(self.driver, allowed_resources)
             print(f"Webdriver initialized.")
-            self.driver.get(URL)
+            self.open()
             logging.info("WebDriver initialized and URL accessed successfully.")
         except Exception as e:
             logging.error("Failed to initialize WebDriver or access URL. Error: %s", e)
+            note_failure(UNKNOWN, f"failed to start browser: {e}")
             return None
 
+    def open(self, URL: str = None):
+        '''
+        This function waits for the provider's rate limiter and loads a page, backing
+        off if the page load times out.
+
+        Args:
+            URL: [str] The page to load (defaults to the scraper's URL).
+        '''
+        self.limiter.wait()
+        try:
+            self.driver.get(URL or self.URL)
+        except TimeoutException:
+            note_failure(TIMEOUT, "page load timeout")
+            self.limiter.backoff("page load timeout")
+            raise
+
+    def page_blocked(self) -> bool:
+        '''
+        This function checks whether the provider served a block or captcha page instead
+        of its content. It's only called once an expected element is missing, so a notice
+        on a page that did load isn't mistaken for a block.
+
+        Returns:
+            [bool] : True if the page's title starts with one of BLOCKED_PAGE_TITLES.
+        '''
+        try:
+            title = (self.driver.title or "").strip().lower()
+        except Exception:
+            return False
+        return title.startswith(BLOCKED_PAGE_TITLES)
+
+    def quit(self):
+        '''
+        This function hands the driver back to the pool to be recycled, or quits it if there is no pool.
+        '''
+        if not hasattr(self, "driver"):
+            return
+        if self.pool is not None:
+            self.pool.release(self.driver)
+        else:
+            self.driver.quit()
+
     def wait_element_to_load(self, xpath: str = None, 
                              class_name: str = None,
                              id_name: str = None,
-                             css_selector: str = None):
+                             css_selector: str = None,
+                             record: bool = True):
         '''
         This function waits until the specified xpath is accessible on the
         website.
@@ -82,6 +149,10 @@ class WebScraper():
             class_name: [str] The class name of the web element.
             id_name: [str] The id name of the web element.
             css_selector: [str] The css selector of the web element.
+            record: [bool] Note a timeout as the company's failure; False for optional elements.
+
+        Returns:
+            [WebElement] : The element, or None if it didn't load.
         '''
         logging.info("Waiting for element to load: %s", xpath)
         delay = 10  # seconds
@@ -103,7 +174,14 @@ class WebScraper():
             if class_name: logging.warning("Timeout while waiting for element: %s", class_name)
             if id_name: logging.warning("Timeout while waiting for element: %s", id_name)
             if css_selector: logging.warning("Timeout while waiting for element: %s", css_selector)
-            pass
+            element = xpath or class_name or id_name or css_selector
+            if not record:
+                return None
+            if self.page_blocked():
+                note_failure(BLOCKED, f"blocked page while waiting for {element}")
+                self.limiter.backoff("blocked page")
+            else:
+                note_failure(NOT_FOUND, f"{element} not found")
 
     def locate_element(self, xpath: str = None, 
                        class_name: str = None, 
@@ -143,7 +221,7 @@ class WebScraper():
                 return self.driver.find_elements(By.TAG_NAME, tag_name)
         except Exception as e:
             logging.warning("Failed to locate item: %s", e)
-            pass
+            note_failure(LAYOUT_CHANGE, f"missing element {xpath or class_name or id_name or tag_name}")
     
     def locate_element_within_element(self, element: WebElement, 
                                       xpath: str = None, 
@@ -185,6 +263,195 @@ class WebScraper():
                 return element.find_elements(By.TAG_NAME, tag_name)
         except Exception as e:
             logging.warning("Failed to locate item: %s", e)
+            note_failure(LAYOUT_CHANGE, f"missing element {xpath or class_name or id_name or tag_name}")
+
+    def locator(self, xpath: str = None,
+                class_name: str = None,
+                id_name: str = None,
+                css_selector: str = None) -> tuple:
+        '''
+        This function returns the Selenium locator of the first selector given.
+
+        Args:
+            xpath: [str] The xpath of the web element.
+            class_name: [str] The class name of the web element.
+            id_name: [str] The id name of the web element.
+            css_selector: [str] The css selector of the web element.
+
+        Returns:
+            [tuple] : The (By, value) locator.
+        '''
+        if xpath:
+            return (By.XPATH, xpath)
+        elif class_name:
+            return (By.CLASS_NAME, class_name)
+        elif id_name:
+            return (By.ID, id_name)
+        elif css_selector:
+            return (By.CSS_SELECTOR, css_selector)
+        raise ValueError("No selector given")
+
+    def wait_until(self, condition, timeout: float = DEFAULT_WAIT,
+                   description: str = "condition"):
+        '''
+        This function polls a condition on the driver until it returns a truthy value.
+
+        Args:
+            condition: [callable] A function of the driver, such as a Selenium expected condition.
+            timeout: [float] Seconds to wait before giving up.
+            description: [str] What is being waited for, for the log.
+
+        Returns:
+            The condition's value, or None if it timed out.
+        '''
+        ignored_exceptions = (NoSuchElementException,
+                              StaleElementReferenceException,)
+        try:
+            wait = WebDriverWait(self.driver, timeout, poll_frequency=POLL_INTERVAL,
+                                 ignored_exceptions=ignored_exceptions)
+            return wait.until(condition)
+        except TimeoutException:
+            logging.warning("Timeout while waiting for %s", description)
+
+            # The page loaded, so only a block page means the provider is throttling; short
+            # waits probe for optional elements, so only a full wait counts as a failure
+            if self.page_blocked():
+                note_failure(BLOCKED, f"blocked page while waiting for {description}")
+                self.limiter.backoff("blocked page")
+            elif timeout >= DEFAULT_WAIT:
+                note_failure(NOT_FOUND, f"{description} not found")
+            return None
+
+    def wait_visible(self, xpath: str = None,
+                     class_name: str = None,
+                     id_name: str = None,
+                     css_selector: str = None,
+                     timeout: float = DEFAULT_WAIT) -> WebElement:
+        '''
+        This function waits until the specified web element is visible.
+
+        Args:
+            xpath: [str] The xpath of the web element.
+            class_name: [str] The class name of the web element.
+            id_name: [str] The id name of the web element.
+            css_selector: [str] The css selector of the web element.
+            timeout: [float] Seconds to wait before giving up.
+
+        Returns:
+            [WebElement] : The element, or None if it didn't become visible.
+        '''
+        locator = self.locator(xpath, class_name, id_name, css_selector)
+        return self.wait_until(EC.visibility_of_element_located(locator), timeout,
+                               f"{locator[1]} to be visible")
+
+    def wait_clickable(self, xpath: str = None,
+                       class_name: str = None,
+                       id_name: str = None,
+                       css_selector: str = None,
+                       timeout: float = DEFAULT_WAIT) -> WebElement:
+        '''
+        This function waits until the specified web element is visible and enabled.
+
+        Args:
+            xpath: [str] The xpath of the web element.
+            class_name: [str] The class name of the web element.
+            id_name: [str] The id name of the web element.
+            css_selector: [str] The css selector of the web element.
+            timeout: [float] Seconds to wait before giving up.
+
+        Returns:
+            [WebElement] : The element, or None if it didn't become clickable.
+        '''
+        locator = self.locator(xpath, class_name, id_name, css_selector)
+        return self.wait_until(EC.element_to_be_clickable(locator), timeout,
+                               f"{locator[1]} to be clickable")
+
+    def wait_invisible(self, xpath: str = None,
+                       class_name: str = None,
+                       id_name: str = None,
+                       css_selector: str = None,
+                       timeout: float = DEFAULT_WAIT) -> bool:
+        '''
+        This function waits until the specified web element is hidden or removed.
+
+        Args:
+            xpath: [str] The xpath of the web element.
+            class_name: [str] The class name of the web element.
+            id_name: [str] The id name of the web element.
+            css_selector: [str] The css selector of the web element.
+            timeout: [float] Seconds to wait before giving up.
+
+        Returns:
+            [bool] : True if the element is no longer visible.
+        '''
+        locator = self.locator(xpath, class_name, id_name, css_selector)
+        return bool(self.wait_until(EC.invisibility_of_element_located(locator), timeout,
+                                    f"{locator[1]} to be hidden"))
+
+    def wait_settled(self, script: str, description: str,
+                     idle_time: float = IDLE_TIME,
+                     timeout: float = DEFAULT_WAIT) -> bool:
+        '''
+        This function waits until the count returned by a script stops changing for idle_time seconds.
+
+        Args:
+            script: [str] JavaScript returning a count, or -1 while the page isn't ready.
+            description: [str] What is being waited for, for the log.
+            idle_time: [float] Seconds the count must stay the same.
+            timeout: [float] Seconds to wait before giving up.
+
+        Returns:
+            [bool] : True if the count settled before the timeout.
+        '''
+        last = {"count": None, "since": time.monotonic()}
+
+        def settled(driver) -> bool:
+            count = driver.execute_script(script)
+            now = time.monotonic()
+            if count != last["count"]:
+                last.update(count=count, since=now)
+                return False
+            return count >= 0 and now - last["since"] >= idle_time
+
+        return bool(self.wait_until(settled, timeout, description))
+
+    def wait_network_idle(self, idle_time: float = IDLE_TIME,
+                          timeout: float = DEFAULT_WAIT) -> bool:
+        '''
+        This function waits until the page has loaded and requested no new resources for idle_time seconds.
+        '''
+        return self.wait_settled(NETWORK_ACTIVITY_SCRIPT, "network idle", idle_time, timeout)
+
+    def wait_dom_stable(self, idle_time: float = IDLE_TIME,
+                        timeout: float = DEFAULT_WAIT) -> bool:
+        '''
+        This function waits until the number of elements on the page stops changing for idle_time seconds.
+        '''
+        return self.wait_settled(DOM_SIZE_SCRIPT, "DOM to stabilize", idle_time, timeout)
+
+    @contextmanager
+    def timed_step(self, name: str):
+        '''
+        This function times a step of scraping a company, logging how long it took
+        and adding it to the scraper's total for the step.
+
+        Args:
+            name: [str] The name of the step.
+        '''
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.step_times[name] = self.step_times.get(name, 0.0) + elapsed
+            logging.info("Step '%s' took %.2fs", name, elapsed)
+
+    def log_step_times(self):
+        '''
+        This function logs the total time spent in each step, slowest first.
+        '''
+        for name, total in sorted(self.step_times.items(), key=lambda item: -item[1]):
+            logging.info("Total time in step '%s': %.2fs", name, total)
 
     def accept_cookies(self, xpath: str = None, 
                        class_name: str = None, 
@@ -199,13 +466,18 @@ class WebScraper():
         '''
         logging.info("Attempting to accept cookies.")
         try:
-            self.wait_element_to_load(xpath, class_name, id_name)
-            cookies_button = self.locate_element(xpath, class_name, id_name)
+            # The banner isn't shown on every page, so a missing button isn't a failure
+            cookies_button = self.wait_element_to_load(xpath, class_name, id_name, record=False)
+            if cookies_button is None:
+                logging.info("No cookies banner shown.")
+                return
             cookies_button.click()
             logging.info("Cookies accepted successfully.")
+
+            # Wait for the banner to close rather than a fixed delay
+            self.wait_invisible(xpath, class_name, id_name, timeout=2)
         except Exception as e:
             logging.error("Cookies button not found. Error: %s", e)
-        sleep(2)
 
     def send_request_to_search_bar(self, search_item,
                                    xpath: str = None, 
@@ -225,10 +497,10 @@ class WebScraper():
         '''
         try:
             logging.info("Search bar request for: %s", search_item)
-            search_bar = WebScraper.locate_element(self, xpath, class_name, id_name)
+            self.limiter.wait()
+            search_bar = self.wait_clickable(xpath, class_name, id_name)
             search_bar.clear()
             search_bar.send_keys(search_item)
-            sleep(3)
             return search_bar
         except Exception as e:
             logging.warning("Search bar request failed %s", e)
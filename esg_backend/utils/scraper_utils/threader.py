@@ -1,13 +1,19 @@
 ''' This module contains a function for applying multithreading to selenium-based webscraping functions.'''
 
-from queue import Queue
-import numpy as np
+from queue import Queue, Empty
+import csv
+import os
 import pandas as pd
 import logging
-import concurrent.futures
-from concurrent.futures import ThreadPoolExecutor
-from typing import Callable 
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable
 from threading import Lock
+from utils.scraper_utils.driver_pool import close_shared_pool, start_shared_pool
+from utils.scraper_utils.rate_limiter import RateLimiter, limiter_for, set_rate_share
+from utils.scraper_utils.retry import RetryQueue, clear_failure, take_failure
+from utils.scraper_utils.scrape_journal import (DONE, FAILED, RUNNING, ScrapeJournal,
+                                                default_journal_path)
 
 import_path = 'esg_backend/api/data/SP500.csv'
 USER_AGENTS = [
@@ -17,6 +23,12 @@ USER_AGENTS = [
     "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.0 Safari/605.1.15"
 ]
 
+# Number of browser workers used when neither the caller nor SCRAPER_WORKERS sets one
+DEFAULT_NUM_WORKERS = 4
+
+# Seconds the writer waits for a result before checking whether the workers are done
+RESULT_POLL_INTERVAL = 0.5
+
 # Configure logging
 logging.basicConfig(
     filename='parallel_scraping.log',
@@ -24,70 +36,416 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s',
 )
 
-def Threader(website_function: Callable, export_path: str, missing_companies: list = None):
+class CompanyQueue():
+    '''
+    This class is a queue of companies shared by every worker of a scrape. It can be
+    passed to a scraper function in place of a dataframe, so each worker pulls its next
+    company when it finishes the last one rather than working through a fixed chunk.
+    Companies being retried are put back in the queue, so it stays open until it's closed.
+
+    Attributes:
+        total: [int] The number of companies put in the queue.
+    '''
+
+    def __init__(self, df: pd.DataFrame, rows: Queue = None):
+        '''
+        This function fills the queue with the rows of a dataframe. A queue shared
+        between processes (e.g. from a multiprocessing Manager) can be passed as rows.
+        '''
+        self.total = len(df)
+        self._rows = rows if rows is not None else Queue()
+        for row in df.iterrows():
+            self._rows.put(row)
+
+    def iterrows(self):
+        '''
+        This function yields (index, row) pairs like DataFrame.iterrows until the queue is closed.
+        '''
+        while True:
+            row = self._rows.get()
+            if row is None:
+                # Leave the marker for the other workers
+                self._rows.put(None)
+                return
+            yield row
+
+    def put(self, row: tuple):
+        '''
+        This function puts a company's (index, row) pair back in the queue to be retried.
+        '''
+        self._rows.put(row)
+
+    def close(self):
+        '''
+        This function stops the workers once they've taken every company left in the queue.
+        '''
+        self._rows.put(None)
+
+    def __len__(self) -> int:
+        return self.total
+
+class WorkerCompanies():
+    '''
+    This class is one worker's view of the shared company queue. It tells the worker's
+    results list which company is being scraped, so each company's progress can be journaled,
+    and holds a slot of the provider's rate limiter while each company is scraped.
+
+    Attributes:
+        companies: [CompanyQueue] The queue of companies shared by every worker.
+        results: [ResultQueue] The worker's results list.
+        company_column: [str] The column naming each company.
+        limiter: [RateLimiter] The provider's rate limiter (optional).
+    '''
+
+    def __init__(self, companies: CompanyQueue, results: 'ResultQueue', company_column: str,
+                 limiter: RateLimiter = None):
+        self.companies = companies
+        self.results = results
+        self.company_column = company_column
+        self.limiter = limiter
+
+    def iterrows(self):
+        '''
+        This function yields (index, row) pairs from the shared queue, starting each company's journal entry.
+        '''
+        try:
+            for index, row in self.companies.iterrows():
+                # Finish each company when the scraper asks for the next, before waiting on the queue
+                if self.limiter is None:
+                    self.results.start(row[self.company_column])
+                    yield index, row
+                    self.results.finish()
+                    continue
+                with self.limiter.slot():
+                    self.results.start(row[self.company_column])
+                    yield index, row
+                    self.results.finish()
+        finally:
+            # Also reached if the scraper stops iterating, so its company isn't left running
+            self.results.finish()
+
+    def __len__(self) -> int:
+        return len(self.companies)
+
+class SharedSet():
+    '''
+    This class is a set of processed companies shared between processes, backed
+    by a dictionary from a multiprocessing Manager.
+    '''
+
+    def __init__(self, items: dict):
+        self._items = items
+
+    def add(self, item):
+        self._items[item] = True
+
+    def discard(self, item):
+        self._items.pop(item, None)
+
+    def __contains__(self, item) -> bool:
+        return item in self._items
+
+class ResultQueue(list):
+    '''
+    This class is passed to a scraper function as its results list. Rather than keeping
+    the results, it sends each one to the writer as soon as the scraper appends it, along
+    with the start of each company and the failure noted for any company that produced no result.
+
+    Attributes:
+        queue: [queue] The queue of (company, status, result) events read by the writer.
+        company: [str] The company being scraped.
+    '''
+
+    def __init__(self, queue: Queue):
+        super().__init__()
+        self.queue = queue
+        self.company = None
+        self._scraped = False
+
+    def start(self, company: str):
+        self.finish()
+        self.company = company
+        self._scraped = False
+        clear_failure()
+        self.queue.put((company, RUNNING, None))
+
+    def finish(self):
+        if self.company is not None and not self._scraped:
+            self.queue.put((self.company, FAILED, take_failure()))
+        self.company = None
+
+    def append(self, result: dict):
+        self._scraped = True
+        self.queue.put((self.company, DONE, result))
+
+class ResultWriter():
+    '''
+    This class appends scraping results to a csv as they arrive, so results
+    are saved while the scrape is running.
+
+    Attributes:
+        export_path: [str] The path for the exported csv.
+        count: [int] The number of results written.
+    '''
+
+    def __init__(self, export_path: str):
+        self.export_path = export_path
+        self.count = 0
+        self._file = None
+        self._writer = None
+
+    def write(self, result: dict):
+        '''
+        This function appends one result to the csv, creating the csv with the
+        result's keys as its header on the first result.
+        '''
+        if self._writer is None:
+            self._file = open(self.export_path, 'w', newline='')
+            self._writer = csv.DictWriter(self._file, fieldnames=list(result), extrasaction='ignore')
+            self._writer.writeheader()
+        self._writer.writerow(result)
+        self._file.flush()
+        self.count += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+def drain_results(results: Queue, writer: ResultWriter, journal: ScrapeJournal, futures: list,
+                  companies: CompanyQueue, retries: RetryQueue, rows: dict, processed_tickers: set):
+    '''
+    This function journals progress and writes results until every worker is done and the queue
+    is empty. Companies that fail transiently are put back in the company queue once their backoff
+    has passed, and the queue is closed once every company has been scraped or has finally failed.
+
+    Args:
+        results: [queue] The queue the workers send (company, status, result) events to.
+        writer: [ResultWriter] The writer for the exported csv.
+        journal: [ScrapeJournal] The journal of the run.
+        futures: [list] The futures of the workers.
+        companies: [CompanyQueue] The queue of companies shared by every worker.
+        retries: [RetryQueue] The companies waiting to be retried.
+        rows: [dict] The (index, row) pair of each company, to put back in the queue.
+        processed_tickers: [set] Tickers of companies that have been processed by all workers.
+    '''
+    unsettled = set(rows)
+    scraped = set()
+    try:
+        while unsettled or retries.pending:
+            for row in retries.due():
+                companies.put(row)
+            try:
+                company, status, result = results.get(timeout=RESULT_POLL_INTERVAL)
+            except Empty:
+                if all(future.done() for future in futures):
+                    break
+                continue
+            journal.record(company, status, result)
+            if status == DONE:
+                writer.write(result)
+                scraped.add(str(company))
+                retries.succeeded(company)
+                unsettled.discard(str(company))
+            elif status == FAILED and str(company) not in scraped:
+                if str(company) in rows and retries.schedule(company, rows[str(company)], result):
+                    # Let the company be processed again when it's retried
+                    processed_tickers.discard(company)
+                else:
+                    unsettled.discard(str(company))
+    finally:
+        companies.close()
+
+    # Drain the events of workers finishing after the queue closed
+    for future in futures:
+        future.exception()
+    while True:
+        try:
+            company, status, result = results.get_nowait()
+        except Empty:
+            break
+        journal.record(company, status, result)
+        if status == DONE:
+            writer.write(result)
+            retries.succeeded(company)
+        elif status == FAILED and str(company) not in scraped:
+            retries.schedule(company, None, result)
+
+    # Report the companies whose retries never ran because every worker stopped
+    retries.abandon()
+
+    # Log worker failures, since their companies may be missing from the csv
+    for future in futures:
+        if future.exception() is not None:
+            logging.error(f"Worker error: {future.exception()}")
+
+def run_workers(website_function: Callable, companies: CompanyQueue, results: Queue,
+                workers: list, processed_tickers: set, lock: Lock, company_column: str,
+                provider_url: str = None, rate_share: float = 1.0) -> None:
+    '''
+    This function runs a scraper function on a thread per worker until the companies run out.
+    The workers share a pool of warm browsers and the provider's rate limiter, started here
+    so each process owns its own.
+
+    Args:
+        website_function: [callable] The function used to webscrape a website.
+        companies: [CompanyQueue] The queue of companies shared by every worker.
+        results: [queue] The queue results are sent to.
+        workers: [list] The indexes of the workers to run, which select their user agents.
+        processed_tickers: [set] Tickers of companies that have been processed by all workers.
+        lock: [lock] Places a lock on a company as it is being processed to avoid conflicts between workers.
+        company_column: [str] The column naming each company.
+        provider_url: [str] A URL on the provider domain, whose rate limiter paces the workers (optional).
+        rate_share: [float] The share of the provider's rate given to this process.
+    '''
+    set_rate_share(rate_share)
+    limiter = limiter_for(provider_url, max_concurrency=len(workers)) if provider_url else None
+    start_shared_pool(len(workers))
+    try:
+        with ThreadPoolExecutor(max_workers=len(workers)) as executor:
+            futures = []
+            for worker in workers:
+                worker_results = ResultQueue(results)
+                futures.append(executor.submit(website_function,
+                                               WorkerCompanies(companies, worker_results, company_column, limiter),
+                                               worker_user_agents(worker), processed_tickers, lock, worker_results))
+        for future in futures:
+            if future.exception() is not None:
+                logging.error(f"Worker error: {future.exception()}")
+    finally:
+        close_shared_pool()
+
+def env_int(name: str) -> int | None:
+    '''
+    This function reads an optional integer setting from an environment variable.
+    '''
+    value = os.environ.get(name)
+    return int(value) if value else None
+
+def worker_user_agents(worker: int) -> Queue:
+    '''
+    This function creates a user agent queue for one worker, starting at the worker's
+    own agent so the agents are cycled however many workers there are.
+
+    Args:
+        worker: [int] The index of the worker.
+
+    Returns:
+        [queue] : Queue of every user agent, starting with the worker's agent.
+    '''
+    user_agents = Queue()
+    for i in range(len(USER_AGENTS)):
+        user_agents.put(USER_AGENTS[(worker + i) % len(USER_AGENTS)])
+    return user_agents
+
+def Threader(website_function: Callable, export_path: str, num_workers: int = None,
+             limit: int = None, num_processes: int = None, company_column: str = 'Longname',
+             journal_path: str = None, provider_url: str = None):
     '''
-    This function using multithreading for running webscraper functions in parallel 
-    and aggregates and exports results from each thread to a csv.
+    This function runs a webscraper function on a pool of long-lived workers that pull
+    companies from a shared queue, and writes the results of every worker to a csv as they arrive.
+    With more than one process, the workers are split across processes that each own
+    their browsers, and the results are sent back to a single writer in this process.
+
+    Every company's progress is journaled, so if a run is interrupted the next run
+    resumes it, skipping the companies already scraped. Companies that time out or are
+    blocked are retried with a jittered exponential backoff while the run continues, and
+    the companies that still couldn't be scraped are written to a failure report. Given the provider's URL, the workers
+    share its adaptive rate limiter, which ramps the number of companies scraped at once up
+    to num_workers while the provider keeps up and backs off when it times out or blocks them.
 
     Args:
         website_function:  [callable] The function used to webscrape a website.
         export_path: [str] The path for the exported csv.
-        missing_companies: [list] A list of companies missed when initially ran Threader.
+        num_workers: [int] The number of browser workers (defaults to SCRAPER_WORKERS or DEFAULT_NUM_WORKERS).
+        limit: [int] Only scrape the first limit companies (defaults to SCRAPER_LIMIT, or every company).
+        num_processes: [int] The number of processes running the workers (defaults to SCRAPER_PROCESSES, or 1).
+        company_column: [str] The column naming each company, as used by website_function.
+        journal_path: [str] The path of the journal database (defaults to SCRAPER_JOURNAL, or next to the csv).
+        provider_url: [str] A URL on the provider domain, used to pace the workers (optional).
     '''
     logging.info("Script started")
-    
-    # Create queue with user agents
-    user_agents = Queue()
-    for agent in USER_AGENTS:
-        user_agents.put(agent)
-
-    try: 
-        if missing_companies is not None:
-            # If missing_companies list provided, then assign name 'df' to list
-            logging.info(f"Processing {len(missing_companies)} missing companies")
-            df = missing_companies
-        else: 
-            logging.info("Reading input data from: %s", import_path)
-            df = pd.read_csv(import_path)
-            df = df.head(4)
-            logging.info("Data loaded successfully. Number of records: %d", len(df))
+    num_workers = num_workers or env_int("SCRAPER_WORKERS") or DEFAULT_NUM_WORKERS
+    limit = limit or env_int("SCRAPER_LIMIT")
+    num_processes = num_processes or env_int("SCRAPER_PROCESSES") or 1
+
+    try:
+        logging.info("Reading input data from: %s", import_path)
+        df = pd.read_csv(import_path)
+        if limit:
+            df = df.head(limit)
+        logging.info("Data loaded successfully. Number of records: %d", len(df))
     except FileNotFoundError as e:
         logging.error("Input file not found. Error: %s", e)
         return
 
-    # Calculate number of threads
-    num_threads = min(len(df), user_agents.qsize())
-    
-    # Create non-overlapping chunks based on number of threads
-    df_chunks = np.array_split(df, num_threads)
-    
-    # Create shared set for tracking processed companies
-    processed_tickers = set()
-    lock = Lock()
+    if df.empty:
+        logging.warning("No companies to scrape")
+        return
+
+    # Resume an interrupted run
+    journal = ScrapeJournal(journal_path or default_journal_path(export_path),
+                            os.path.splitext(os.path.basename(export_path))[0])
+    completed = journal.begin()
+    df = df[~df[company_column].astype(str).isin(completed)]
+
+    # Rewrite the results already scraped, so the csv covers the whole run
+    writer = ResultWriter(export_path)
+    for result in completed.values():
+        writer.write(result)
+
+    num_workers = min(len(df), num_workers)
+    num_processes = min(num_workers, num_processes)
+
+    # Companies that fail transiently are retried during the run, from a queue of their own
+    retries = RetryQueue()
+    rows = {str(row[company_column]): (index, row) for index, row in df.iterrows()}
 
     try:
-        # Inform threadpoolexecutor of number of threads
-        with ThreadPoolExecutor(max_workers=num_threads) as executor:
-            # Assign each thread a chunk
-            futures = [executor.submit(website_function, chunk, user_agents, processed_tickers, lock) 
-                      for chunk in df_chunks]
-            
-            # Store results from threads executing function on assigned chunk
-            results = []
-            for future in concurrent.futures.as_completed(futures):
-                batch_results = future.result()
-                if batch_results:
-                    results.extend(batch_results)
-
-        # Create pandas dataframe with results and export to csv
-        if results:
-            results_df = pd.DataFrame(results)
-            results_df.to_csv(export_path, index=False)
-            logging.info(f"Successfully saved {len(results_df)} results")
+        if df.empty:
+            logging.info("Every company has already been scraped")
+        elif num_processes == 1:
+            # Share one queue of companies between the worker threads
+            logging.info(f"Scraping {len(df)} companies with {num_workers} workers")
+            companies = CompanyQueue(df)
+            results = Queue()
+            processed_tickers = set()
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                futures = [executor.submit(run_workers, website_function, companies, results,
+                                           list(range(num_workers)), processed_tickers, Lock(), company_column,
+                                           provider_url)]
+                drain_results(results, writer, journal, futures, companies, retries, rows, processed_tickers)
+        else:
+            # Share the queues between processes through a manager
+            logging.info(f"Scraping {len(df)} companies with {num_workers} workers in {num_processes} processes")
+            with multiprocessing.Manager() as manager, \
+                    ProcessPoolExecutor(max_workers=num_processes) as executor:
+                companies = CompanyQueue(df, manager.Queue())
+                results = manager.Queue()
+                processed_tickers = SharedSet(manager.dict())
+                lock = manager.Lock()
+                futures = [executor.submit(run_workers, website_function, companies, results,
+                                           list(range(process, num_workers, num_processes)),
+                                           processed_tickers, lock, company_column,
+                                           provider_url, 1 / num_processes)
+                           for process in range(num_processes)]
+                drain_results(results, writer, journal, futures, companies, retries, rows, processed_tickers)
+
+        # Only finish the run if it reached every company, so a cut short run is resumed
+        if journal.settled(df[company_column]):
+            journal.finish()
+        else:
+            logging.warning("Run ended before reaching every company; run again to resume it")
+
+        if writer.count:
+            logging.info(f"Successfully saved {writer.count} results")
         else:
             logging.warning("No results to save")
-    
+        retries.report(export_path)
+
     except Exception as e:
         logging.error(f"Main process error: {e}")
+    finally:
+        writer.close()
+        journal.close()
 
-    logging.info("Script completed")
\ No newline at end of file
+    logging.info("Script completed")
@@ -55,9 +55,14 @@ const ESGDataFetcher = () => {
           {Object.entries(companyData).map(([source, scores]) => (
             <div key={source} className="mb-3">
               <h4 className="font-medium">{source}</h4>
-              <pre className="bg-gray-100 p-2 rounded text-sm">
-                {scores}
-              </pre>
+              <div className="bg-gray-100 p-2 rounded text-sm">
+                {Object.entries(scores).map(([key, value]) => (
+                  <div key={key} className="flex">
+                    <span className="font-medium mr-2">{key}:</span>
+                    <span>{value !== null ? String(value) : 'N/A'}</span>
+                  </div>
+                ))}
+              </div>
             </div>
           ))}
         </div>